@@ -0,0 +1,87 @@
+"""Benchmark de memoria y tiempo de construcción de entidades y eventos
+
+En este archivo se compara el agregado Partnership y los eventos de dominio/entidades.py con
+variantes equivalentes construidas sobre AgregacionRaizLigera y EventoDominioLigero (slots,
+asignación directa del id): tiempo por instancia y bytes asignados al materializar un lote.
+
+Uso: PYTHONPATH=src python benchmarks/entidades_ligeras.py --instancias 100000
+
+"""
+
+import sys
+import json
+import uuid
+import argparse
+import statistics
+import tracemalloc
+import dataclasses
+from datetime import datetime
+from timeit import repeat
+from partner_lifecycle.seedwork.dominio.entidades import Entidad, AgregacionRaiz, AgregacionRaizLigera
+from partner_lifecycle.seedwork.dominio.eventos import EventoDominio, EventoDominioLigero
+from partner_lifecycle.modulos.partner_lifecycle.dominio import entidades
+
+def variante_ligera(clase, base):
+    """Crea una dataclass con slots con los campos propios de la clase sobre la base ligera"""
+    heredados = {campo.name for campo in dataclasses.fields(Entidad if issubclass(clase, Entidad) else EventoDominio)}
+    heredados.add('eventos')
+    campos = []
+    for campo in dataclasses.fields(clase):
+        if campo.name in heredados:
+            continue
+        if campo.default_factory is not dataclasses.MISSING:
+            campos.append((campo.name, campo.type, dataclasses.field(default_factory=campo.default_factory)))
+        else:
+            campos.append((campo.name, campo.type, dataclasses.field(default=campo.default)))
+    return dataclasses.make_dataclass(clase.__name__, campos, bases=(base,), slots=True)
+
+def argumentos(clase) -> dict:
+    """Valores compartidos por todas las instancias: se mide el costo del objeto, no el de sus valores"""
+    ahora = datetime.now()
+    valores = {'id_marca': uuid.uuid4()}
+    for campo in dataclasses.fields(clase):
+        if campo.init and campo.type is datetime:
+            valores[campo.name] = ahora
+    return valores
+
+def medir_tiempo(fabrica, repeticiones: int) -> float:
+    """Mediana en microsegundos por instancia"""
+    return statistics.median(repeat(fabrica, number=repeticiones, repeat=5)) / repeticiones * 1e6
+
+def medir_memoria(fabrica, instancias: int) -> float:
+    """Bytes asignados por instancia al mantener vivo un lote completo"""
+    tracemalloc.start()
+    inicio = tracemalloc.get_traced_memory()[0]
+    lote = [fabrica() for _ in range(instancias)]
+    total = tracemalloc.get_traced_memory()[0] - inicio
+    tracemalloc.stop()
+    del lote
+    return total / instancias
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--instancias', type=int, default=100000)
+    parser.add_argument('--repeticiones', type=int, default=20000)
+    args = parser.parse_args()
+
+    clases = [entidades.Partnership] + [
+        clase for clase in vars(entidades).values()
+        if isinstance(clase, type) and issubclass(clase, EventoDominio) and clase is not EventoDominio
+    ]
+    resultados = {}
+    for clase in clases:
+        base = AgregacionRaizLigera if issubclass(clase, AgregacionRaiz) else EventoDominioLigero
+        ligera = variante_ligera(clase, base)
+        valores = argumentos(clase)
+        fila = {}
+        for nombre, objetivo in (('actual', clase), ('ligera', ligera)):
+            fabrica = lambda objetivo=objetivo: objetivo(**valores)
+            fila[f'{nombre}_us'] = round(medir_tiempo(fabrica, args.repeticiones), 3)
+            fila[f'{nombre}_bytes'] = round(medir_memoria(fabrica, args.instancias), 1)
+        resultados[clase.__name__] = fila
+
+    json.dump(resultados, sys.stdout, indent=2)
+    print()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Benchmark de serialización de eventos de dominio
+
+En este archivo se compara, para cada clase de evento de dominio/entidades.py, el camino
+anterior (sobre con evento.__dict__ y json.dumps(default=str)) con el registro de
+serializadores usando json, orjson y msgpack (si están instalados), y el costo de decodificación.
+
+Uso: PYTHONPATH=src python benchmarks/serializacion_eventos.py --repeticiones 20000
+
+"""
+
+import sys
+import json
+import uuid
+import argparse
+import statistics
+import dataclasses
+from timeit import repeat
+from datetime import datetime
+from partner_lifecycle.seedwork.dominio.eventos import EventoDominio
+from partner_lifecycle.modulos.partner_lifecycle.dominio import entidades
+from partner_lifecycle.infraestructura.serializacion import (
+    RegistroSerializadores, ORJSON_AVAILABLE, MSGPACK_AVAILABLE, ENCODING_MSGPACK
+)
+
+def serializar_anterior(saga_id, evento, event_type: str, status: str) -> bytes:
+    """Serialización previa de PulsarPublisher.construir_mensaje"""
+    event_dict = {
+        'saga_id': saga_id,
+        'service': 'Partner',
+        'status': status,
+        'event_id': evento.id,
+        'event_type': event_type,
+        'event_data': evento.__dict__,
+        'timestamp': evento.fecha_evento.isoformat() if hasattr(evento, 'fecha_evento') else None
+    }
+    return json.dumps(event_dict, default=str).encode('utf-8')
+
+def evento_de_ejemplo(clase):
+    """Instancia la clase con valores representativos según la anotación de cada campo"""
+    valores = {}
+    for campo in dataclasses.fields(clase):
+        if campo.name in ('id', '_id', 'fecha_evento'):
+            continue
+        tipo = campo.type if isinstance(campo.type, type) else None
+        if tipo is uuid.UUID:
+            valores[campo.name] = uuid.uuid4()
+        elif tipo is datetime:
+            valores[campo.name] = datetime.now()
+        elif tipo is int:
+            valores[campo.name] = 120
+        elif tipo is float:
+            valores[campo.name] = 12.5
+        else:
+            valores[campo.name] = 'marca_embajador'
+    return clase(**valores)
+
+def medir(funcion, repeticiones: int) -> float:
+    """Mediana en microsegundos por operación"""
+    tiempos = repeat(funcion, number=repeticiones, repeat=5)
+    return statistics.median(tiempos) / repeticiones * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeticiones', type=int, default=20000)
+    args = parser.parse_args()
+
+    backends = {'json': RegistroSerializadores('json')}
+    if ORJSON_AVAILABLE:
+        backends['orjson'] = RegistroSerializadores('orjson')
+
+    clases = [
+        clase for clase in vars(entidades).values()
+        if isinstance(clase, type) and issubclass(clase, EventoDominio) and clase is not EventoDominio
+    ]
+    resultados = {}
+    for clase in clases:
+        evento = evento_de_ejemplo(clase)
+        saga_id = uuid.uuid4()
+        nombre = clase.__name__
+        fila = {'anterior_us': medir(lambda: serializar_anterior(saga_id, evento, nombre, 'success'), args.repeticiones)}
+        for backend, registro in backends.items():
+            data = registro.serializar_mensaje(saga_id, evento, nombre, 'success')
+            fila[f'{backend}_us'] = medir(lambda: registro.serializar_mensaje(saga_id, evento, nombre, 'success'), args.repeticiones)
+            fila[f'{backend}_decodificar_us'] = medir(
+                lambda: registro.deserializar_evento(registro.deserializar_mensaje(data)), args.repeticiones
+            )
+            fila[f'{backend}_bytes'] = len(data)
+        if MSGPACK_AVAILABLE:
+            registro = backends['json']
+            data = registro.serializar_mensaje(saga_id, evento, nombre, 'success', ENCODING_MSGPACK)
+            propiedades = registro.propiedades(ENCODING_MSGPACK)
+            fila['msgpack_us'] = medir(
+                lambda: registro.serializar_mensaje(saga_id, evento, nombre, 'success', ENCODING_MSGPACK), args.repeticiones
+            )
+            fila['msgpack_decodificar_us'] = medir(
+                lambda: registro.deserializar_evento(registro.deserializar_mensaje(data, propiedades)), args.repeticiones
+            )
+            fila['msgpack_bytes'] = len(data)
+        fila['anterior_bytes'] = len(serializar_anterior(saga_id, evento, nombre, 'success'))
+        resultados[nombre] = {llave: round(valor, 3) for llave, valor in fila.items()}
+
+    json.dump(resultados, sys.stdout, indent=2)
+    print()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+"""Suite de benchmarks del servicio con el broker de Pulsar en memoria
+
+En este archivo se miden, sin un broker real (PULSAR_BACKEND=memory), el despacho de
+ejecutar_commando, el handler CrearPartnership contra Postgres o SQLite, la serialización de
+eventos y el throughput de consumo hasta el ack (con un callback vacío y con el flujo completo
+de EventConsumerService). Los resultados se guardan en JSON con los metadatos de la ejecución
+y se pueden comparar contra una ejecución anterior con --comparar.
+
+Uso: PYTHONPATH=src python benchmarks/suite.py --salida benchmarks/resultados/$(date +%F).json
+
+"""
+
+import os
+
+# El backend se fija antes de importar el servicio: las instancias globales leen PulsarConfig al importarse
+os.environ.setdefault('PULSAR_BACKEND', 'memory')
+
+import sys
+import json
+import time
+import uuid
+import logging
+import argparse
+import platform
+import statistics
+import subprocess
+from dataclasses import dataclass
+from datetime import datetime
+from timeit import repeat
+from flask import Flask
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from partner_lifecycle.config.db import db, init_db
+from partner_lifecycle.seedwork.aplicacion.comandos import Comando, ejecutar_commando
+from partner_lifecycle.infraestructura.serializacion import (
+    registro_serializadores, ENCODING_JSON, ENCODING_MSGPACK, MSGPACK_AVAILABLE
+)
+from partner_lifecycle.infraestructura.pulsar import PulsarEventConsumer, pulsar_publisher
+from partner_lifecycle.infraestructura.pulsar_memoria import broker_memoria
+from partner_lifecycle.infraestructura.event_consumer_service import EventConsumerService
+from partner_lifecycle.modulos.partner_lifecycle.dominio.entidades import PartnershipIniciada
+from partner_lifecycle.modulos.partner_lifecycle.aplicacion.comandos.comandos_partnership import CrearPartnership
+from partner_lifecycle.modulos.partner_lifecycle.aplicacion.servicios.command_executor import CommandExecutor
+from partner_lifecycle.modulos.partner_lifecycle.aplicacion.servicios.event_processing_service import (
+    EventProcessingService, map_partnership_iniciada_to_command
+)
+from partner_lifecycle.modulos.partner_lifecycle.infraestructura.idempotencia import RegistroIdempotencia
+import partner_lifecycle.modulos.partner_lifecycle.aplicacion.handlers.crear_partnership_handler  # registra el handler
+
+# SQLite no conoce los tipos UUID y JSONB de Postgres: solo para la base de la suite
+@compiles(UUID, 'sqlite')
+def _uuid_sqlite(tipo, compilador, **kw):
+    return 'CHAR(32)'
+
+@compiles(JSONB, 'sqlite')
+def _jsonb_sqlite(tipo, compilador, **kw):
+    return 'JSON'
+
+@dataclass
+class ComandoVacio(Comando):
+    valor: int = 0
+
+@ejecutar_commando.register
+def _(comando: ComandoVacio):
+    return comando.valor
+
+def crear_app(database_url: str) -> Flask:
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    init_db(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+def medir(funcion, repeticiones: int) -> float:
+    """Mediana en microsegundos por operación"""
+    return statistics.median(repeat(funcion, number=repeticiones, repeat=5)) / repeticiones * 1e6
+
+def payload_iniciada() -> dict:
+    return {
+        'id_partnership': str(uuid.uuid4()),
+        'id_marca': str(uuid.uuid4()),
+        'id_partner': str(uuid.uuid4()),
+        'tipo_partnership': 'marca_afiliado',
+        'metas_mensuales': 10,
+    }
+
+def bench_despacho(repeticiones: int) -> dict:
+    comando = ComandoVacio(1)
+    handler = ejecutar_commando.dispatch(ComandoVacio)
+    return {
+        'ejecutar_commando_us': round(medir(lambda: ejecutar_commando(comando), repeticiones), 3),
+        'llamada_directa_us': round(medir(lambda: handler(comando), repeticiones), 3),
+    }
+
+def bench_crear_partnership(app: Flask, cantidad: int) -> dict:
+    comandos = [CrearPartnership(**map_partnership_iniciada_to_command(str(uuid.uuid4()), payload_iniciada()))
+                for _ in range(cantidad)]
+    latencias = []
+    with app.app_context():
+        inicio = time.perf_counter()
+        for comando in comandos:
+            t0 = time.perf_counter()
+            ejecutar_commando(comando)
+            latencias.append((time.perf_counter() - t0) * 1000)
+        total = time.perf_counter() - inicio
+    latencias.sort()
+    return {
+        'comandos': cantidad,
+        'por_segundo': round(cantidad / total, 1),
+        'p50_ms': round(latencias[len(latencias) // 2], 3),
+        'p99_ms': round(latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))], 3),
+    }
+
+def bench_serializacion(repeticiones: int) -> dict:
+    evento = PartnershipIniciada(
+        id_partnership=uuid.uuid4(), id_marca=uuid.uuid4(), id_partner=uuid.uuid4(),
+        tipo_partnership='marca_afiliado', fecha_inicio=datetime.now(), metas_mensuales=10
+    )
+    resultados = {}
+    encodings = [ENCODING_JSON] + ([ENCODING_MSGPACK] if MSGPACK_AVAILABLE else [])
+    for encoding in encodings:
+        propiedades = registro_serializadores.propiedades(encoding)
+        data = registro_serializadores.serializar_mensaje('saga', evento, 'EventPartnerCompleted', 'success', encoding)
+        resultados[encoding] = {
+            'serializar_us': round(medir(
+                lambda: registro_serializadores.serializar_mensaje('saga', evento, 'EventPartnerCompleted', 'success', encoding),
+                repeticiones
+            ), 3),
+            'deserializar_us': round(medir(
+                lambda: registro_serializadores.deserializar_evento(
+                    registro_serializadores.deserializar_mensaje(data, propiedades)
+                ),
+                repeticiones
+            ), 3),
+            'bytes': len(data),
+        }
+    return resultados
+
+def _esperar_confirmados(topic_name: str, suscripcion: str, cantidad: int, timeout: float) -> bool:
+    limite = time.perf_counter() + timeout
+    estado = broker_memoria.topic(topic_name).suscripcion(suscripcion)
+    while estado.confirmados < cantidad:
+        if time.perf_counter() > limite:
+            return False
+        time.sleep(0.001)
+    return True
+
+def _publicar_y_medir(topic: str, suscripcion: str, mensajes: list, timeout: float) -> dict:
+    topic_name = pulsar_publisher.config.get_topic_name(topic)
+    inicio = time.perf_counter()
+    for data, propiedades in mensajes:
+        pulsar_publisher.publish_raw(topic, data, propiedades=propiedades)
+    completo = _esperar_confirmados(topic_name, suscripcion, len(mensajes), timeout)
+    total = time.perf_counter() - inicio
+    return {
+        'mensajes': len(mensajes),
+        'por_segundo': round(len(mensajes) / total, 1),
+        'segundos': round(total, 3),
+        'completo': completo,
+    }
+
+def mensajes_crear_partnership(cantidad: int) -> list:
+    propiedades = registro_serializadores.propiedades(ENCODING_JSON)
+    return [
+        (registro_serializadores.dumps({
+            'saga_id': str(uuid.uuid4()),
+            'service': 'Content',
+            'status': 'success',
+            'event_type': 'CommandCreatePartner',
+            'event_data': payload_iniciada(),
+        }), propiedades)
+        for _ in range(cantidad)
+    ]
+
+def bench_consumo_vacio(cantidad: int, timeout: float) -> dict:
+    consumidor = PulsarEventConsumer()
+    suscripcion = 'benchmark-vacio'
+    consumidor.subscribe_to_topic(consumidor.config.get_topic_name('benchmark-events'), suscripcion, lambda evento: None)
+    try:
+        return _publicar_y_medir('benchmark-events', suscripcion, mensajes_crear_partnership(cantidad), timeout)
+    finally:
+        consumidor.close()
+
+def bench_consumo_crear_partnership(app: Flask, cantidad: int, timeout: float) -> dict:
+    servicio = EventConsumerService(app, EventProcessingService(CommandExecutor(RegistroIdempotencia()), app))
+    servicio.start_consuming()
+    try:
+        return _publicar_y_medir('content-events', 'partner-lifecycle-subscription',
+                                 mensajes_crear_partnership(cantidad), timeout)
+    finally:
+        servicio.stop_consuming()
+
+def commit_actual() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:
+        return None
+
+def comparar(actual: dict, anterior: dict, prefijo: str = '') -> dict:
+    """Razón actual/anterior para cada métrica numérica presente en ambas ejecuciones"""
+    razones = {}
+    for clave, valor in actual.items():
+        previo = anterior.get(clave) if isinstance(anterior, dict) else None
+        if isinstance(valor, dict):
+            razones.update(comparar(valor, previo or {}, f"{prefijo}{clave}."))
+        elif isinstance(valor, (int, float)) and not isinstance(valor, bool) and isinstance(previo, (int, float)) and previo:
+            razones[f"{prefijo}{clave}"] = round(valor / previo, 3)
+    return razones
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL', 'sqlite://'))
+    parser.add_argument('--repeticiones', type=int, default=20000)
+    parser.add_argument('--comandos', type=int, default=2000)
+    parser.add_argument('--mensajes', type=int, default=5000)
+    parser.add_argument('--timeout', type=float, default=300.0)
+    parser.add_argument('--salida', help='Archivo JSON donde guardar los resultados')
+    parser.add_argument('--comparar', help='Archivo JSON de una ejecución anterior')
+    args = parser.parse_args()
+
+    # Los logs INFO por mensaje dominarían las mediciones
+    logging.basicConfig(level=logging.WARNING)
+
+    app = crear_app(args.database_url)
+    resultados = {
+        'metadatos': {
+            'fecha': datetime.utcnow().isoformat(),
+            'commit': commit_actual(),
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'base_de_datos': app.config['SQLALCHEMY_DATABASE_URI'].split(':', 1)[0],
+            'serializador': registro_serializadores.backend,
+            'parametros': {
+                'repeticiones': args.repeticiones, 'comandos': args.comandos, 'mensajes': args.mensajes
+            },
+        },
+        'despacho_comando': bench_despacho(args.repeticiones),
+        'crear_partnership': bench_crear_partnership(app, args.comandos),
+        'serializacion': bench_serializacion(args.repeticiones),
+        'consumo_ack_vacio': bench_consumo_vacio(args.mensajes, args.timeout),
+        'consumo_ack_crear_partnership': bench_consumo_crear_partnership(app, args.comandos, args.timeout),
+    }
+    if args.comparar:
+        with open(args.comparar) as archivo:
+            anterior = json.load(archivo)
+        resultados['comparacion'] = comparar(
+            {clave: valor for clave, valor in resultados.items() if clave != 'metadatos'}, anterior
+        )
+    if args.salida:
+        os.makedirs(os.path.dirname(os.path.abspath(args.salida)), exist_ok=True)
+        with open(args.salida, 'w') as archivo:
+            json.dump(resultados, archivo, indent=2)
+
+    json.dump(resultados, sys.stdout, indent=2)
+    print()
+
+if __name__ == '__main__':
+    main()
@@ -3,14 +3,35 @@
 -- Crear esquema si no existe
 CREATE SCHEMA IF NOT EXISTS partner_lifecycle;
 
+-- Crear tipos enum (mismos valores que los enums de dominio en dominio/entidades.py)
+DO $$ BEGIN
+    CREATE TYPE tipo_partnership AS ENUM (
+        'marca_afiliado', 'marca_influencer', 'marca_embajador',
+        'marca_socio_b2b', 'afiliado_influencer', 'influencer_embajador'
+    );
+EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
+
+DO $$ BEGIN
+    CREATE TYPE estado_partnership AS ENUM (
+        'iniciando', 'en_negociacion', 'activo', 'suspendido', 'terminado', 'renovado'
+    );
+EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
+
+DO $$ BEGIN
+    CREATE TYPE nivel_partnership AS ENUM ('bronce', 'plata', 'oro', 'platino', 'diamante');
+EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
+
 -- Crear tabla de partnerships
 CREATE TABLE IF NOT EXISTS partnerships (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     id_marca UUID NOT NULL,
     id_partner UUID NOT NULL,
-    tipo_partnership VARCHAR(50) NOT NULL,
-    estado VARCHAR(50) NOT NULL DEFAULT 'iniciando',
-    nivel VARCHAR(50) NOT NULL DEFAULT 'bronce',
+    tipo_partnership tipo_partnership NOT NULL,
+    estado estado_partnership NOT NULL DEFAULT 'iniciando',
+    nivel nivel_partnership NOT NULL DEFAULT 'bronce',
     fecha_inicio TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     fecha_fin TIMESTAMP,
     fecha_ultima_actividad TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
@@ -20,18 +41,131 @@ CREATE TABLE IF NOT EXISTS partnerships (
     beneficios_adicionales TEXT,
     notas TEXT,
     fecha_creacion TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-    fecha_actualizacion TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    fecha_actualizacion TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    version INTEGER NOT NULL DEFAULT 1
 );
 
 -- Crear índices para mejorar el rendimiento
-CREATE INDEX IF NOT EXISTS idx_partnerships_id_marca ON partnerships(id_marca);
-CREATE INDEX IF NOT EXISTS idx_partnerships_id_partner ON partnerships(id_partner);
+CREATE INDEX IF NOT EXISTS idx_partnerships_marca_estado ON partnerships(id_marca, estado, fecha_creacion, id);
+CREATE INDEX IF NOT EXISTS idx_partnerships_partner_estado ON partnerships(id_partner, estado, fecha_creacion, id);
+-- Índices parciales para los estados no terminales, los que se consultan en caliente
+CREATE INDEX IF NOT EXISTS idx_partnerships_marca_vigentes ON partnerships(id_marca, fecha_creacion, id)
+    WHERE estado IN ('iniciando', 'en_negociacion', 'activo');
+CREATE INDEX IF NOT EXISTS idx_partnerships_partner_vigentes ON partnerships(id_partner, fecha_creacion, id)
+    WHERE estado IN ('iniciando', 'en_negociacion', 'activo');
 CREATE INDEX IF NOT EXISTS idx_partnerships_estado ON partnerships(estado);
 CREATE INDEX IF NOT EXISTS idx_partnerships_tipo ON partnerships(tipo_partnership);
 CREATE INDEX IF NOT EXISTS idx_partnerships_nivel ON partnerships(nivel);
 CREATE INDEX IF NOT EXISTS idx_partnerships_fecha_creacion ON partnerships(fecha_creacion);
 
+-- Crear tabla outbox para publicar eventos de dominio de forma transaccional
+CREATE TABLE IF NOT EXISTS outbox (
+    id BIGSERIAL PRIMARY KEY,
+    id_agregado UUID,
+    saga_id VARCHAR(100),
+    event_type VARCHAR(100) NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    topic VARCHAR(255) NOT NULL,
+    payload BYTEA NOT NULL,
+    propiedades JSONB,
+    fecha_creacion TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    fecha_envio TIMESTAMP,
+    -- Publicaciones fallidas; al llegar al máximo la fila queda descartada (dead letter)
+    intentos INTEGER NOT NULL DEFAULT 0,
+    ultimo_error TEXT,
+    fecha_descarte TIMESTAMP
+);
+
+-- Índice parcial para drenar pendientes en orden y otro para podar enviados
+CREATE INDEX IF NOT EXISTS idx_outbox_pendientes ON outbox(id) WHERE fecha_envio IS NULL;
+CREATE INDEX IF NOT EXISTS idx_outbox_fecha_envio ON outbox(fecha_envio);
+
+-- Crear tabla de mensajes procesados para que los comandos de una saga sean idempotentes
+CREATE TABLE IF NOT EXISTS mensajes_procesados (
+    saga_id VARCHAR(100) NOT NULL,
+    tipo_comando VARCHAR(100) NOT NULL,
+    resultado VARCHAR(20) NOT NULL,
+    error TEXT,
+    fecha_procesamiento TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (saga_id, tipo_comando)
+);
+
+-- Crear read model del resumen por marca: último estado proyectado de cada partnership
+CREATE TABLE IF NOT EXISTS proyeccion_partnerships (
+    id_partnership UUID PRIMARY KEY,
+    id_marca UUID NOT NULL,
+    tipo_partnership VARCHAR(50) NOT NULL,
+    estado VARCHAR(50) NOT NULL,
+    nivel VARCHAR(50) NOT NULL,
+    metas_mensuales INTEGER NOT NULL DEFAULT 0,
+    -- Secuencia del último evento aplicado: los eventos con secuencia menor o igual se omiten
+    secuencia INTEGER
+);
+
+-- Contadores por marca y dimensión (estado, nivel, tipo_partnership, metas_mensuales)
+CREATE TABLE IF NOT EXISTS resumen_marcas (
+    id_marca UUID NOT NULL,
+    dimension VARCHAR(30) NOT NULL,
+    valor VARCHAR(50) NOT NULL,
+    cantidad BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (id_marca, dimension, valor)
+);
+
+-- Almacén append-only de eventos por partnership: sequence es la versión resultante del evento
+CREATE TABLE IF NOT EXISTS partnership_events (
+    id_partnership UUID NOT NULL,
+    sequence INTEGER NOT NULL,
+    event_id UUID NOT NULL,
+    event_type VARCHAR(100) NOT NULL,
+    payload JSONB NOT NULL,
+    cambios JSONB,
+    fecha_registro TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id_partnership, sequence)
+);
+
+-- El replay desde Pulsar resuelve la secuencia de cada evento por su id
+CREATE INDEX IF NOT EXISTS ix_partnership_events_event_id ON partnership_events(event_id);
+
+-- Estado completo de la partnership en la secuencia 1 y cada N eventos
+CREATE TABLE IF NOT EXISTS partnership_snapshots (
+    id_partnership UUID NOT NULL,
+    sequence INTEGER NOT NULL,
+    estado JSONB NOT NULL,
+    fecha_registro TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id_partnership, sequence)
+);
+
+-- Último mensaje aplicado por proyector y topic en la reconstrucción desde Pulsar
+CREATE TABLE IF NOT EXISTS replay_checkpoints (
+    proyector VARCHAR(100) NOT NULL,
+    topic VARCHAR(255) NOT NULL,
+    message_id BYTEA NOT NULL,
+    mensajes BIGINT NOT NULL DEFAULT 0,
+    fecha_actualizacion TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (proyector, topic)
+);
+
 -- Insertar datos de ejemplo
 INSERT INTO partnerships (id, id_marca, id_partner, tipo_partnership, estado, nivel, terminos_contrato, comision_porcentaje, metas_mensuales, beneficios_adicionales) VALUES
     (gen_random_uuid(), gen_random_uuid(), gen_random_uuid(), 'marca_afiliado', 'activo', 'plata', 'Contrato de afiliación estándar', 15.0, 100, 'Descuentos especiales, material promocional'),
     (gen_random_uuid(), gen_random_uuid(), gen_random_uuid(), 'marca_influencer', 'en_negociacion', 'bronce', 'Negociación en curso', 10.0, 50, 'Productos gratuitos para review');
+
+-- Poblar el read model con los datos de ejemplo
+INSERT INTO proyeccion_partnerships (id_partnership, id_marca, tipo_partnership, estado, nivel, metas_mensuales, secuencia)
+SELECT id, id_marca, tipo_partnership::text, estado::text, nivel::text, COALESCE(metas_mensuales, 0), version FROM partnerships
+ON CONFLICT (id_partnership) DO NOTHING;
+
+INSERT INTO resumen_marcas (id_marca, dimension, valor, cantidad)
+SELECT id_marca, 'estado', estado, COUNT(*) FROM proyeccion_partnerships GROUP BY id_marca, estado
+UNION ALL
+SELECT id_marca, 'nivel', nivel, COUNT(*) FROM proyeccion_partnerships GROUP BY id_marca, nivel
+UNION ALL
+SELECT id_marca, 'tipo_partnership', tipo_partnership, COUNT(*) FROM proyeccion_partnerships GROUP BY id_marca, tipo_partnership
+UNION ALL
+SELECT id_marca, 'metas_mensuales', 'suma', SUM(metas_mensuales) FROM proyeccion_partnerships GROUP BY id_marca
+ON CONFLICT (id_marca, dimension, valor) DO NOTHING;
+
+-- Snapshot inicial de los datos de ejemplo en el almacén de eventos
+INSERT INTO partnership_snapshots (id_partnership, sequence, estado)
+SELECT p.id, p.version, to_jsonb(p) FROM partnerships p
+ON CONFLICT (id_partnership, sequence) DO NOTHING;
@@ -0,0 +1,8 @@
+-- Migración: versión de concurrencia optimista de partnerships
+--
+-- partnerships.version se incrementa en cada transición y los UPDATE se condicionan a ella; el
+-- almacén de eventos (004) la usa como secuencia y el read model (006) como último evento aplicado.
+-- En bases creadas antes de init.sql con la columna, se agrega con las filas existentes en la versión 1.
+-- Debe aplicarse antes que el resto de las migraciones. Es idempotente.
+
+ALTER TABLE partnerships ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
@@ -0,0 +1,52 @@
+-- Migración: estado, tipo_partnership y nivel como enums nativos de Postgres
+--
+-- Reemplaza VARCHAR(50) (init.sql) o los enums con nombres en mayúscula creados por
+-- SQLAlchemy (tipopartnershipenum, estadopartnershipenum, nivelpartnershipenum) por tipos
+-- enum con los valores en minúscula del dominio. Cada valor ocupa 4 bytes por fila.
+--
+-- El ALTER ... TYPE reescribe la tabla y sus índices con un ACCESS EXCLUSIVE lock:
+-- ejecutar en una ventana de mantenimiento. Es idempotente.
+
+BEGIN;
+
+DO $$ BEGIN
+    CREATE TYPE tipo_partnership AS ENUM (
+        'marca_afiliado', 'marca_influencer', 'marca_embajador',
+        'marca_socio_b2b', 'afiliado_influencer', 'influencer_embajador'
+    );
+EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
+
+DO $$ BEGIN
+    CREATE TYPE estado_partnership AS ENUM (
+        'iniciando', 'en_negociacion', 'activo', 'suspendido', 'terminado', 'renovado'
+    );
+EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
+
+DO $$ BEGIN
+    CREATE TYPE nivel_partnership AS ENUM ('bronce', 'plata', 'oro', 'platino', 'diamante');
+EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
+
+-- Los defaults en VARCHAR no se convierten automáticamente al nuevo tipo
+ALTER TABLE partnerships ALTER COLUMN estado DROP DEFAULT;
+ALTER TABLE partnerships ALTER COLUMN nivel DROP DEFAULT;
+
+-- lower() normaliza las filas escritas por el ORM con el nombre del miembro (EN_NEGOCIACION)
+ALTER TABLE partnerships
+    ALTER COLUMN tipo_partnership TYPE tipo_partnership USING lower(tipo_partnership::text)::tipo_partnership,
+    ALTER COLUMN estado TYPE estado_partnership USING lower(estado::text)::estado_partnership,
+    ALTER COLUMN nivel TYPE nivel_partnership USING lower(nivel::text)::nivel_partnership;
+
+ALTER TABLE partnerships ALTER COLUMN estado SET DEFAULT 'iniciando';
+ALTER TABLE partnerships ALTER COLUMN nivel SET DEFAULT 'bronce';
+
+DROP TYPE IF EXISTS tipopartnershipenum;
+DROP TYPE IF EXISTS estadopartnershipenum;
+DROP TYPE IF EXISTS nivelpartnershipenum;
+
+COMMIT;
+
+-- Actualizar estadísticas después de la reescritura
+ANALYZE partnerships;
@@ -0,0 +1,29 @@
+-- Migración: índices compuestos y parciales para los patrones de consulta del ciclo de vida
+--
+-- Las consultas habituales son "partnerships activas de la marca X" y "partnerships del
+-- partner Y en estado Z", paginadas por (fecha_creacion, id). Los índices compuestos
+-- resuelven filtro y orden con un solo recorrido; los parciales cubren solo los estados
+-- no terminales (iniciando, en_negociacion, activo), que son los que se consultan en caliente.
+--
+-- CREATE/DROP INDEX CONCURRENTLY no bloquea escrituras pero no puede ejecutarse dentro de
+-- una transacción: aplicar con psql sin --single-transaction. Es idempotente.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_partnerships_marca_estado
+    ON partnerships (id_marca, estado, fecha_creacion, id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_partnerships_partner_estado
+    ON partnerships (id_partner, estado, fecha_creacion, id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_partnerships_marca_vigentes
+    ON partnerships (id_marca, fecha_creacion, id)
+    WHERE estado IN ('iniciando', 'en_negociacion', 'activo');
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_partnerships_partner_vigentes
+    ON partnerships (id_partner, fecha_creacion, id)
+    WHERE estado IN ('iniciando', 'en_negociacion', 'activo');
+
+-- Redundantes: son prefijo de los índices compuestos
+DROP INDEX CONCURRENTLY IF EXISTS idx_partnerships_id_marca;
+DROP INDEX CONCURRENTLY IF EXISTS idx_partnerships_id_partner;
+
+ANALYZE partnerships;
@@ -0,0 +1,8 @@
+-- Migración: propiedades de mensaje en la outbox
+--
+-- Cada fila guarda las propiedades con que se publica en Pulsar (content-type y
+-- schema-version), necesarias para publicar cuerpos msgpack. Las filas existentes quedan
+-- en NULL y se publican sin propiedades, que los consumidores tratan como JSON.
+-- Agregar una columna nullable sin default no reescribe la tabla. Es idempotente.
+
+ALTER TABLE outbox ADD COLUMN IF NOT EXISTS propiedades JSONB;
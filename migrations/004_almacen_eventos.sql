@@ -0,0 +1,30 @@
+-- Migración: almacén de eventos y snapshots de partnerships
+--
+-- partnership_events guarda cada evento del ciclo de vida con su secuencia (la versión que
+-- dejó en la partnership) y los valores de columna que cambió. partnership_snapshots guarda
+-- el estado completo en la secuencia 1 y cada EVENT_STORE_SNAPSHOT_INTERVAL eventos.
+-- Las partnerships existentes no tienen historia: se les crea un snapshot de su estado actual
+-- en su versión actual, desde el cual el repositorio puede reconstruirlas. Es idempotente.
+
+CREATE TABLE IF NOT EXISTS partnership_events (
+    id_partnership UUID NOT NULL,
+    sequence INTEGER NOT NULL,
+    event_id UUID NOT NULL,
+    event_type VARCHAR(100) NOT NULL,
+    payload JSONB NOT NULL,
+    cambios JSONB,
+    fecha_registro TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id_partnership, sequence)
+);
+
+CREATE TABLE IF NOT EXISTS partnership_snapshots (
+    id_partnership UUID NOT NULL,
+    sequence INTEGER NOT NULL,
+    estado JSONB NOT NULL,
+    fecha_registro TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id_partnership, sequence)
+);
+
+INSERT INTO partnership_snapshots (id_partnership, sequence, estado)
+SELECT p.id, p.version, to_jsonb(p) FROM partnerships p
+ON CONFLICT (id_partnership, sequence) DO NOTHING;
@@ -0,0 +1,14 @@
+-- Migración: checkpoints de la reconstrucción de proyecciones desde Pulsar
+--
+-- replay_checkpoints guarda, por proyector y topic, el MessageId serializado del último mensaje
+-- cuyo lote se aplicó. Se actualiza en la misma transacción que el read model, de modo que una
+-- reconstrucción interrumpida continúa desde el mensaje siguiente. Es idempotente.
+
+CREATE TABLE IF NOT EXISTS replay_checkpoints (
+    proyector VARCHAR(100) NOT NULL,
+    topic VARCHAR(255) NOT NULL,
+    message_id BYTEA NOT NULL,
+    mensajes BIGINT NOT NULL DEFAULT 0,
+    fecha_actualizacion TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (proyector, topic)
+);
@@ -0,0 +1,17 @@
+-- Migración: secuencia del último evento aplicado al read model de partnerships
+--
+-- proyeccion_partnerships.secuencia guarda la secuencia en el almacén de eventos (la versión de la
+-- partnership) del último evento aplicado; el proyector omite los eventos con secuencia menor o igual,
+-- así un replay sobre el read model no vuelve a contarlos. Las filas existentes se mantuvieron en la
+-- misma transacción que cada cambio, por lo que toman la versión actual de su partnership.
+-- El índice sobre partnership_events.event_id resuelve la secuencia de los eventos leídos de Pulsar.
+-- Usa CONCURRENTLY, por lo que no se debe ejecutar dentro de una transacción. Es idempotente.
+
+ALTER TABLE proyeccion_partnerships ADD COLUMN IF NOT EXISTS secuencia INTEGER;
+
+UPDATE proyeccion_partnerships p
+SET secuencia = pa.version
+FROM partnerships pa
+WHERE pa.id = p.id_partnership AND p.secuencia IS NULL;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_partnership_events_event_id ON partnership_events (event_id);
@@ -0,0 +1,10 @@
+-- Migración: intentos y descarte (dead letter) de eventos de la outbox
+--
+-- El relay suma un intento y guarda el error cada vez que la primera fila pendiente no se
+-- puede publicar. Al llegar a OUTBOX_MAX_INTENTOS la fila queda con fecha_descarte y el relay
+-- sigue con las siguientes; se vuelve a publicar poniendo fecha_descarte en NULL.
+-- Las columnas nullable o con default constante no reescriben la tabla. Es idempotente.
+
+ALTER TABLE outbox ADD COLUMN IF NOT EXISTS intentos INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE outbox ADD COLUMN IF NOT EXISTS ultimo_error TEXT;
+ALTER TABLE outbox ADD COLUMN IF NOT EXISTS fecha_descarte TIMESTAMP;
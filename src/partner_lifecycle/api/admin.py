@@ -0,0 +1,93 @@
+"""API de administración
+
+En este archivo se definen los endpoints de diagnóstico del proceso: el muestreo de pilas de
+todos los hilos y los perfiles cProfile de las peticiones muestreadas. Requieren el token
+ADMIN_TOKEN en el encabezado ``Authorization: Bearer``; sin ADMIN_TOKEN no están disponibles.
+También se consultan y cambian en caliente los niveles de log por módulo.
+
+"""
+
+import os
+import hmac
+import json
+from flask import Blueprint, Response, request, send_file
+from partner_lifecycle.infraestructura.perfilador import (
+    muestreador_pilas, perfilador_peticiones, PerfilEnCursoExcepcion
+)
+from partner_lifecycle.config.logs import pipeline_logs
+
+bp = Blueprint('admin', __name__, url_prefix='/admin')
+
+def _error(mensaje: str, status: int) -> Response:
+    return Response(json.dumps(dict(error=mensaje)), status=status, mimetype='application/json')
+
+@bp.before_request
+def autenticar():
+    token = os.getenv('ADMIN_TOKEN')
+    if not token:
+        return _error('No encontrado', 404)
+    encabezado = request.headers.get('Authorization', '')
+    if not encabezado.startswith('Bearer ') or not hmac.compare_digest(encabezado[7:].encode(), token.encode()):
+        return _error('No autorizado', 401)
+
+@bp.route('/perfil', methods=['GET'])
+def perfil():
+    """Muestrea las pilas de todos los hilos durante ``segundos``
+
+    Parámetros: ``segundos`` (10), ``intervalo_ms`` (10), ``lineas`` (false), ``hilos`` (true) y
+    ``formato`` (collapsed o json).
+    """
+    try:
+        segundos = float(request.args.get('segundos', '10'))
+        intervalo = float(request.args.get('intervalo_ms', '10')) / 1000
+    except ValueError as e:
+        return _error(str(e), 400)
+    con_lineas = request.args.get('lineas', 'false').lower() == 'true'
+    por_hilo = request.args.get('hilos', 'true').lower() == 'true'
+    try:
+        conteos, muestras = muestreador_pilas.muestrear(segundos, intervalo, con_lineas, por_hilo)
+    except PerfilEnCursoExcepcion as e:
+        return _error(str(e), 409)
+    if request.args.get('formato', 'collapsed') == 'json':
+        resultado = {'muestras': muestras, 'intervalo_ms': intervalo * 1000, 'pilas': dict(conteos.most_common())}
+        return Response(json.dumps(resultado), status=200, mimetype='application/json')
+    return Response(muestreador_pilas.collapsed(conteos), status=200, mimetype='text/plain',
+                    headers={'Content-Disposition': 'attachment; filename=perfil.collapsed'})
+
+@bp.route('/perfil/peticiones', methods=['GET'])
+def perfiles_peticiones():
+    """Perfiles cProfile recientes de las peticiones muestreadas, del más reciente al más antiguo"""
+    resultado = {
+        'proporcion': perfilador_peticiones.proporcion,
+        'items': list(reversed(list(perfilador_peticiones.recientes))),
+    }
+    return Response(json.dumps(resultado), status=200, mimetype='application/json')
+
+@bp.route('/perfil/peticiones/<nombre>', methods=['GET'])
+def descargar_perfil_peticion(nombre):
+    """Archivo .prof de un perfil reciente (pstats, snakeviz)"""
+    ruta = perfilador_peticiones.ruta_archivo(nombre)
+    if ruta is None or not os.path.exists(ruta):
+        return _error('Perfil no encontrado', 404)
+    return send_file(ruta, mimetype='application/octet-stream', as_attachment=True, download_name=nombre)
+
+@bp.route('/logs', methods=['GET'])
+def niveles_logs():
+    """Nivel del logger raíz y de los módulos con nivel propio"""
+    return Response(json.dumps(pipeline_logs.niveles()), status=200, mimetype='application/json')
+
+@bp.route('/logs', methods=['PUT'])
+def cambiar_niveles_logs():
+    """Cambia niveles por módulo: ``{"partner_lifecycle.infraestructura.pulsar": "DEBUG"}``
+
+    ``null`` o ``NOTSET`` hace que el módulo vuelva a heredar el nivel; ``root`` es el logger raíz.
+    """
+    niveles = request.get_json(silent=True)
+    if not isinstance(niveles, dict):
+        return _error('Se esperaba un objeto {modulo: nivel}', 400)
+    try:
+        for modulo, nivel in niveles.items():
+            pipeline_logs.establecer_nivel('' if modulo == 'root' else modulo, nivel)
+    except (ValueError, AttributeError) as e:
+        return _error(str(e), 400)
+    return Response(json.dumps(pipeline_logs.niveles()), status=200, mimetype='application/json')
@@ -0,0 +1,15 @@
+"""API de métricas
+
+En este archivo se define el endpoint /metrics que expone las métricas del servicio
+en formato de texto de Prometheus
+
+"""
+
+from flask import Blueprint, Response
+from partner_lifecycle.infraestructura.metricas import registro_metricas, CONTENT_TYPE
+
+bp = Blueprint('metricas', __name__)
+
+@bp.route('/metrics', methods=['GET'])
+def metricas():
+    return Response(registro_metricas.exportar(), mimetype=None, content_type=CONTENT_TYPE)
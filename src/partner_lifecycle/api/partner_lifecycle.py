@@ -7,11 +7,23 @@ En este archivo se define la API REST para la gestión del ciclo de vida de part
 from flask import Blueprint, request, jsonify, Response
 from partner_lifecycle.modulos.partner_lifecycle.aplicacion.comandos.comandos_partnership import (
     CrearPartnership, IniciarNegociacionPartnership, ActivarPartnership, 
-    SuspenderPartnership, TerminarPartnership, RenovarPartnership, ActualizarNivelPartnership
+    SuspenderPartnership, TerminarPartnership, RenovarPartnership, ActualizarNivelPartnership,
+    CrearPartnershipsEnLote
+)
+from partner_lifecycle.modulos.partner_lifecycle.aplicacion.queries.queries_partnership import (
+    ObtenerPartnership, ListarPartnerships, ObtenerResumenMarca,
+    ObtenerHistorialPartnership, ObtenerPartnershipEnFecha
 )
 from partner_lifecycle.seedwork.aplicacion.comandos import ejecutar_commando
-from partner_lifecycle.seedwork.dominio.excepciones import ExcepcionDominio
+from partner_lifecycle.seedwork.aplicacion.queries import ejecutar_query
+from partner_lifecycle.seedwork.dominio.excepciones import ExcepcionDominio, ConflictoConcurrenciaExcepcion
+from partner_lifecycle.modulos.partner_lifecycle.dominio.excepciones import (
+    PartnershipNoEncontradaExcepcion, TransicionInvalidaExcepcion
+)
+from partner_lifecycle.modulos.partner_lifecycle.aplicacion.handlers.crear_partnerships_lote_handler import MAX_FILAS_POR_INSERT
+from partner_lifecycle.config.logs import registrar_payload
 from datetime import datetime
+import os
 import json
 import uuid
 import logging
@@ -20,26 +32,34 @@ logger = logging.getLogger(__name__)
 
 bp = Blueprint('partner_lifecycle', __name__, url_prefix='/partner-lifecycle')
 
+# Filas por INSERT multi-fila en la creación masiva, acotadas por el límite de parámetros de Postgres
+BULK_CHUNK_SIZE = min(int(os.getenv('BULK_CHUNK_SIZE', '1000')), MAX_FILAS_POR_INSERT)
+
+def _comando_crear_partnership(partnership_dict: dict) -> CrearPartnership:
+    """Construye el comando CrearPartnership a partir del cuerpo de la petición"""
+    return CrearPartnership(
+        id=partnership_dict.get('id', str(uuid.uuid4())),
+        saga_id=partnership_dict.get('saga_id'),
+        id_marca=partnership_dict.get('id_marca', str(uuid.uuid4())),
+        id_partner=partnership_dict.get('id_identificacion', str(uuid.uuid4())),
+        tipo_partnership=partnership_dict.get('tipo_partnership', 'marca_embajador'),
+        terminos_contrato=partnership_dict.get('canales', ''),
+        comision_porcentaje=partnership_dict.get('comision_porcentaje', 0.0),
+        metas_mensuales=partnership_dict.get('metas_mensuales', 0),
+        beneficios_adicionales=partnership_dict.get('campania_asociada', ''),
+        notas=partnership_dict.get('categoria', ''),
+        fecha_creacion=datetime.now().isoformat(),
+        fecha_actualizacion=datetime.now().isoformat()
+    )
+
 @bp.route('/partnership', methods=['POST'])
 def crear_partnership():
     try:
         partnership_dict = request.json
-        logger.info(f"Request data: {partnership_dict}")
+        registrar_payload(logger, "Petición crear partnership", partnership_dict.get('saga_id'), partnership_dict)
         
         #Nuevos mensajes 
-        comando = CrearPartnership(
-            id=partnership_dict.get('id', str(uuid.uuid4())),
-            id_marca=partnership_dict.get('id_marca', str(uuid.uuid4())),
-            id_partner=partnership_dict.get('id_identificacion', str(uuid.uuid4())),
-            tipo_partnership=partnership_dict.get('tipo_partnership', 'marca_embajador'),
-            terminos_contrato=partnership_dict.get('canales', ''),
-            comision_porcentaje=partnership_dict.get('comision_porcentaje', 0.0),
-            metas_mensuales=partnership_dict.get('metas_mensuales', 0),
-            beneficios_adicionales=partnership_dict.get('campania_asociada', ''),
-            notas=partnership_dict.get('categoria', ''),
-            fecha_creacion=datetime.now().isoformat(),
-            fecha_actualizacion=datetime.now().isoformat()
-        )
+        comando = _comando_crear_partnership(partnership_dict)
         
         ejecutar_commando(comando)
         
@@ -47,6 +67,117 @@ def crear_partnership():
     except ExcepcionDominio as e:
         return Response(json.dumps(dict(error=str(e))), status=400, mimetype='application/json')
 
+def _leer_filas_bulk():
+    """Itera las filas del cuerpo, ya sea un arreglo JSON o un stream NDJSON"""
+    if request.mimetype in ('application/x-ndjson', 'application/ndjson'):
+        for linea in request.stream:
+            linea = linea.strip()
+            if not linea:
+                continue
+            try:
+                yield json.loads(linea), None
+            except ValueError as e:
+                yield None, f"JSON inválido: {e}"
+    else:
+        filas = request.get_json(silent=True)
+        if not isinstance(filas, list):
+            raise ExcepcionDominio("Se esperaba un arreglo JSON o un stream NDJSON")
+        for fila in filas:
+            yield fila, None
+
+@bp.route('/partnerships:bulk', methods=['POST'])
+def crear_partnerships_bulk():
+    try:
+        resultados = []
+        comandos, indices = [], []
+        
+        def _ejecutar_lote():
+            if comandos:
+                resultados.extend(ejecutar_commando(CrearPartnershipsEnLote(comandos=list(comandos), indices=list(indices))))
+                comandos.clear()
+                indices.clear()
+        
+        for indice, (fila, error) in enumerate(_leer_filas_bulk()):
+            if error is None and not isinstance(fila, dict):
+                error = "Cada fila debe ser un objeto JSON"
+            if error is None:
+                try:
+                    comandos.append(_comando_crear_partnership(fila))
+                    indices.append(indice)
+                except (TypeError, ValueError) as e:
+                    error = str(e)
+            if error is not None:
+                # Las filas inválidas se reportan sin abortar el lote en curso
+                resultados.append({'indice': indice, 'id': None, 'estado': 'error', 'error': error})
+            if len(comandos) >= BULK_CHUNK_SIZE:
+                _ejecutar_lote()
+        _ejecutar_lote()
+        resultados.sort(key=lambda r: r['indice'])
+        
+        resumen = {
+            'total': len(resultados),
+            'creados': sum(1 for r in resultados if r['estado'] == 'creado'),
+            'duplicados': sum(1 for r in resultados if r['estado'] == 'duplicado'),
+            'errores': sum(1 for r in resultados if r['estado'] == 'error'),
+            'resultados': resultados
+        }
+        return Response(json.dumps(resumen), status=200, mimetype='application/json')
+    except ExcepcionDominio as e:
+        return Response(json.dumps(dict(error=str(e))), status=400, mimetype='application/json')
+
+@bp.route('/partnership/<id>', methods=['GET'])
+def obtener_partnership(id):
+    try:
+        partnership = ejecutar_query(ObtenerPartnership(id_partnership=id))
+        if partnership is None:
+            return Response(json.dumps(dict(error='Partnership no encontrada')), status=404, mimetype='application/json')
+        return Response(json.dumps(partnership), status=200, mimetype='application/json')
+    except ExcepcionDominio as e:
+        return Response(json.dumps(dict(error=str(e))), status=400, mimetype='application/json')
+
+@bp.route('/partnership/<id>/historial', methods=['GET'])
+def obtener_historial_partnership(id):
+    try:
+        historial = ejecutar_query(ObtenerHistorialPartnership(id_partnership=id, hasta=request.args.get('hasta')))
+        return Response(json.dumps({'items': historial}), status=200, mimetype='application/json')
+    except ExcepcionDominio as e:
+        return Response(json.dumps(dict(error=str(e))), status=400, mimetype='application/json')
+
+@bp.route('/partnership/<id>/en-fecha', methods=['GET'])
+def obtener_partnership_en_fecha(id):
+    try:
+        partnership = ejecutar_query(ObtenerPartnershipEnFecha(id_partnership=id, fecha=request.args.get('fecha')))
+        if partnership is None:
+            return Response(json.dumps(dict(error='Partnership no encontrada en la fecha indicada')), status=404, mimetype='application/json')
+        return Response(json.dumps(partnership), status=200, mimetype='application/json')
+    except ExcepcionDominio as e:
+        return Response(json.dumps(dict(error=str(e))), status=400, mimetype='application/json')
+
+@bp.route('/partnerships', methods=['GET'])
+def listar_partnerships():
+    try:
+        query = ListarPartnerships(
+            id_marca=request.args.get('id_marca'),
+            id_partner=request.args.get('id_partner'),
+            estado=request.args.get('estado'),
+            nivel=request.args.get('nivel'),
+            tipo_partnership=request.args.get('tipo_partnership'),
+            cursor=request.args.get('cursor'),
+            limite=request.args.get('limite', 50, type=int)
+        )
+        resultado = ejecutar_query(query)
+        return Response(json.dumps(resultado), status=200, mimetype='application/json')
+    except ExcepcionDominio as e:
+        return Response(json.dumps(dict(error=str(e))), status=400, mimetype='application/json')
+
+@bp.route('/marcas/<id_marca>/resumen', methods=['GET'])
+def obtener_resumen_marca(id_marca):
+    try:
+        resumen = ejecutar_query(ObtenerResumenMarca(id_marca=id_marca))
+        return Response(json.dumps(resumen), status=200, mimetype='application/json')
+    except ExcepcionDominio as e:
+        return Response(json.dumps(dict(error=str(e))), status=400, mimetype='application/json')
+
 @bp.route('/partnership/<id>/iniciar-negociacion', methods=['PUT'])
 def iniciar_negociacion_partnership(id):
     try:
@@ -56,12 +187,17 @@ def iniciar_negociacion_partnership(id):
         comando = IniciarNegociacionPartnership(
             id_partnership=id,
             terminos=terminos,
-            fecha_actualizacion=datetime.now().isoformat()
+            fecha_actualizacion=datetime.now().isoformat(),
+            version=data.get('version') if data else None
         )
         
         ejecutar_commando(comando)
         
         return Response('{}', status=202, mimetype='application/json')
+    except PartnershipNoEncontradaExcepcion as e:
+        return Response(json.dumps(dict(error=str(e))), status=404, mimetype='application/json')
+    except (TransicionInvalidaExcepcion, ConflictoConcurrenciaExcepcion) as e:
+        return Response(json.dumps(dict(error=str(e))), status=409, mimetype='application/json')
     except ExcepcionDominio as e:
         return Response(json.dumps(dict(error=str(e))), status=400, mimetype='application/json')
 
@@ -76,12 +212,17 @@ def activar_partnership(id):
             id_partnership=id,
             comision_porcentaje=comision,
             metas_mensuales=metas,
-            fecha_actualizacion=datetime.now().isoformat()
+            fecha_actualizacion=datetime.now().isoformat(),
+            version=data.get('version') if data else None
         )
         
         ejecutar_commando(comando)
         
         return Response('{}', status=202, mimetype='application/json')
+    except PartnershipNoEncontradaExcepcion as e:
+        return Response(json.dumps(dict(error=str(e))), status=404, mimetype='application/json')
+    except (TransicionInvalidaExcepcion, ConflictoConcurrenciaExcepcion) as e:
+        return Response(json.dumps(dict(error=str(e))), status=409, mimetype='application/json')
     except ExcepcionDominio as e:
         return Response(json.dumps(dict(error=str(e))), status=400, mimetype='application/json')
 
@@ -94,12 +235,17 @@ def suspender_partnership(id):
         comando = SuspenderPartnership(
             id_partnership=id,
             motivo=motivo,
-            fecha_actualizacion=datetime.now().isoformat()
+            fecha_actualizacion=datetime.now().isoformat(),
+            version=data.get('version') if data else None
         )
         
         ejecutar_commando(comando)
         
         return Response('{}', status=202, mimetype='application/json')
+    except PartnershipNoEncontradaExcepcion as e:
+        return Response(json.dumps(dict(error=str(e))), status=404, mimetype='application/json')
+    except (TransicionInvalidaExcepcion, ConflictoConcurrenciaExcepcion) as e:
+        return Response(json.dumps(dict(error=str(e))), status=409, mimetype='application/json')
     except ExcepcionDominio as e:
         return Response(json.dumps(dict(error=str(e))), status=400, mimetype='application/json')
 
@@ -112,12 +258,17 @@ def terminar_partnership(id):
         comando = TerminarPartnership(
             id_partnership=id,
             motivo=motivo,
-            fecha_actualizacion=datetime.now().isoformat()
+            fecha_actualizacion=datetime.now().isoformat(),
+            version=data.get('version') if data else None
         )
         
         ejecutar_commando(comando)
         
         return Response('{}', status=202, mimetype='application/json')
+    except PartnershipNoEncontradaExcepcion as e:
+        return Response(json.dumps(dict(error=str(e))), status=404, mimetype='application/json')
+    except (TransicionInvalidaExcepcion, ConflictoConcurrenciaExcepcion) as e:
+        return Response(json.dumps(dict(error=str(e))), status=409, mimetype='application/json')
     except ExcepcionDominio as e:
         return Response(json.dumps(dict(error=str(e))), status=400, mimetype='application/json')
 
@@ -132,12 +283,17 @@ def renovar_partnership(id):
             id_partnership=id,
             nueva_fecha_fin=nueva_fecha_fin,
             nuevos_terminos=nuevos_terminos,
-            fecha_actualizacion=datetime.now().isoformat()
+            fecha_actualizacion=datetime.now().isoformat(),
+            version=data.get('version') if data else None
         )
         
         ejecutar_commando(comando)
         
         return Response('{}', status=202, mimetype='application/json')
+    except PartnershipNoEncontradaExcepcion as e:
+        return Response(json.dumps(dict(error=str(e))), status=404, mimetype='application/json')
+    except (TransicionInvalidaExcepcion, ConflictoConcurrenciaExcepcion) as e:
+        return Response(json.dumps(dict(error=str(e))), status=409, mimetype='application/json')
     except ExcepcionDominio as e:
         return Response(json.dumps(dict(error=str(e))), status=400, mimetype='application/json')
 
@@ -150,11 +306,16 @@ def actualizar_nivel_partnership(id):
         comando = ActualizarNivelPartnership(
             id_partnership=id,
             nuevo_nivel=nuevo_nivel,
-            fecha_actualizacion=datetime.now().isoformat()
+            fecha_actualizacion=datetime.now().isoformat(),
+            version=data.get('version') if data else None
         )
         
         ejecutar_commando(comando)
         
         return Response('{}', status=202, mimetype='application/json')
+    except PartnershipNoEncontradaExcepcion as e:
+        return Response(json.dumps(dict(error=str(e))), status=404, mimetype='application/json')
+    except (TransicionInvalidaExcepcion, ConflictoConcurrenciaExcepcion) as e:
+        return Response(json.dumps(dict(error=str(e))), status=409, mimetype='application/json')
     except ExcepcionDominio as e:
         return Response(json.dumps(dict(error=str(e))), status=400, mimetype='application/json')
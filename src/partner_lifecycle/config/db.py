@@ -1,8 +1,142 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.dialects import postgresql, sqlite
+import os
+import time
+import logging
+import importlib.util
 
+logger = logging.getLogger(__name__)
 
 db = SQLAlchemy()
 
+def _bool_env(nombre: str, por_defecto: str) -> bool:
+    return os.getenv(nombre, por_defecto).lower() in ('1', 'true', 'yes')
+
+class PoolConMedicion(QueuePool):
+    """QueuePool que registra las esperas de checkout que superan el umbral configurado"""
+
+    umbral_espera = float(os.getenv('DB_POOL_CHECKOUT_WARN_MS', '100')) / 1000
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        conexion = super()._do_get()
+        espera = time.perf_counter() - inicio
+        if espera > self.umbral_espera:
+            logger.warning(
+                f"Checkout lento del pool: {espera * 1000:.1f} ms "
+                f"(en uso {self.checkedout()}, tamaño {self.size()}, overflow {self.overflow()})"
+            )
+        return conexion
+
+def saturacion_pool(pool) -> float:
+    """Fracción de conexiones en uso sobre el máximo del pool (pool_size + max_overflow)
+
+    Los pools que no son QueuePool (SQLite) no tienen límite y se reportan sin saturación.
+    """
+    if not isinstance(pool, QueuePool):
+        return 0.0
+    maximo = pool.size() + max(0, pool._max_overflow)
+    return pool.checkedout() / maximo if maximo else 0.0
+
+def medidor_saturacion_pool(app: Flask):
+    """Función sin argumentos que mide la saturación del pool del engine de la aplicación"""
+    def _medir() -> float:
+        with app.app_context():
+            return saturacion_pool(db.engine.pool)
+    return _medir
+
+def _hilos_consumidor() -> tuple:
+    """Hilos del consumidor que usan el pool de la aplicación y conexiones del engine async
+
+    Runtime de hilos: por topic consumido, el hilo de recepción (ejecuta los handlers con un solo
+    worker y en modo lote) más los workers. Runtime asyncio: los hilos del executor que ejecutan
+    los handlers síncronos, más el engine async (asyncpg) con su propio pool sin overflow.
+    """
+    if os.getenv('CONSUMER_RUNTIME', 'threads').lower() == 'asyncio':
+        hilos = int(os.getenv('ASYNC_CONSUMER_CONCURRENCY', '16'))
+        conexiones_async = 0
+        if importlib.util.find_spec('asyncpg') is not None:
+            conexiones_async = int(os.getenv('ASYNC_CONSUMER_DB_POOL_SIZE', '5'))
+        return hilos, conexiones_async
+    topics = int(os.getenv('PULSAR_CONSUMER_TOPICS', '1'))
+    workers = max(1, int(os.getenv('PULSAR_CONSUMER_WORKERS', '1')))
+    return topics * (workers + 1), 0
+
+def presupuesto_conexiones() -> dict:
+    """Calcula pool_size y max_overflow por proceso a partir del presupuesto total de conexiones
+
+    Cada proceso de gunicorn (WEB_CONCURRENCY) abre su propio pool. Dentro de un proceso usan
+    conexiones los hilos de gunicorn, los hilos del consumidor de Pulsar y el relay de outbox.
+    El engine async del runtime asyncio se descuenta del presupuesto del proceso; el pool base
+    cubre los hilos y el overflow usa lo que sobra, de modo que el total no supera el presupuesto.
+    """
+    presupuesto_total = int(os.getenv('DB_MAX_CONNECTIONS', '90'))
+    procesos = max(1, int(os.getenv('WEB_CONCURRENCY', '1')))
+    hilos_consumidor, conexiones_async = _hilos_consumidor()
+    hilos = (
+        int(os.getenv('GUNICORN_THREADS', '1'))
+        + hilos_consumidor
+        + 1  # relay de outbox
+    )
+    presupuesto_proceso = max(1, presupuesto_total // procesos - conexiones_async)
+    pool_size = int(os.getenv('DB_POOL_SIZE', '0')) or min(hilos, presupuesto_proceso)
+    max_overflow = int(os.getenv('DB_MAX_OVERFLOW', str(max(0, presupuesto_proceso - pool_size))))
+    return {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'presupuesto_proceso': presupuesto_proceso,
+        'procesos': procesos,
+        'hilos': hilos,
+        'conexiones_async': conexiones_async,
+    }
+
+def opciones_engine(database_url: str) -> dict:
+    """Construye SQLALCHEMY_ENGINE_OPTIONS desde variables de entorno (solo para PostgreSQL)"""
+    if not database_url.startswith('postgresql'):
+        return {}
+    presupuesto = presupuesto_conexiones()
+    opciones = {
+        'poolclass': PoolConMedicion,
+        'pool_size': presupuesto['pool_size'],
+        'max_overflow': presupuesto['max_overflow'],
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', '30')),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+        'pool_pre_ping': _bool_env('DB_POOL_PRE_PING', 'true'),
+    }
+    statement_timeout = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '0'))
+    if statement_timeout and not _bool_env('DB_PGBOUNCER_TRANSACTION_MODE', 'false'):
+        # Parámetro de sesión: PgBouncer en modo transacción no lo acepta en el arranque
+        opciones['connect_args'] = {'options': f'-c statement_timeout={statement_timeout}'}
+    logger.info(
+        f"Pool de base de datos: pool_size={opciones['pool_size']} max_overflow={opciones['max_overflow']} "
+        f"(presupuesto {presupuesto['presupuesto_proceso']} por proceso, {presupuesto['procesos']} procesos, "
+        f"{presupuesto['hilos']} hilos, {presupuesto['conexiones_async']} conexiones del engine async)"
+    )
+    return opciones
+
+def _configurar_pgbouncer(engine):
+    """En modo transacción de PgBouncer la conexión del servidor cambia entre transacciones:
+    el statement_timeout se fija con SET LOCAL al inicio de cada transacción"""
+    statement_timeout = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '0'))
+    if not statement_timeout:
+        return
+
+    @event.listens_for(engine, 'begin')
+    def _statement_timeout_local(conexion):
+        conexion.exec_driver_sql(f"SET LOCAL statement_timeout = {statement_timeout}")
+
 def init_db(app: Flask):
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', opciones_engine(app.config.get('SQLALCHEMY_DATABASE_URI', '')))
     db.init_app(app)
+    if _bool_env('DB_PGBOUNCER_TRANSACTION_MODE', 'false'):
+        with app.app_context():
+            _configurar_pgbouncer(db.engine)
+
+def insert_con_conflictos(session, tabla):
+    """Crea un INSERT con soporte de ON CONFLICT según el dialecto de la sesión"""
+    if session.get_bind().dialect.name == 'sqlite':
+        return sqlite.insert(tabla)
+    return postgresql.insert(tabla)
@@ -0,0 +1,193 @@
+"""Configuración de logging
+
+En este archivo se define el pipeline de logs del servicio: los hilos que registran solo
+encolan el LogRecord (sin formatear ni escribir) y un QueueListener en segundo plano lo
+formatea como JSON estructurado y lo escribe en stderr. También se definen el muestreo por
+saga de los logs de payloads y el cambio de niveles por módulo en tiempo de ejecución.
+
+"""
+
+import os
+import sys
+import json
+import zlib
+import queue
+import random
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+from partner_lifecycle.infraestructura.trazas import trazador
+from partner_lifecycle.infraestructura.metricas import registro_metricas
+
+# orjson es opcional: sin él se usa json de la librería estándar
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Saga del mensaje o petición en curso, se agrega a cada registro
+_saga_actual: ContextVar[Optional[str]] = ContextVar('saga_actual', default=None)
+
+# Atributos propios de LogRecord: el resto son campos enviados con ``extra``
+_ATRIBUTOS_REGISTRO = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+logs_descartados = registro_metricas.contador(
+    'logs_descartados_total', 'Registros de log descartados por la cola llena del pipeline'
+)
+
+NIVELES = {'CRITICAL', 'ERROR', 'WARNING', 'INFO', 'DEBUG', 'NOTSET'}
+
+@contextmanager
+def contexto_saga(saga_id):
+    """Asocia los logs del bloque a la saga"""
+    token = _saga_actual.set(str(saga_id) if saga_id is not None else None)
+    try:
+        yield
+    finally:
+        _saga_actual.reset(token)
+
+class FiltroContexto(logging.Filter):
+    """Se ejecuta en el hilo que registra: copia al registro la saga y la traza activas"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, 'saga_id', None) is None:
+            record.saga_id = _saga_actual.get()
+        span = trazador.span_actual()
+        if span is not None:
+            record.trace_id = span.trace_id
+            record.span_id = span.span_id
+            if record.saga_id is None:
+                record.saga_id = span.saga_id
+        return True
+
+class FormateadorJSON(logging.Formatter):
+    """Una línea JSON por registro; el mensaje y los campos extra se formatean en el listener"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        datos: Dict[str, Any] = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensaje': record.getMessage(),
+            'hilo': record.threadName,
+        }
+        for llave, valor in record.__dict__.items():
+            if llave not in _ATRIBUTOS_REGISTRO and valor is not None:
+                datos[llave] = valor
+        if record.exc_info:
+            datos['excepcion'] = self.formatException(record.exc_info)
+        if orjson is not None:
+            try:
+                return orjson.dumps(datos, default=str).decode('utf-8')
+            except TypeError:
+                pass
+        return json.dumps(datos, default=str, ensure_ascii=False)
+
+class ManejadorCola(QueueHandler):
+    """QueueHandler que no bloquea: no formatea en el hilo que registra y descarta si la cola está llena"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # El QueueHandler original formatea aquí; el formateo se difiere al hilo del listener
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            logs_descartados.inc()
+
+class PipelineLogs:
+    """Handler de cola en el logger raíz y listener con la salida real
+
+    Variables de entorno: LOG_LEVEL (INFO), LOG_FORMAT (json o text), LOG_LEVELS con niveles
+    por módulo (``partner_lifecycle.infraestructura.pulsar=DEBUG,sqlalchemy.engine=WARNING``),
+    LOG_QUEUE_SIZE (10000) y LOG_PAYLOAD_SAMPLE_RATIO (0.01).
+    """
+
+    def __init__(self):
+        self.nivel = os.getenv('LOG_LEVEL', 'INFO').upper()
+        self.formato = os.getenv('LOG_FORMAT', 'json').lower()
+        self.proporcion_payloads = float(os.getenv('LOG_PAYLOAD_SAMPLE_RATIO', '0.01'))
+        self.manejador: Optional[ManejadorCola] = None
+        self.listener: Optional[QueueListener] = None
+        self._lock = threading.Lock()
+
+    def configurar(self):
+        """Reemplaza los handlers del logger raíz por el handler de cola (idempotente)"""
+        with self._lock:
+            if self.listener is not None:
+                return
+            salida = logging.StreamHandler(sys.stderr)
+            if self.formato == 'text':
+                salida.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s [%(saga_id)s] %(message)s'))
+            else:
+                salida.setFormatter(FormateadorJSON())
+            self.manejador = ManejadorCola(queue.Queue(maxsize=int(os.getenv('LOG_QUEUE_SIZE', '10000'))))
+            self.manejador.addFilter(FiltroContexto())
+            raiz = logging.getLogger()
+            for manejador in list(raiz.handlers):
+                raiz.removeHandler(manejador)
+            raiz.addHandler(self.manejador)
+            raiz.setLevel(self.nivel)
+            for entrada in os.getenv('LOG_LEVELS', '').split(','):
+                if '=' in entrada:
+                    modulo, nivel = entrada.split('=', 1)
+                    self.establecer_nivel(modulo.strip(), nivel.strip())
+            self.listener = QueueListener(self.manejador.queue, salida, respect_handler_level=True)
+            self.listener.start()
+            atexit.register(self.detener)
+
+    def detener(self):
+        """Detiene el listener después de escribir los registros encolados"""
+        with self._lock:
+            if self.listener is not None:
+                self.listener.stop()
+                self.listener = None
+
+    def establecer_nivel(self, modulo: str, nivel: Optional[str]):
+        """Cambia el nivel de un logger en caliente; ``None`` o NOTSET lo vuelve a heredar
+
+        Para el logger raíz (``modulo`` vacío) ``None`` restablece LOG_LEVEL.
+        """
+        nivel = (nivel or 'NOTSET').upper()
+        if nivel not in NIVELES:
+            raise ValueError(f"Nivel de log inválido: {nivel}")
+        if not modulo and nivel == 'NOTSET':
+            nivel = self.nivel
+        logging.getLogger(modulo or None).setLevel(nivel)
+
+    @staticmethod
+    def niveles() -> Dict[str, str]:
+        """Nivel del logger raíz y de los loggers con nivel propio"""
+        resultado = {'root': logging.getLevelName(logging.getLogger().level)}
+        for nombre, logger in list(logging.Logger.manager.loggerDict.items()):
+            if isinstance(logger, logging.Logger) and logger.level != logging.NOTSET:
+                resultado[nombre] = logging.getLevelName(logger.level)
+        return resultado
+
+    def muestrear_saga(self, saga_id) -> bool:
+        """Decisión estable por saga: todos los payloads de una saga se registran o ninguno"""
+        if self.proporcion_payloads <= 0:
+            return False
+        if saga_id is None:
+            return random.random() < self.proporcion_payloads
+        return zlib.crc32(str(saga_id).encode('utf-8')) % 10000 < self.proporcion_payloads * 10000
+
+# Instancia global del pipeline de logs
+pipeline_logs = PipelineLogs()
+
+def configurar_logging():
+    pipeline_logs.configurar()
+
+def registrar_payload(logger: logging.Logger, mensaje: str, saga_id, payload):
+    """Registra el payload en INFO solo para las sagas muestreadas
+
+    El payload viaja como campo ``payload`` del registro y se serializa en el listener.
+    """
+    if logger.isEnabledFor(logging.INFO) and pipeline_logs.muestrear_saga(saga_id):
+        logger.info(mensaje, extra={'saga_id': str(saga_id) if saga_id is not None else None, 'payload': payload})
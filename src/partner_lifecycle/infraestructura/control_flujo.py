@@ -0,0 +1,175 @@
+"""Control de flujo entre los consumidores de Pulsar y la base de datos
+
+En este archivo se define el control de flujo por suscripción: un límite de mensajes en vuelo
+que se ajusta con AIMD (se reduce a la mitad ante sobrecarga y crece de a poco con holgura) y
+una pausa del consumo cuando el pool de conexiones se satura o la latencia de los handlers
+sube. Los umbrales de pausa y de reanudación son distintos (histéresis) para que el consumo
+no oscile entre sobrecarga y reposo.
+
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+from partner_lifecycle.infraestructura.metricas import registro_metricas
+
+logger = logging.getLogger(__name__)
+
+pausas_consumidor = registro_metricas.contador(
+    'consumidor_pausas_total', 'Pausas del consumo por saturación del pool o latencia de los handlers', ('suscripcion',)
+)
+control_flujo_consumidor = registro_metricas.gauge(
+    'consumidor_control_flujo', 'Estado del control de flujo por suscripción', ('suscripcion', 'medida')
+)
+
+class ControlFlujo:
+    """Límite adaptativo de mensajes en vuelo y pausa con histéresis para una suscripción
+
+    Se pausa si la saturación del pool llega a FLOW_POOL_SATURATION_HIGH o la latencia de los
+    handlers (promedio móvil exponencial) a FLOW_HANDLER_LATENCY_HIGH_MS, y se reanuda solo
+    cuando ambas bajan de FLOW_POOL_SATURATION_LOW y FLOW_HANDLER_LATENCY_LOW_MS.
+    """
+
+    def __init__(self, nombre: str, max_en_vuelo: int, medir_saturacion: Optional[Callable[[], float]] = None):
+        self.nombre = nombre
+        self.max_en_vuelo = max(1, max_en_vuelo)
+        self.limite = self.max_en_vuelo
+        self.en_vuelo = 0
+        self.pausado = False
+        self.saturacion = 0.0
+        self.latencia = 0.0
+        self.saturacion_alta = float(os.getenv('FLOW_POOL_SATURATION_HIGH', '0.9'))
+        self.saturacion_baja = float(os.getenv('FLOW_POOL_SATURATION_LOW', '0.6'))
+        self.latencia_alta = float(os.getenv('FLOW_HANDLER_LATENCY_HIGH_MS', '1000')) / 1000
+        self.latencia_baja = float(os.getenv('FLOW_HANDLER_LATENCY_LOW_MS', '250')) / 1000
+        self.intervalo = float(os.getenv('FLOW_EVALUATION_INTERVAL_MS', '500')) / 1000
+        self.incremento = max(1, self.max_en_vuelo // 10)
+        self._suavizado = 0.2
+        self._medir_saturacion = medir_saturacion
+        self._muestras = 0
+        self._ultima_evaluacion = 0.0
+        self._condicion = threading.Condition()
+
+    def adquirir(self, timeout: float) -> bool:
+        """Reserva un lugar en vuelo; espera mientras esté pausado o en el límite
+
+        Retorna False si no se obtuvo lugar dentro de ``timeout`` segundos.
+        """
+        limite_tiempo = time.monotonic() + timeout
+        with self._condicion:
+            while True:
+                self._evaluar_si_corresponde()
+                if not self.pausado and self.en_vuelo < self.limite:
+                    self.en_vuelo += 1
+                    return True
+                restante = limite_tiempo - time.monotonic()
+                if restante <= 0:
+                    return False
+                self._condicion.wait(min(restante, self.intervalo))
+
+    def liberar(self, latencia: Optional[float] = None):
+        """Libera un lugar en vuelo; ``latencia`` es la duración del handler si llegó a ejecutarse"""
+        with self._condicion:
+            self.en_vuelo -= 1
+            if latencia is not None:
+                self._registrar(latencia)
+            self._condicion.notify()
+
+    def esperar_habilitado(self, timeout: float) -> bool:
+        """Espera hasta que el consumo no esté pausado (consumo por lotes, sin conteo en vuelo)"""
+        limite_tiempo = time.monotonic() + timeout
+        with self._condicion:
+            while True:
+                self._evaluar_si_corresponde()
+                if not self.pausado:
+                    return True
+                restante = limite_tiempo - time.monotonic()
+                if restante <= 0:
+                    return False
+                self._condicion.wait(min(restante, self.intervalo))
+
+    def registrar_latencia(self, latencia: float):
+        with self._condicion:
+            self._registrar(latencia)
+
+    def _registrar(self, latencia: float):
+        self.latencia += self._suavizado * (latencia - self.latencia)
+        self._muestras += 1
+
+    def _evaluar_si_corresponde(self):
+        if time.monotonic() - self._ultima_evaluacion >= self.intervalo:
+            self._evaluar()
+
+    def evaluar(self) -> bool:
+        """Recalcula el límite y la pausa con las señales actuales; retorna si quedó pausado"""
+        with self._condicion:
+            self._evaluar()
+            self._condicion.notify_all()
+            return self.pausado
+
+    def _evaluar(self):
+        self._ultima_evaluacion = time.monotonic()
+        if self._medir_saturacion is not None:
+            try:
+                self.saturacion = self._medir_saturacion()
+            except Exception as e:
+                logger.warning(f"No se pudo medir la saturación del pool para {self.nombre}: {e}")
+        if self._muestras == 0:
+            # Sin handlers terminados en el intervalo (por ejemplo en pausa) la señal de latencia decae
+            self.latencia *= 0.5
+        self._muestras = 0
+
+        sobrecarga = self.saturacion >= self.saturacion_alta or self.latencia >= self.latencia_alta
+        holgura = self.saturacion <= self.saturacion_baja and self.latencia <= self.latencia_baja
+        if sobrecarga:
+            # Una reducción por episodio: en pausa no hay mensajes nuevos que justifiquen reducir otra vez
+            if not self.pausado:
+                self.limite = max(1, self.limite // 2)
+                self.pausado = True
+                pausas_consumidor.inc(self.nombre)
+                logger.warning(
+                    f"Consumo pausado en {self.nombre}: saturación del pool {self.saturacion:.2f}, "
+                    f"latencia {self.latencia * 1000:.0f} ms, límite en vuelo {self.limite}"
+                )
+        elif holgura:
+            if self.pausado:
+                self.pausado = False
+                logger.info(f"Consumo reanudado en {self.nombre} con límite en vuelo {self.limite}")
+            else:
+                self.limite = min(self.max_en_vuelo, self.limite + self.incremento)
+
+    def estado(self) -> Dict[str, float]:
+        return {
+            'en_vuelo': self.en_vuelo,
+            'limite': self.limite,
+            'pausado': int(self.pausado),
+            'saturacion_pool': round(self.saturacion, 3),
+            'latencia_segundos': round(self.latencia, 6),
+        }
+
+# Controles de flujo activos, exportados en el gauge
+_controles: List[ControlFlujo] = []
+_lock_controles = threading.Lock()
+
+def registrar_control(control: ControlFlujo) -> ControlFlujo:
+    with _lock_controles:
+        _controles.append(control)
+    return control
+
+def retirar_control(control: ControlFlujo):
+    with _lock_controles:
+        if control in _controles:
+            _controles.remove(control)
+
+def _estado_controles() -> Dict[Tuple, float]:
+    with _lock_controles:
+        controles = list(_controles)
+    return {
+        (control.nombre, medida): valor
+        for control in controles
+        for medida, valor in control.estado().items()
+    }
+
+control_flujo_consumidor.registrar(_estado_controles)
@@ -4,14 +4,23 @@ En este archivo se define el servicio principal para consumir eventos de Pulsar
 
 """
 
+import os
 import json
 import logging
 import threading
-from typing import Dict, Any
-from partner_lifecycle.infraestructura.pulsar import PulsarEventConsumer, PulsarConfig
+from typing import Dict, Any, List
+from partner_lifecycle.infraestructura.pulsar import PulsarEventConsumer, PulsarConfig, obtener_backlog
+from partner_lifecycle.infraestructura.metricas import mensajes_consumidos
+from partner_lifecycle.infraestructura.trazas import trazador
+from partner_lifecycle.config.logs import contexto_saga, registrar_payload
+from partner_lifecycle.config.db import medidor_saturacion_pool
 
 logger = logging.getLogger(__name__)
 
+# Topic (nombre corto) y suscripción de los eventos que consume el servicio
+PARTNER_EVENTS_TOPIC = 'content-events'
+SUBSCRIPTION_NAME = 'partner-lifecycle-subscription'
+
 class EventConsumerService:
     def __init__(self, app=None, event_processing_service=None):
         self.config = PulsarConfig()
@@ -19,13 +28,14 @@ class EventConsumerService:
         self.running = False
         self.app = app
         self._event_processing_service = event_processing_service
+        self._topic_metricas = self.config.get_topic_name(PARTNER_EVENTS_TOPIC)
         
     def start_consuming(self):
         """Inicia el consumo de eventos para todos los módulos"""
         self.running = True
         
         # Eventos de partnerships
-        self._start_consumer('content-events', self._handle_partner_event)
+        self._start_consumer(PARTNER_EVENTS_TOPIC, self._handle_partner_event, self._handle_partner_events)
         
         logger.info("Servicio de consumo de eventos iniciado")
     
@@ -36,28 +46,39 @@ class EventConsumerService:
             consumer.close()
         logger.info("Servicio de consumo de eventos detenido")
     
-    def _start_consumer(self, event_type: str, handler):
+    def _start_consumer(self, event_type: str, handler, batch_handler=None):
         """Inicia un consumidor para un tipo específico de evento"""
         try:
-            consumer = PulsarEventConsumer()
+            # El consumo se pausa cuando el pool de conexiones de la aplicación se satura
+            consumer = PulsarEventConsumer(medidor_saturacion_pool(self.app) if self.app else None)
             topic_name = self.config.get_topic_name(event_type)
-            subscription_name = f"partner-lifecycle-subscription"
-            consumer.subscribe_to_topic(topic_name, subscription_name, handler)
+            consumer.subscribe_to_topic(topic_name, SUBSCRIPTION_NAME, handler, batch_handler)
             self.consumers[event_type] = consumer
             logger.info(f"Consumidor iniciado para {event_type}")
         except Exception as e:
             logger.error(f"Error iniciando consumidor para {event_type}: {e}")
     
+    def backlog(self) -> Dict[tuple, int]:
+        """Backlog de la suscripción del servicio por topic, para el gauge de métricas"""
+        topic_name = self.config.get_topic_name(PARTNER_EVENTS_TOPIC)
+        backlog = obtener_backlog(self.config, topic_name, SUBSCRIPTION_NAME)
+        return {} if backlog is None else {(topic_name, SUBSCRIPTION_NAME): backlog}
+    
     def _handle_partner_event(self, event_data: Dict[str, Any]):
         """Maneja eventos de partnerships"""
+        with contexto_saga(event_data.get('saga_id')):
+            self._manejar_evento(event_data)
+    
+    def _manejar_evento(self, event_data: Dict[str, Any]):
+        """Despacha el evento según su tipo; los errores se propagan para que el mensaje no reciba ack"""
         try:
             event_type = event_data.get('event_type')
             status = event_data.get('status')
             saga_id = event_data.get('saga_id')
             event_payload = event_data.get('event_data', {})
             
-            logger.info(f"Procesando evento de partnership: {event_type} con status: {status}")
-            logger.info(f"Evento payload: {event_payload}")
+            logger.info("Procesando evento de partnership: %s con status: %s", event_type, status)
+            registrar_payload(logger, "Evento de partnership", saga_id, event_payload)
             
             # Aquí se pueden agregar lógicas específicas para cada tipo de evento
             if event_type == 'CommandCreatePartner' and status == 'success':
@@ -70,9 +91,40 @@ class EventConsumerService:
                 self._process_partnership_terminada(event_payload)
             else:
                 logger.info("Evento ignorado: %s", event_type)
+                mensajes_consumidos.inc(self._topic_metricas, 'ignorado')
+                return
+            mensajes_consumidos.inc(self._topic_metricas, 'procesado')
                 
         except Exception as e:
+            mensajes_consumidos.inc(self._topic_metricas, 'error')
+            trazador.marcar_error(trazador.span_actual(), e)
             logger.error(f"Error procesando evento de partnership: {e}")
+            # El consumidor hace nack y Pulsar vuelve a entregar el mensaje
+            raise
+    
+    def _handle_partner_events(self, eventos: List[Dict[str, Any]]):
+        """Maneja un lote de eventos de partnerships
+        
+        Los CommandCreatePartner exitosos se procesan juntos en una sola transacción,
+        el resto de eventos se maneja de forma individual y en orden.
+        """
+        lote_iniciadas = []
+        for event_data in eventos:
+            if event_data.get('event_type') == 'CommandCreatePartner' and event_data.get('status') == 'success':
+                lote_iniciadas.append((event_data.get('saga_id'), event_data.get('event_data', {})))
+            else:
+                self._handle_partner_event(event_data)
+        
+        if lote_iniciadas:
+            if self._event_processing_service:
+                try:
+                    self._event_processing_service.process_partnership_iniciada_lote(lote_iniciadas)
+                except Exception:
+                    mensajes_consumidos.inc(self._topic_metricas, 'error', cantidad=len(lote_iniciadas))
+                    raise
+                mensajes_consumidos.inc(self._topic_metricas, 'procesado', cantidad=len(lote_iniciadas))
+            else:
+                logger.warning("EventProcessingService no configurado, solo logueando lote de eventos")
     
     # Métodos de procesamiento específicos para cada evento
     def _process_partnership_iniciada(self, payload, saga_id):
@@ -83,20 +135,28 @@ class EventConsumerService:
             logger.warning("EventProcessingService no configurado, solo logueando evento")
     
     def _process_partnership_activada(self, payload):
-        logger.info(f"Partnership activada: {payload.get('id_partnership')}")
+        logger.info("Partnership activada: %s", payload.get('id_partnership'))
     
     def _process_partnership_suspendida(self, payload):
-        logger.info(f"Partnership suspendida: {payload.get('id_partnership')}")
+        logger.info("Partnership suspendida: %s", payload.get('id_partnership'))
     
     def _process_partnership_terminada(self, payload):
-        logger.info(f"Partnership terminada: {payload.get('id_partnership')}")
+        logger.info("Partnership terminada: %s", payload.get('id_partnership'))
 
 # Instancia global del servicio (se configurará con dependency injection)
 event_consumer_service = None
 
-def configure_event_consumer_service(app, event_processing_service=None):
-    """Configura el servicio de consumo de eventos con dependency injection"""
+def configure_event_consumer_service(app, event_processing_service=None, registro_idempotencia=None):
+    """Configura el servicio de consumo de eventos con dependency injection
+
+    CONSUMER_RUNTIME selecciona el runtime: threads (por defecto, PulsarEventConsumer)
+    o asyncio (AsyncEventConsumerService)
+    """
     global event_consumer_service
     if event_consumer_service is None:
-        event_consumer_service = EventConsumerService(app, event_processing_service)
+        if os.getenv('CONSUMER_RUNTIME', 'threads').lower() == 'asyncio':
+            from partner_lifecycle.infraestructura.async_consumer import AsyncEventConsumerService
+            event_consumer_service = AsyncEventConsumerService(app, event_processing_service, registro_idempotencia)
+        else:
+            event_consumer_service = EventConsumerService(app, event_processing_service)
     return event_consumer_service
@@ -0,0 +1,306 @@
+"""Métricas del servicio en formato de texto de Prometheus
+
+En este archivo se definen los contadores, histogramas y gauges del servicio y su exportación
+para el endpoint /metrics. El registro es lock-light: cada hilo escribe en su propio shard
+(un dict por hilo) sin tomar locks, y solo la exportación recorre y suma los shards. Cuando un
+hilo termina, su shard se suma a un acumulado compartido, así los hilos de corta vida
+(uno por request en werkzeug, executors) no dejan shards ni encarecen la exportación.
+
+"""
+
+import time
+import bisect
+import logging
+import weakref
+import threading
+from typing import Callable, Dict, List, Sequence, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Límites superiores (segundos) de los buckets de latencia
+BUCKETS_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escapar(valor) -> str:
+    return str(valor).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _etiquetas(nombres: Sequence[str], valores: Sequence, extra: str = None) -> str:
+    partes = [f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return '{' + ','.join(partes) + '}' if partes else ''
+
+def _numero(valor: float) -> str:
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+def _sumar_celdas(destino: dict, shard: dict):
+    """Suma celda a celda (listas de números de igual largo) el shard sobre el destino"""
+    for llave, celda in shard.items():
+        acumulada = destino.get(llave)
+        if acumulada is None:
+            destino[llave] = list(celda)
+        else:
+            for i, valor in enumerate(celda):
+                acumulada[i] += valor
+
+class _CentinelaHilo:
+    """Objeto que solo referencia el threading.local del hilo: se libera cuando el hilo termina"""
+    __slots__ = ('__weakref__',)
+
+class _MetricaPorHilo:
+    """Base de las métricas con un shard por hilo: escritura sin locks, lectura sumando shards"""
+
+    tipo = ''
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._local = threading.local()
+        self._shards: List[dict] = []
+        # Suma de los shards de hilos terminados
+        self._retirados: dict = {}
+        self._lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.valores
+        except AttributeError:
+            valores = {}
+            with self._lock:
+                self._shards.append(valores)
+            self._local.valores = valores
+            self._local.centinela = centinela = _CentinelaHilo()
+            weakref.finalize(centinela, self._retirar, valores)
+            return valores
+
+    def _retirar(self, valores: dict):
+        """Se ejecuta al terminar el hilo dueño del shard, que ya no lo modifica"""
+        with self._lock:
+            self._shards.remove(valores)
+            _sumar_celdas(self._retirados, valores)
+
+    def _copias(self) -> List[dict]:
+        with self._lock:
+            shards = list(self._shards)
+            retirados = {llave: list(celda) for llave, celda in self._retirados.items()}
+        # dict.copy es atómico bajo el GIL: no falla si el hilo dueño agrega una llave
+        return [retirados] + [shard.copy() for shard in shards]
+
+    def _encabezado(self) -> List[str]:
+        return [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+
+class Contador(_MetricaPorHilo):
+    tipo = 'counter'
+
+    def inc(self, *valores, cantidad: float = 1):
+        shard = self._shard()
+        celda = shard.get(valores)
+        if celda is None:
+            celda = shard[valores] = [0]
+        celda[0] += cantidad
+
+    def valores(self) -> Dict[Tuple, float]:
+        totales: Dict[Tuple, float] = {}
+        for shard in self._copias():
+            for llave, celda in shard.items():
+                totales[llave] = totales.get(llave, 0) + celda[0]
+        return totales
+
+    def exportar(self) -> List[str]:
+        lineas = self._encabezado()
+        for llave, valor in sorted(self.valores().items()):
+            lineas.append(f"{self.nombre}{_etiquetas(self.etiquetas, llave)} {_numero(valor)}")
+        return lineas
+
+class Histograma(_MetricaPorHilo):
+    """Histograma con buckets fijos; cada celda guarda [conteo por bucket..., +Inf, suma, total]"""
+
+    tipo = 'histogram'
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (), buckets: Sequence[float] = BUCKETS_LATENCIA):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(sorted(buckets))
+
+    def observar(self, valor: float, *valores):
+        shard = self._shard()
+        celda = shard.get(valores)
+        if celda is None:
+            celda = shard[valores] = [0] * (len(self.buckets) + 3)
+        celda[bisect.bisect_left(self.buckets, valor)] += 1
+        celda[-2] += valor
+        celda[-1] += 1
+
+    def medir(self, *valores) -> '_Cronometro':
+        """Context manager que observa la duración del bloque"""
+        return _Cronometro(self, valores)
+
+    def exportar(self) -> List[str]:
+        totales: Dict[Tuple, List[float]] = {}
+        for shard in self._copias():
+            _sumar_celdas(totales, shard)
+        lineas = self._encabezado()
+        for llave, celda in sorted(totales.items()):
+            acumulado = 0
+            for limite, conteo in zip(self.buckets + (float('inf'),), celda):
+                acumulado += conteo
+                le = 'le="+Inf"' if limite == float('inf') else f'le="{_numero(float(limite))}"'
+                lineas.append(f"{self.nombre}_bucket{_etiquetas(self.etiquetas, llave, le)} {acumulado}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, llave)} {_numero(float(celda[-2]))}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, llave)} {celda[-1]}")
+        return lineas
+
+class _Cronometro:
+    __slots__ = ('_histograma', '_valores', '_inicio')
+
+    def __init__(self, histograma: Histograma, valores: tuple):
+        self._histograma = histograma
+        self._valores = valores
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histograma.observar(time.perf_counter() - self._inicio, *self._valores)
+        return False
+
+class GaugeRecolectado:
+    """Gauge cuyo valor se obtiene al exportar con una función ``() -> {etiquetas: valor}``"""
+
+    tipo = 'gauge'
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._funciones: List[Callable[[], Dict[Tuple, float]]] = []
+
+    def registrar(self, funcion: Callable[[], Dict[Tuple, float]]):
+        if funcion not in self._funciones:
+            self._funciones.append(funcion)
+
+    def exportar(self) -> List[str]:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        for funcion in list(self._funciones):
+            try:
+                valores = funcion()
+            except Exception as e:
+                logger.warning(f"Error recolectando la métrica {self.nombre}: {e}")
+                continue
+            for llave, valor in sorted(valores.items()):
+                lineas.append(f"{self.nombre}{_etiquetas(self.etiquetas, llave)} {_numero(valor)}")
+        return lineas
+
+class RegistroMetricas:
+    def __init__(self):
+        self._metricas: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _obtener(self, clase, nombre: str, *args, **kwargs):
+        with self._lock:
+            metrica = self._metricas.get(nombre)
+            if metrica is None:
+                metrica = self._metricas[nombre] = clase(nombre, *args, **kwargs)
+            return metrica
+
+    def contador(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()) -> Contador:
+        return self._obtener(Contador, nombre, ayuda, etiquetas)
+
+    def histograma(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (),
+                   buckets: Sequence[float] = BUCKETS_LATENCIA) -> Histograma:
+        return self._obtener(Histograma, nombre, ayuda, etiquetas, buckets)
+
+    def gauge(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()) -> GaugeRecolectado:
+        return self._obtener(GaugeRecolectado, nombre, ayuda, etiquetas)
+
+    def exportar(self) -> str:
+        with self._lock:
+            metricas = list(self._metricas.values())
+        lineas = []
+        for metrica in metricas:
+            lineas.extend(metrica.exportar())
+        return '\n'.join(lineas) + '\n'
+
+# Instancia global del registro
+registro_metricas = RegistroMetricas()
+
+# Métricas del servicio
+latencia_http = registro_metricas.histograma(
+    'http_peticion_duracion_segundos', 'Latencia de las rutas del blueprint partner_lifecycle',
+    ('ruta', 'metodo', 'estado')
+)
+latencia_comando = registro_metricas.histograma(
+    'comando_duracion_segundos', 'Latencia de ejecutar_commando por tipo de comando', ('comando', 'resultado')
+)
+latencia_commit = registro_metricas.histograma(
+    'db_commit_duracion_segundos', 'Duración de session.commit (flush y commit)'
+)
+latencia_publicacion = registro_metricas.histograma(
+    'pulsar_publicacion_duracion_segundos', 'Latencia de publicación en Pulsar hasta la confirmación', ('topic',)
+)
+errores_publicacion = registro_metricas.contador(
+    'pulsar_publicacion_errores_total', 'Errores de publicación en Pulsar', ('topic',)
+)
+mensajes_consumidos = registro_metricas.contador(
+    'consumidor_mensajes_total', 'Mensajes manejados por el consumidor de eventos', ('topic', 'resultado')
+)
+nacks_consumidor = registro_metricas.contador(
+    'consumidor_nacks_total', 'Mensajes con negative acknowledge', ('topic',)
+)
+backlog_consumidor = registro_metricas.gauge(
+    'consumidor_backlog_mensajes', 'Mensajes pendientes por suscripción', ('topic', 'suscripcion')
+)
+
+def interceptor_metricas_comando(comando, siguiente):
+    """Interceptor de ejecutar_commando que registra la latencia por tipo de comando"""
+    inicio = time.perf_counter()
+    resultado = 'error'
+    try:
+        respuesta = siguiente(comando)
+        resultado = 'ok'
+        return respuesta
+    finally:
+        latencia_comando.observar(time.perf_counter() - inicio, type(comando).__name__, resultado)
+
+def instrumentar_blueprint(bp):
+    """Registra la latencia de cada ruta del blueprint (plantilla de la ruta, no la URL concreta)"""
+    from flask import g, request
+
+    if getattr(bp, '_metricas_instrumentado', False):
+        return
+    bp._metricas_instrumentado = True
+
+    @bp.before_request
+    def _inicio_peticion():
+        g._inicio_peticion = time.perf_counter()
+
+    @bp.after_request
+    def _fin_peticion(respuesta):
+        inicio = g.pop('_inicio_peticion', None)
+        if inicio is not None:
+            ruta = request.url_rule.rule if request.url_rule is not None else 'desconocida'
+            latencia_http.observar(time.perf_counter() - inicio, ruta, request.method, str(respuesta.status_code))
+        return respuesta
+
+def instrumentar_sesiones():
+    """Mide session.commit en todas las sesiones de SQLAlchemy (incluye el flush previo)"""
+    if event.contains(Session, 'before_commit', _antes_commit):
+        return
+    event.listen(Session, 'before_commit', _antes_commit)
+    event.listen(Session, 'after_commit', _despues_commit)
+    event.listen(Session, 'after_soft_rollback', _despues_rollback)
+
+def _antes_commit(session):
+    session.info['_inicio_commit'] = time.perf_counter()
+
+def _despues_commit(session):
+    inicio = session.info.pop('_inicio_commit', None)
+    if inicio is not None:
+        latencia_commit.observar(time.perf_counter() - inicio)
+
+def _despues_rollback(session, transaccion):
+    session.info.pop('_inicio_commit', None)
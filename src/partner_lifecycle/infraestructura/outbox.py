@@ -0,0 +1,255 @@
+"""Outbox transaccional para eventos de dominio
+
+En este archivo se define la tabla outbox, la escritura de eventos en la misma
+transacción del agregado y el relay que los publica en Pulsar en segundo plano
+
+"""
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import (
+    Column, String, DateTime, BigInteger, Integer, LargeBinary, Text, JSON, Index, select, update, delete, text
+)
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from partner_lifecycle.config.db import db
+from partner_lifecycle.seedwork.dominio.eventos import EventoDominio
+from partner_lifecycle.infraestructura.pulsar import pulsar_publisher, PulsarEventPublisher
+from partner_lifecycle.infraestructura.trazas import trazador
+
+logger = logging.getLogger(__name__)
+
+class OutboxDBModel(db.Model):
+    __tablename__ = "outbox"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    id_agregado = Column(UUID(as_uuid=True), nullable=True)
+    saga_id = Column(String(100), nullable=True)
+    event_type = Column(String(100), nullable=False)
+    status = Column(String(50), nullable=False)
+    topic = Column(String(255), nullable=False)
+    payload = Column(LargeBinary, nullable=False)
+    # Propiedades del mensaje de Pulsar (content-type, schema-version, traceparent); NULL en filas anteriores
+    propiedades = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)
+    fecha_creacion = Column(DateTime, nullable=False, default=datetime.utcnow)
+    fecha_envio = Column(DateTime, nullable=True)
+    # Publicaciones fallidas de la fila; al llegar a OUTBOX_MAX_INTENTOS queda descartada (dead letter)
+    intentos = Column(Integer, nullable=False, default=0, server_default='0')
+    ultimo_error = Column(Text, nullable=True)
+    fecha_descarte = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('idx_outbox_pendientes', 'id', postgresql_where=text('fecha_envio IS NULL')),
+        Index('idx_outbox_fecha_envio', 'fecha_envio'),
+    )
+
+    def __repr__(self):
+        return f"<Outbox {self.id} {self.event_type} ({self.topic})>"
+
+def construir_fila_outbox(saga_id, evento: EventoDominio, event_type: str, status: str, id_agregado=None) -> dict:
+    """Serializa el evento y construye la fila de outbox correspondiente
+
+    Las propiedades guardan el traceparent del span activo para que el relay continúe la traza.
+    """
+    topic, data, propiedades = pulsar_publisher.construir_mensaje(saga_id, evento, event_type, status)
+    propiedades = trazador.inyectar(propiedades)
+    return {
+        'id_agregado': id_agregado,
+        'saga_id': str(saga_id) if saga_id is not None else None,
+        'event_type': event_type,
+        'status': status,
+        'topic': topic,
+        'payload': data,
+        'propiedades': propiedades,
+        'fecha_creacion': datetime.utcnow(),
+    }
+
+def agregar_evento_outbox(session, saga_id, evento: EventoDominio, event_type: str, status: str, id_agregado=None):
+    """Agrega el evento a la outbox dentro de la transacción actual de la sesión"""
+    fila = construir_fila_outbox(saga_id, evento, event_type, status, id_agregado)
+    session.add(OutboxDBModel(**fila))
+
+class OutboxRelay:
+    """Worker que drena la outbox en lotes ordenados hacia Pulsar
+
+    Usa su propio publisher (cliente y producers) con todos los topics en send_async, de modo
+    que el flush de cada lote espera solo los mensajes del relay. En Postgres cada lote toma
+    el advisory lock OUTBOX_ADVISORY_LOCK_ID: con varios procesos (workers de gunicorn, pods)
+    un solo relay drena a la vez y los lotes se publican en orden. Una fila que no se puede
+    publicar se reintenta con espera exponencial y tras OUTBOX_MAX_INTENTOS queda descartada,
+    de modo que no bloquea la outbox.
+    """
+
+    def __init__(self, app, publisher=None):
+        self.app = app
+        self._publisher_propio = publisher is None
+        self.publisher = publisher or PulsarEventPublisher(todos_async=True)
+        self.advisory_lock_id = int(os.getenv('OUTBOX_ADVISORY_LOCK_ID', '7011'))
+        self.batch_size = int(os.getenv('OUTBOX_BATCH_SIZE', '500'))
+        self.poll_interval = float(os.getenv('OUTBOX_POLL_INTERVAL_SECONDS', '0.5'))
+        self.retention = timedelta(hours=float(os.getenv('OUTBOX_RETENTION_HOURS', '24')))
+        self.prune_interval = float(os.getenv('OUTBOX_PRUNE_INTERVAL_SECONDS', '300'))
+        self.prune_batch_size = int(os.getenv('OUTBOX_PRUNE_BATCH_SIZE', '5000'))
+        self.max_intentos = max(1, int(os.getenv('OUTBOX_MAX_INTENTOS', '20')))
+        self.max_espera = float(os.getenv('OUTBOX_MAX_BACKOFF_SECONDS', '60'))
+        # Espera antes del próximo lote cuando la primera fila pendiente falló
+        self._espera_fallo = 0.0
+        self.running = False
+        self._thread = None
+        self._ultima_poda = 0.0
+
+    def start(self):
+        """Inicia el relay en un hilo daemon"""
+        if self.running:
+            return
+        self.running = True
+        self._thread = threading.Thread(target=self._run, name='outbox-relay', daemon=True)
+        self._thread.start()
+        logger.info("Relay de outbox iniciado")
+
+    def stop(self, timeout: float = 10.0):
+        """Detiene el relay esperando a que termine el lote en curso"""
+        self.running = False
+        if self._thread:
+            self._thread.join(timeout)
+        if self._publisher_propio:
+            self.publisher.flush()
+            self.publisher.close()
+        logger.info("Relay de outbox detenido")
+
+    def _run(self):
+        while self.running:
+            try:
+                with self.app.app_context():
+                    enviados = self.drenar_lote()
+                    if time.monotonic() - self._ultima_poda >= self.prune_interval:
+                        self.podar()
+                        self._ultima_poda = time.monotonic()
+                if self._espera_fallo:
+                    time.sleep(self._espera_fallo)
+                elif enviados < self.batch_size:
+                    time.sleep(self.poll_interval)
+            except Exception as e:
+                logger.error(f"Error en el relay de outbox: {e}")
+                time.sleep(self.poll_interval)
+
+    def _tomar_turno(self) -> bool:
+        """Advisory lock de la transacción en Postgres; se libera con el commit del lote"""
+        if db.session.get_bind().dialect.name != 'postgresql':
+            return True
+        return bool(db.session.execute(
+            text('SELECT pg_try_advisory_xact_lock(:id)'), {'id': self.advisory_lock_id}
+        ).scalar())
+
+    def drenar_lote(self) -> int:
+        """Publica un lote de eventos pendientes en orden y marca como enviado el prefijo exitoso
+
+        Todas las filas se envían con send_async y se espera un único flush. Solo se marcan las
+        filas hasta el primer fallo: ese evento y los siguientes se reintentan en el próximo lote,
+        así un evento fallido nunca queda publicado después de eventos más nuevos. Los que ya se
+        habían confirmado después del fallo se publican de nuevo (entrega al menos una vez).
+        La fila fallida suma un intento (ver _registrar_fallo).
+        """
+        if not self._tomar_turno():
+            db.session.commit()
+            return 0
+        filas = db.session.execute(
+            select(OutboxDBModel.id, OutboxDBModel.topic, OutboxDBModel.payload, OutboxDBModel.propiedades,
+                   OutboxDBModel.intentos)
+            .where(OutboxDBModel.fecha_envio.is_(None), OutboxDBModel.fecha_descarte.is_(None))
+            .order_by(OutboxDBModel.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not filas:
+            db.session.commit()
+            return 0
+
+        # Resultado por posición en el lote: True si el broker confirmó el envío
+        confirmados: List[bool] = [False] * len(filas)
+        errores: List[Optional[Exception]] = [None] * len(filas)
+
+        def _callback(posicion):
+            def _on_result(error):
+                confirmados[posicion] = error is None
+                errores[posicion] = error
+            return _on_result
+
+        posicion = 0
+        try:
+            for posicion, (id_fila, topic, payload, propiedades, _) in enumerate(filas):
+                self.publisher.publish_raw(topic, bytes(payload), _callback(posicion), propiedades)
+        except Exception as e:
+            errores[posicion] = e
+            logger.error(f"Error publicando lote de outbox: {e}")
+        finally:
+            self.publisher.flush()
+
+        enviados: List[int] = []
+        for (id_fila, *_), confirmado in zip(filas, confirmados):
+            if not confirmado:
+                break
+            enviados.append(id_fila)
+
+        if enviados:
+            db.session.execute(
+                update(OutboxDBModel)
+                .where(OutboxDBModel.id.in_(enviados))
+                .values(fecha_envio=datetime.utcnow())
+            )
+        self._espera_fallo = 0.0
+        if len(enviados) < len(filas):
+            self._registrar_fallo(filas[len(enviados)], errores[len(enviados)])
+        db.session.commit()
+        logger.info("Outbox: %s/%s eventos publicados", len(enviados), len(filas))
+        return len(enviados)
+
+    def _registrar_fallo(self, fila, error: Optional[Exception]):
+        """Suma un intento a la primera fila no publicada y la descarta al llegar al máximo
+
+        Mientras no se descarta, el próximo lote espera poll_interval * 2^intentos (hasta
+        OUTBOX_MAX_BACKOFF_SECONDS). Una fila descartada se vuelve a publicar poniendo
+        fecha_descarte en NULL.
+        """
+        id_fila, topic, intentos = fila[0], fila[1], fila[4] + 1
+        valores = {
+            'intentos': intentos,
+            'ultimo_error': str(error) if error is not None else 'Sin confirmación del broker',
+        }
+        if intentos >= self.max_intentos:
+            valores['fecha_descarte'] = datetime.utcnow()
+            logger.error(
+                "Outbox: evento %s descartado tras %s intentos en %s: %s",
+                id_fila, intentos, topic, valores['ultimo_error']
+            )
+        else:
+            self._espera_fallo = min(self.poll_interval * 2 ** intentos, self.max_espera)
+        db.session.execute(update(OutboxDBModel).where(OutboxDBModel.id == id_fila).values(**valores))
+
+    def podar(self) -> int:
+        """Elimina por lotes los eventos enviados antes del periodo de retención"""
+        limite = datetime.utcnow() - self.retention
+        subconsulta = (
+            select(OutboxDBModel.id)
+            .where(OutboxDBModel.fecha_envio < limite)
+            .limit(self.prune_batch_size)
+            .scalar_subquery()
+        )
+        resultado = db.session.execute(delete(OutboxDBModel).where(OutboxDBModel.id.in_(subconsulta)))
+        db.session.commit()
+        if resultado.rowcount:
+            logger.info(f"Outbox: {resultado.rowcount} eventos enviados eliminados")
+        return resultado.rowcount
+
+# Instancia global del relay (se configura al iniciar la aplicación)
+outbox_relay = None
+
+def configure_outbox_relay(app):
+    """Configura el relay de outbox para la aplicación"""
+    global outbox_relay
+    if outbox_relay is None:
+        outbox_relay = OutboxRelay(app)
+    return outbox_relay
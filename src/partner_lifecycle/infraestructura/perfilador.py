@@ -0,0 +1,180 @@
+"""Perfilado del proceso en ejecución
+
+En este archivo se define el muestreador estadístico que recorre las pilas de todos los hilos
+(incluidos los consumidores de Pulsar y el relay de outbox) con sys._current_frames y las
+agrupa en formato collapsed, listo para flamegraph.pl, inferno o speedscope, y el perfilado
+con cProfile de una fracción muestreada de las peticiones HTTP.
+
+"""
+
+import os
+import re
+import sys
+import time
+import uuid
+import random
+import cProfile
+import pstats
+import logging
+import threading
+from collections import Counter, deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_NO_PERMITIDOS = re.compile(r'[;\s]+')
+
+class PerfilEnCursoExcepcion(Exception):
+    """Ya hay un muestreo en curso en el proceso"""
+
+class MuestreadorPilas:
+    """Muestreo de tiempo de pared de las pilas de todos los hilos, un muestreo a la vez
+
+    Cada ``intervalo`` segundos se toma la pila de cada hilo (sin el hilo que muestrea) y se
+    cuenta como ``hilo;modulo:funcion;...`` de la raíz a la hoja. No usa sys.setprofile, así
+    que el costo para los hilos perfilados es solo el GIL que toma cada muestra.
+    """
+
+    def __init__(self):
+        self.max_segundos = float(os.getenv('PROFILER_MAX_SECONDS', '60'))
+        self._lock = threading.Lock()
+        self._etiquetas: Dict[object, str] = {}
+
+    def _etiqueta(self, frame, con_lineas: bool) -> str:
+        codigo = frame.f_code
+        etiqueta = self._etiquetas.get(codigo)
+        if etiqueta is None:
+            modulo = frame.f_globals.get('__name__') or os.path.basename(codigo.co_filename)
+            nombre = getattr(codigo, 'co_qualname', codigo.co_name)
+            etiqueta = self._etiquetas[codigo] = _NO_PERMITIDOS.sub('_', f"{modulo}:{nombre}")
+        return f"{etiqueta}:{frame.f_lineno}" if con_lineas else etiqueta
+
+    def _pila(self, frame, hilo: Optional[str], con_lineas: bool) -> str:
+        marcos = []
+        while frame is not None:
+            marcos.append(self._etiqueta(frame, con_lineas))
+            frame = frame.f_back
+        if hilo:
+            marcos.append(_NO_PERMITIDOS.sub('_', hilo))
+        marcos.reverse()
+        return ';'.join(marcos)
+
+    def muestrear(self, segundos: float, intervalo: float = 0.01, con_lineas: bool = False,
+                  por_hilo: bool = True) -> Tuple[Counter, int]:
+        """Retorna ``(conteo por pila collapsed, número de muestras)``
+
+        Lanza PerfilEnCursoExcepcion si otro muestreo está en curso.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise PerfilEnCursoExcepcion('Ya hay un muestreo en curso')
+        try:
+            segundos = min(max(segundos, 0.0), self.max_segundos)
+            intervalo = max(intervalo, 0.001)
+            propio = threading.get_ident()
+            conteos: Counter = Counter()
+            muestras = 0
+            limite = time.monotonic() + segundos
+            logger.info(f"Muestreo de pilas iniciado: {segundos}s cada {intervalo * 1000:.1f}ms")
+            while time.monotonic() < limite:
+                nombres = {hilo.ident: hilo.name for hilo in threading.enumerate()} if por_hilo else {}
+                for ident, frame in sys._current_frames().items():
+                    if ident == propio:
+                        continue
+                    hilo = nombres.get(ident, f"hilo-{ident}") if por_hilo else None
+                    conteos[self._pila(frame, hilo, con_lineas)] += 1
+                muestras += 1
+                time.sleep(intervalo)
+            return conteos, muestras
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def collapsed(conteos: Counter) -> str:
+        """Una línea ``pila conteo`` por pila, de la más frecuente a la menos frecuente"""
+        return ''.join(f"{pila} {conteo}\n" for pila, conteo in conteos.most_common())
+
+class PerfiladorPeticiones:
+    """cProfile para una fracción PROFILER_REQUEST_SAMPLE_RATIO de las peticiones de un blueprint
+
+    Cada perfil se guarda como archivo .prof (pstats) en PROFILER_REQUEST_DIR y los últimos
+    PROFILER_REQUEST_KEEP quedan disponibles con un resumen de las funciones más costosas.
+    """
+
+    def __init__(self):
+        self.proporcion = float(os.getenv('PROFILER_REQUEST_SAMPLE_RATIO', '0'))
+        self.directorio = os.getenv('PROFILER_REQUEST_DIR', 'perfiles')
+        self.funciones_resumen = int(os.getenv('PROFILER_REQUEST_TOP_FUNCTIONS', '15'))
+        self.recientes = deque(maxlen=int(os.getenv('PROFILER_REQUEST_KEEP', '50')))
+
+    def instrumentar_blueprint(self, bp):
+        from flask import g, request
+
+        if getattr(bp, '_perfilador_instrumentado', False):
+            return
+        bp._perfilador_instrumentado = True
+
+        @bp.before_request
+        def _iniciar_perfil():
+            if self.proporcion <= 0 or random.random() >= self.proporcion:
+                return
+            perfil = cProfile.Profile()
+            try:
+                perfil.enable()
+            except ValueError:
+                # Desde Python 3.12 el perfilador es global: otra petición ya se está perfilando
+                return
+            g._perfil_peticion = (perfil, time.perf_counter())
+
+        @bp.teardown_request
+        def _terminar_perfil(error=None):
+            en_curso = g.pop('_perfil_peticion', None)
+            if en_curso is None:
+                return
+            perfil, inicio = en_curso
+            perfil.disable()
+            ruta = request.url_rule.rule if request.url_rule is not None else 'desconocida'
+            try:
+                self._guardar(perfil, ruta, request.method, (time.perf_counter() - inicio) * 1000, error)
+            except Exception as e:
+                logger.warning(f"No se pudo guardar el perfil de {request.method} {ruta}: {e}")
+
+    def _guardar(self, perfil: cProfile.Profile, ruta: str, metodo: str, duracion_ms: float, error=None):
+        os.makedirs(self.directorio, exist_ok=True)
+        ruta_archivo = _NO_PERMITIDOS.sub('_', ruta).strip('/').replace('/', '_')
+        nombre = f"{datetime.utcnow():%Y%m%dT%H%M%S}-{metodo}-{ruta_archivo}-{uuid.uuid4().hex[:8]}.prof"
+        perfil.dump_stats(os.path.join(self.directorio, nombre))
+        self.recientes.append({
+            'archivo': nombre,
+            'ruta': ruta,
+            'metodo': metodo,
+            'duracion_ms': round(duracion_ms, 3),
+            'error': str(error) if error is not None else None,
+            'fecha': datetime.utcnow().isoformat(),
+            'funciones': self._resumen(perfil),
+        })
+        logger.info(f"Perfil de {metodo} {ruta} guardado en {nombre} ({duracion_ms:.1f}ms)")
+
+    def _resumen(self, perfil: cProfile.Profile) -> List[dict]:
+        """Funciones con mayor tiempo acumulado"""
+        estadisticas = pstats.Stats(perfil).stats
+        mayores = sorted(estadisticas.items(), key=lambda item: item[1][3], reverse=True)[:self.funciones_resumen]
+        return [
+            {
+                'funcion': f"{os.path.basename(archivo)}:{linea}({funcion})",
+                'llamadas': llamadas,
+                'tiempo_propio_ms': round(propio * 1000, 3),
+                'tiempo_acumulado_ms': round(acumulado * 1000, 3),
+            }
+            for (archivo, linea, funcion), (_, llamadas, propio, acumulado, _) in mayores
+        ]
+
+    def ruta_archivo(self, nombre: str) -> Optional[str]:
+        """Ruta de un perfil guardado por su nombre, None si no es uno de los recientes"""
+        if not any(perfil['archivo'] == nombre for perfil in list(self.recientes)):
+            return None
+        return os.path.join(os.path.abspath(self.directorio), nombre)
+
+# Instancias globales del perfilado
+muestreador_pilas = MuestreadorPilas()
+perfilador_peticiones = PerfiladorPeticiones()
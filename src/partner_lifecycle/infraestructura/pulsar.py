@@ -6,12 +6,23 @@ En este archivo se define la configuración y utilidades para Pulsar
 
 import os
 import json
+import time
 import uuid
+import zlib
+import queue
 import logging
+import threading
+import urllib.request
 import pulsar
-from typing import Dict, Any
-from pulsar import Client, Producer, Consumer
+from typing import Dict, Any, Callable, List, Optional
+from pulsar import Client, Producer, Consumer, CompressionType, Result, ConsumerBatchReceivePolicy
 from partner_lifecycle.seedwork.dominio.eventos import EventoDominio
+from partner_lifecycle.infraestructura.serializacion import registro_serializadores, ENCODING_JSON
+from partner_lifecycle.infraestructura.metricas import (
+    latencia_publicacion, errores_publicacion, nacks_consumidor
+)
+from partner_lifecycle.infraestructura.trazas import trazador, TRACEPARENT
+from partner_lifecycle.infraestructura.control_flujo import ControlFlujo, registrar_control, retirar_control
 
 # Try to import ConsumerType, fallback to string if not available
 try:
@@ -26,12 +37,69 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Eventos de las transiciones del ciclo de vida, se publican en partner-events
+EVENTOS_CICLO_VIDA = {
+    'PartnershipIniciada', 'PartnershipActivada', 'PartnershipSuspendida',
+    'PartnershipTerminada', 'PartnershipRenovada', 'NivelPartnershipActualizado'
+}
+
+def _enteros_por_nombre(valor: str) -> Dict[str, int]:
+    """Parsea ``"nombre:valor,otro:valor"`` en un dict de enteros"""
+    resultado = {}
+    for entrada in valor.split(','):
+        if ':' in entrada:
+            nombre, numero = entrada.rsplit(':', 1)
+            resultado[nombre.strip()] = int(numero)
+    return resultado
+
 class PulsarConfig:
     def __init__(self):
         self.service_url = os.getenv('PULSAR_SERVICE_URL', 'pulsar://localhost:6650')
         self.admin_url = os.getenv('PULSAR_ADMIN_URL', 'http://localhost:8080')
         self.tenant = 'partner-lifecycle'
         self.namespace = 'events'
+        # Publicación asíncrona con batching: topics (nombre corto) separados por coma
+        self.async_topics = {
+            topic.strip() for topic in os.getenv('PULSAR_ASYNC_TOPICS', '').split(',') if topic.strip()
+        }
+        self.compression = os.getenv('PULSAR_COMPRESSION', 'LZ4').upper()
+        self.batching_max_messages = int(os.getenv('PULSAR_BATCHING_MAX_MESSAGES', '1000'))
+        self.batching_max_publish_delay_ms = int(os.getenv('PULSAR_BATCHING_MAX_DELAY_MS', '10'))
+        self.max_in_flight = int(os.getenv('PULSAR_MAX_IN_FLIGHT_PUBLISH', '1000'))
+        self.flush_timeout_seconds = float(os.getenv('PULSAR_FLUSH_TIMEOUT_SECONDS', '30'))
+        # Pool de workers del consumidor: mensajes con la misma llave se procesan en orden
+        self.consumer_workers = max(1, int(os.getenv('PULSAR_CONSUMER_WORKERS', '1')))
+        self.consumer_worker_queue_size = int(os.getenv('PULSAR_CONSUMER_WORKER_QUEUE_SIZE', '100'))
+        # Shared por defecto; KeyShared mantiene el orden por llave también entre instancias
+        self.consumer_type = os.getenv('PULSAR_CONSUMER_TYPE', 'Shared')
+        # Consumo por lotes con batch_receive (límite de mensajes, bytes y tiempo)
+        self.consumer_batch_enabled = os.getenv('PULSAR_CONSUMER_BATCH_ENABLED', 'false').lower() == 'true'
+        self.consumer_batch_max_messages = int(os.getenv('PULSAR_CONSUMER_BATCH_MAX_MESSAGES', '100'))
+        self.consumer_batch_max_bytes = int(os.getenv('PULSAR_CONSUMER_BATCH_MAX_BYTES', str(1024 * 1024)))
+        self.consumer_batch_timeout_ms = int(os.getenv('PULSAR_CONSUMER_BATCH_TIMEOUT_MS', '100'))
+        # Control de flujo: cola de recepción del cliente y mensajes en vuelo, con valores por suscripción
+        self.receiver_queue_size = int(os.getenv('PULSAR_RECEIVER_QUEUE_SIZE', '1000'))
+        self.subscription_receiver_queue_sizes = _enteros_por_nombre(os.getenv('PULSAR_SUBSCRIPTION_RECEIVER_QUEUE_SIZES', ''))
+        self.consumer_max_in_flight = int(os.getenv(
+            'PULSAR_CONSUMER_MAX_IN_FLIGHT', str(self.consumer_workers * (self.consumer_worker_queue_size + 1))
+        ))
+        self.subscription_max_in_flight = _enteros_por_nombre(os.getenv('PULSAR_SUBSCRIPTION_MAX_IN_FLIGHT', ''))
+        # Backend del cliente: pulsar (broker real) o memory (broker en proceso para benchmarks)
+        self.backend = os.getenv('PULSAR_BACKEND', 'pulsar').lower()
+        # Codificación por topic (nombre corto): "partner-events:msgpack,content-events:json"
+        self.default_encoding = os.getenv('PULSAR_DEFAULT_ENCODING', ENCODING_JSON).lower()
+        self.topic_encodings = {}
+        for entrada in os.getenv('PULSAR_TOPIC_ENCODINGS', '').split(','):
+            if ':' in entrada:
+                topic, encoding = entrada.split(':', 1)
+                self.topic_encodings[topic.strip()] = encoding.strip().lower()
+        
+    def create_client(self):
+        """Crea el cliente del backend configurado: pulsar.Client o el broker en memoria"""
+        if self.backend == 'memory':
+            from partner_lifecycle.infraestructura.pulsar_memoria import ClientMemoria
+            return ClientMemoria(self.service_url)
+        return Client(self.service_url)
         
     def get_topic_name(self, event_type: str) -> str:
         """Genera el nombre del topic basado en el tipo de evento y tenant"""
@@ -46,56 +114,261 @@ class PulsarConfig:
             return 'content-events'
         elif event_type == 'EventPartnerCompleted' and status == 'success':
             return 'partner-events'
+        elif event_type in EVENTOS_CICLO_VIDA:
+            return 'partner-events'
         else:
             # Default routing
             return event_type
+    
+    def get_receiver_queue_size(self, subscription_name: str) -> int:
+        """Mensajes que el cliente acepta por adelantado del broker para la suscripción"""
+        return self.subscription_receiver_queue_sizes.get(subscription_name, self.receiver_queue_size)
+    
+    def get_max_in_flight(self, subscription_name: str) -> int:
+        """Mensajes recibidos sin ack permitidos para la suscripción (límite superior del control de flujo)"""
+        return self.subscription_max_in_flight.get(subscription_name, self.consumer_max_in_flight)
+    
+    def get_encoding(self, topic: str) -> str:
+        """Codificación configurada para el topic (nombre corto)"""
+        return self.topic_encodings.get(topic, self.default_encoding)
+    
+    def is_async_topic(self, topic: str) -> bool:
+        """Indica si el topic (nombre corto) se publica en modo asíncrono con batching"""
+        return topic in self.async_topics or '*' in self.async_topics
+    
+    def get_compression_type(self) -> CompressionType:
+        """Obtiene el tipo de compresión configurado para los producers asíncronos"""
+        compresiones = {
+            'NONE': CompressionType.NONE,
+            'LZ4': CompressionType.LZ4,
+            'ZSTD': CompressionType.ZSTD,
+            'ZLIB': CompressionType.ZLib,
+            'SNAPPY': CompressionType.SNAPPY,
+        }
+        if self.compression not in compresiones:
+            logger.warning(f"Compresión {self.compression} no soportada, usando LZ4")
+        return compresiones.get(self.compression, CompressionType.LZ4)
+    
+    def get_consumer_type(self):
+        """Obtiene el tipo de suscripción configurado"""
+        return getattr(ConsumerType, self.consumer_type, ConsumerType.Shared)
+    
+    def allows_cumulative_ack(self) -> bool:
+        """El ack acumulativo no está permitido en suscripciones Shared ni KeyShared"""
+        return self.consumer_type in ('Exclusive', 'Failover')
+
+# Backlog consultado a la API de administración: {(topic_name, suscripcion): (instante, valor)}
+_cache_backlog: Dict[tuple, tuple] = {}
+
+def obtener_backlog(config: PulsarConfig, topic_name: str, subscription_name: str) -> Optional[int]:
+    """Mensajes pendientes de la suscripción (msgBacklog), None si no se pudo consultar
+
+    Con el broker real se consulta la API de administración y el resultado se guarda
+    PULSAR_BACKLOG_CACHE_SECONDS para que cada scrape de métricas no genere una petición.
+    """
+    if config.backend == 'memory':
+        from partner_lifecycle.infraestructura.pulsar_memoria import broker_memoria
+        suscripcion = broker_memoria.topic(topic_name).suscripciones.get(subscription_name)
+        return suscripcion.backlog() if suscripcion is not None else None
+    
+    llave = (topic_name, subscription_name)
+    ahora = time.monotonic()
+    en_cache = _cache_backlog.get(llave)
+    if en_cache and ahora - en_cache[0] < float(os.getenv('PULSAR_BACKLOG_CACHE_SECONDS', '15')):
+        return en_cache[1]
+    url = f"{config.admin_url}/admin/v2/{topic_name.replace('://', '/')}/stats"
+    try:
+        with urllib.request.urlopen(url, timeout=2) as respuesta:
+            estadisticas = json.loads(respuesta.read())
+        backlog = estadisticas.get('subscriptions', {}).get(subscription_name, {}).get('msgBacklog')
+    except Exception as e:
+        logger.warning(f"No se pudo consultar el backlog de {topic_name}: {e}")
+        backlog = None
+    _cache_backlog[llave] = (ahora, backlog)
+    return backlog
+
+def iniciar_span_consumo(consumer, msg, event_data):
+    """Span raíz del consumo de un mensaje: continúa su traceparent o usa el saga_id del evento"""
+    if not trazador.habilitado:
+        return None
+    saga_id = event_data.get('saga_id') if isinstance(event_data, dict) else None
+    atributos = {'topic': consumer.topic()}
+    if isinstance(event_data, dict) and event_data.get('event_type'):
+        atributos['event_type'] = event_data['event_type']
+    return trazador.iniciar('pulsar.consumir', saga_id=saga_id,
+                            traceparent=msg.properties().get(TRACEPARENT), atributos=atributos)
 
 class PulsarEventPublisher:
-    def __init__(self):
+    def __init__(self, todos_async: bool = False):
         self.config = PulsarConfig()
+        # Publica todos los topics con send_async (relay de outbox), sin importar PULSAR_ASYNC_TOPICS
+        self.todos_async = todos_async
         self.client = None
         self.producers: Dict[str, Producer] = {}
+        self._async_producers = set()
+        self._lock = threading.Lock()
+        # Ventana acotada de mensajes asíncronos en vuelo
+        self._in_flight = threading.BoundedSemaphore(self.config.max_in_flight)
+        self._pendientes = 0
+        self._sin_pendientes = threading.Condition()
+        self._fallos: List[tuple] = []
         
     def _get_client(self) -> Client:
         """Obtiene o crea el cliente de Pulsar"""
         if self.client is None:
-            self.client = Client(self.config.service_url)
+            self.client = self.config.create_client()
         return self.client
     
-    def _get_producer(self, topic_name: str) -> Producer:
+    def _get_producer(self, topic_name: str, async_mode: bool = False) -> Producer:
         """Obtiene o crea un producer para el topic especificado"""
         if topic_name not in self.producers:
-            client = self._get_client()
-            self.producers[topic_name] = client.create_producer(topic_name)
+            with self._lock:
+                if topic_name not in self.producers:
+                    client = self._get_client()
+                    if async_mode:
+                        self.producers[topic_name] = client.create_producer(
+                            topic_name,
+                            compression_type=self.config.get_compression_type(),
+                            batching_enabled=True,
+                            batching_max_messages=self.config.batching_max_messages,
+                            batching_max_publish_delay_ms=self.config.batching_max_publish_delay_ms,
+                            max_pending_messages=self.config.max_in_flight,
+                            block_if_queue_full=True
+                        )
+                        self._async_producers.add(topic_name)
+                    else:
+                        self.producers[topic_name] = client.create_producer(topic_name)
         return self.producers[topic_name]
     
-    def publish_event(self, saga_id: uuid, evento: EventoDominio, event_type: str, status: str):
-        """Publica un evento en Pulsar con routing basado en tipo y status"""
+    def construir_mensaje(self, saga_id: uuid, evento: EventoDominio, event_type: str, status: str) -> tuple:
+        """Determina el topic y serializa el evento con la codificación configurada para el topic
+        
+        Retorna la tupla ``(topic, data, propiedades)`` donde ``topic`` es el nombre corto del topic
+        y ``propiedades`` anuncia la codificación y la versión del esquema.
+        """
+        # Determinar tenant y topic basado en el tipo de evento y status
+        topic = self.config.get_routing_config(event_type, status)
+        
+        # Serializar el evento con el codificador compilado de su clase
+        encoding = self.config.get_encoding(topic)
+        data = registro_serializadores.serializar_mensaje(saga_id, evento, event_type, status, encoding)
+        return topic, data, registro_serializadores.propiedades(encoding)
+    
+    def publish_event(self, saga_id: uuid, evento: EventoDominio, event_type: str, status: str,
+                      callback: Optional[Callable[[Optional[Exception]], None]] = None):
+        """Publica un evento en Pulsar con routing basado en tipo y status
+        
+        Si el topic está configurado como asíncrono, el envío no bloquea y el resultado
+        se notifica a través de ``callback`` (``None`` si fue exitoso, la excepción si falló).
+        """
         try:
-            # Determinar tenant y topic basado en el tipo de evento y status
-            topic = self.config.get_routing_config(event_type, status)
-            topic_name = self.config.get_topic_name(topic)
-            producer = self._get_producer(topic_name)
-            
-            # Serializar el evento
-            event_dict = {
-                'saga_id': saga_id,
-                'service': 'Partner',
-                'status': status, 
-                'event_id': evento.id,
-                'event_type': event_type,
-                'event_data': evento.__dict__,
-                'timestamp': evento.fecha_evento.isoformat() if hasattr(evento, 'fecha_evento') else None
-            }
-            event_data=json.dumps(event_dict, default=str)
+            topic, data, propiedades = self.construir_mensaje(saga_id, evento, event_type, status)
+            self.publish_raw(topic, data, callback, propiedades)
+        except Exception as e:
+            logger.error(f"Error publicando evento en Pulsar: {e}")
+            raise
+    
+    def publish_raw(self, topic: str, data: bytes,
+                    callback: Optional[Callable[[Optional[Exception]], None]] = None,
+                    propiedades: Optional[Dict[str, str]] = None):
+        """Publica un mensaje ya serializado en el topic (nombre corto) indicado
+        
+        Sin ``propiedades`` el mensaje se publica sin content-type y el consumidor lo trata como JSON.
+        El span de la publicación continúa el ``traceparent`` de las propiedades (filas de outbox)
+        y el mensaje sale con el traceparent del span.
+        """
+        topic_name = self.config.get_topic_name(topic)
+        async_mode = self.todos_async or self.config.is_async_topic(topic)
+        span = trazador.iniciar('pulsar.publicar', traceparent=propiedades.get(TRACEPARENT) if propiedades else None,
+                                atributos={'topic': topic})
+        propiedades = trazador.inyectar(propiedades, span)
+        inicio = time.perf_counter()
+        try:
+            producer = self._get_producer(topic_name, async_mode)
             
             # Publicar el evento
-            producer.send(event_data.encode('utf-8'))
-            logger.info(f"Evento publicado en {topic_name} (topic: {topic}): {evento.__class__.__name__}")
-            
+            if async_mode:
+                self._send_async(producer, topic_name, data, callback, propiedades, topic, inicio, span)
+                logger.debug("Mensaje encolado en %s (topic: %s)", topic_name, topic)
+                return
+            producer.send(data, properties=propiedades)
         except Exception as e:
-            logger.error(f"Error publicando evento en Pulsar: {e}")
+            errores_publicacion.inc(topic)
+            trazador.terminar(span, e)
             raise
+        latencia_publicacion.observar(time.perf_counter() - inicio, topic)
+        trazador.terminar(span)
+        logger.info("Mensaje publicado en %s (topic: %s)", topic_name, topic)
+        if callback:
+            callback(None)
+    
+    def _send_async(self, producer: Producer, topic_name: str, data: bytes, callback=None, propiedades=None,
+                    topic: str = None, inicio: float = None, span=None):
+        """Envía un mensaje con send_async respetando la ventana de mensajes en vuelo
+        
+        La latencia se mide desde ``inicio`` hasta la confirmación del broker, donde también
+        se cierra el ``span`` de la publicación.
+        """
+        topic = topic or topic_name
+        inicio = inicio or time.perf_counter()
+        if not self._in_flight.acquire(timeout=self.config.flush_timeout_seconds):
+            raise TimeoutError(f"Ventana de publicación llena para {topic_name}")
+        with self._sin_pendientes:
+            self._pendientes += 1
+        
+        def _on_send(res, msg_id):
+            error = None
+            try:
+                if res != Result.Ok:
+                    error = Exception(f"Error publicando en {topic_name}: {res}")
+                    logger.error(str(error))
+                    errores_publicacion.inc(topic)
+                    with self._lock:
+                        self._fallos.append((topic_name, error))
+                else:
+                    latencia_publicacion.observar(time.perf_counter() - inicio, topic)
+                trazador.terminar(span, error)
+                if callback:
+                    callback(error)
+            except Exception as e:
+                logger.error(f"Error en callback de publicación para {topic_name}: {e}")
+            finally:
+                self._in_flight.release()
+                with self._sin_pendientes:
+                    self._pendientes -= 1
+                    if self._pendientes == 0:
+                        self._sin_pendientes.notify_all()
+        
+        try:
+            producer.send_async(data, _on_send, properties=propiedades)
+        except Exception:
+            self._in_flight.release()
+            with self._sin_pendientes:
+                self._pendientes -= 1
+                self._sin_pendientes.notify_all()
+            raise
+    
+    def flush(self) -> List[tuple]:
+        """Fuerza el envío de los mensajes asíncronos pendientes y espera su confirmación
+        
+        Retorna la lista de fallos ``(topic_name, error)`` ocurridos desde el último flush.
+        """
+        for topic_name in list(self._async_producers):
+            try:
+                self.producers[topic_name].flush()
+            except Exception as e:
+                logger.error(f"Error haciendo flush del producer {topic_name}: {e}")
+                with self._lock:
+                    self._fallos.append((topic_name, e))
+        with self._sin_pendientes:
+            if not self._sin_pendientes.wait_for(lambda: self._pendientes == 0,
+                                                 timeout=self.config.flush_timeout_seconds):
+                logger.warning(f"Flush finalizado con {self._pendientes} mensajes aún en vuelo")
+        with self._lock:
+            fallos, self._fallos = self._fallos, []
+        if fallos:
+            logger.error(f"{len(fallos)} eventos no pudieron publicarse de forma asíncrona")
+        return fallos
     
     # def _serialize_event(self, evento: EventoDominio) -> str:
     #     """Serializa un evento a JSON"""
@@ -114,61 +387,217 @@ class PulsarEventPublisher:
             self.client.close()
 
 class PulsarEventConsumer:
-    def __init__(self):
+    def __init__(self, medir_saturacion: Optional[Callable[[], float]] = None):
         self.config = PulsarConfig()
         self.client = None
         self.consumers = {}
+        self.running = False
+        self._worker_queues: Dict[str, List[queue.Queue]] = {}
+        # Saturación del pool de la base de datos para el control de flujo (None: solo latencia)
+        self._medir_saturacion = medir_saturacion
+        self._controles: Dict[str, ControlFlujo] = {}
         
     def _get_client(self) -> Client:
         """Obtiene o crea el cliente de Pulsar"""
         if self.client is None:
-            self.client = Client(self.config.service_url)
+            self.client = self.config.create_client()
         return self.client
     
-    def subscribe_to_topic(self, topic_name: str, subscription_name: str, callback):
-        """Se suscribe a un topic específico"""
+    def subscribe_to_topic(self, topic_name: str, subscription_name: str, callback, batch_callback=None):
+        """Se suscribe a un topic específico
+        
+        Si el consumo por lotes está habilitado y se entrega ``batch_callback``, los mensajes
+        se reciben con ``batch_receive`` y se entregan al callback como una lista de eventos.
+        El consumo pasa por el control de flujo de la suscripción: límite de mensajes en vuelo
+        y pausa mientras el pool de la base de datos o los handlers estén saturados.
+        """
         try:
             client = self._get_client()
-            consumer = client.subscribe(topic=topic_name, subscription_name=subscription_name, consumer_type=ConsumerType.Shared)
+            batch_mode = self.config.consumer_batch_enabled and batch_callback is not None
+            opciones = {'receiver_queue_size': self.config.get_receiver_queue_size(subscription_name)}
+            if batch_mode:
+                opciones['batch_receive_policy'] = ConsumerBatchReceivePolicy(
+                    self.config.consumer_batch_max_messages,
+                    self.config.consumer_batch_max_bytes,
+                    self.config.consumer_batch_timeout_ms
+                )
+            consumer = client.subscribe(topic=topic_name, subscription_name=subscription_name,
+                                        consumer_type=self.config.get_consumer_type(), **opciones)
             self.consumers[topic_name] = consumer
+            self.running = True
+            control = self._controles[topic_name] = registrar_control(ControlFlujo(
+                subscription_name, self.config.get_max_in_flight(subscription_name), self._medir_saturacion
+            ))
+            
+            if batch_mode:
+                thread = threading.Thread(target=self._process_batches, args=(consumer, batch_callback, control),
+                                          daemon=True)
+                thread.start()
+                logger.info(f"Suscrito al topic {topic_name} con subscription {subscription_name} (modo lote)")
+                return
+            
+            # Pool de workers por topic, cada worker con su propia cola para preservar el orden por llave
+            workers = []
+            if self.config.consumer_workers > 1:
+                for i in range(self.config.consumer_workers):
+                    cola = queue.Queue(maxsize=self.config.consumer_worker_queue_size)
+                    worker = threading.Thread(target=self._worker_loop, args=(consumer, cola, callback, control),
+                                              name=f"pulsar-worker-{i}", daemon=True)
+                    worker.start()
+                    workers.append(cola)
+                self._worker_queues[topic_name] = workers
             
             # Procesar mensajes en un hilo separado
-            import threading
-            thread = threading.Thread(target=self._process_messages, args=(consumer, callback))
+            thread = threading.Thread(target=self._process_messages, args=(consumer, callback, workers, control))
             thread.daemon = True
             thread.start()
             
-            logger.info(f"Suscrito al topic {topic_name} con subscription {subscription_name}")
+            logger.info(
+                f"Suscrito al topic {topic_name} con subscription {subscription_name} "
+                f"({self.config.consumer_workers} workers, {control.max_en_vuelo} en vuelo)"
+            )
             
         except Exception as e:
             logger.error(f"Error suscribiéndose al topic {topic_name}: {e}")
             raise
     
-    def _process_messages(self, consumer, callback):
-        """Procesa mensajes del consumer"""
+    @staticmethod
+    def _get_ordering_key(msg, event_data: Dict[str, Any]) -> str:
+        """Obtiene la llave de orden del mensaje: saga_id, id de la partnership o partition key"""
+        key = event_data.get('saga_id') if isinstance(event_data, dict) else None
+        if not key and isinstance(event_data, dict) and isinstance(event_data.get('event_data'), dict):
+            key = event_data['event_data'].get('id_partnership')
+        if not key:
+            key = msg.partition_key()
+        return str(key) if key else str(msg.message_id())
+    
+    def _process_messages(self, consumer, callback, workers: List[queue.Queue] = None, control: ControlFlujo = None):
+        """Procesa mensajes del consumer
+        
+        Antes de cada receive se reserva un lugar en el control de flujo: mientras está pausado
+        o en el límite no se reciben mensajes y el broker deja de entregar al llenarse la cola
+        de recepción del cliente.
+        """
         try:
-            while True:
+            while self.running:
+                if control is not None and not control.adquirir(timeout=1.0):
+                    continue
                 try:
                     msg = consumer.receive(timeout_millis=1000)
-                    # Deserializar el mensaje
-                    event_data = json.loads(msg.data().decode('utf-8'))
-                    callback(event_data)
-                    consumer.acknowledge(msg)
                 except Exception as e:
+                    if control is not None:
+                        control.liberar()
                     # Check if it's a timeout exception (normal behavior when no messages)
                     if "TimeOut" in str(e) or "timeout" in str(e).lower():
                         # This is normal - no messages available, continue waiting
                         continue
-                    else:
-                        # This is an actual error processing a message
-                        logger.error(f"Error procesando mensaje: {e}")
-                        if 'msg' in locals():
-                            consumer.negative_acknowledge(msg)
+                    logger.error(f"Error recibiendo mensaje: {e}")
+                    continue
+                try:
+                    # Deserializar el mensaje
+                    event_data = registro_serializadores.deserializar_mensaje(msg.data(), msg.properties())
+                except Exception as e:
+                    logger.error(f"Error deserializando mensaje: {e}")
+                    self._nack(consumer, msg)
+                    if control is not None:
+                        control.liberar()
+                    continue
+                # El span cubre también la espera en la cola del worker
+                span = iniciar_span_consumo(consumer, msg, event_data)
+                if workers:
+                    # Misma llave -> mismo worker: orden por llave y paralelismo entre llaves
+                    key = self._get_ordering_key(msg, event_data)
+                    workers[zlib.crc32(key.encode('utf-8')) % len(workers)].put((msg, event_data, span))
+                else:
+                    self._handle_message(consumer, msg, event_data, callback, span, control)
         except Exception as e:
             logger.error(f"Error en el procesamiento de mensajes: {e}")
     
+    def _process_batches(self, consumer, batch_callback, control: ControlFlujo = None):
+        """Procesa lotes de mensajes recibidos con batch_receive
+        
+        El control de flujo solo pausa la recepción; la latencia registrada es la del lote.
+        """
+        cumulative_ack = self.config.allows_cumulative_ack()
+        while self.running:
+            if control is not None and not control.esperar_habilitado(timeout=1.0):
+                continue
+            try:
+                mensajes = list(consumer.batch_receive())
+            except Exception as e:
+                logger.error(f"Error recibiendo lote de mensajes: {e}")
+                continue
+            if not mensajes:
+                continue
+            
+            validos, eventos = [], []
+            for msg in mensajes:
+                try:
+                    eventos.append(registro_serializadores.deserializar_mensaje(msg.data(), msg.properties()))
+                    validos.append(msg)
+                except Exception as e:
+                    logger.error(f"Error deserializando mensaje: {e}")
+                    self._nack(consumer, msg)
+            if not eventos:
+                continue
+            
+            inicio = time.perf_counter()
+            try:
+                with trazador.span('pulsar.consumir_lote', atributos={'topic': consumer.topic(), 'mensajes': len(eventos)}):
+                    batch_callback(eventos)
+            except Exception as e:
+                logger.error(f"Error procesando lote de {len(eventos)} mensajes: {e}")
+                for msg in validos:
+                    self._nack(consumer, msg)
+                continue
+            finally:
+                if control is not None:
+                    control.registrar_latencia(time.perf_counter() - inicio)
+            
+            if cumulative_ack and len(validos) == len(mensajes):
+                consumer.acknowledge_cumulative(validos[-1])
+            else:
+                for msg in validos:
+                    consumer.acknowledge(msg)
+    
+    def _worker_loop(self, consumer, cola: queue.Queue, callback, control: ControlFlujo = None):
+        """Procesa en orden los mensajes asignados a un worker"""
+        while True:
+            item = cola.get()
+            if item is None:
+                break
+            msg, event_data, span = item
+            self._handle_message(consumer, msg, event_data, callback, span, control)
+    
+    @staticmethod
+    def _nack(consumer, msg):
+        nacks_consumidor.inc(consumer.topic())
+        consumer.negative_acknowledge(msg)
+    
+    def _handle_message(self, consumer, msg, event_data, callback, span=None, control: ControlFlujo = None):
+        """Ejecuta el callback y confirma el mensaje solo si el procesamiento fue exitoso"""
+        inicio = time.perf_counter()
+        with trazador.activar(span):
+            try:
+                callback(event_data)
+                consumer.acknowledge(msg)
+            except Exception as e:
+                # This is an actual error processing a message
+                logger.error(f"Error procesando mensaje: {e}")
+                trazador.marcar_error(span, e)
+                self._nack(consumer, msg)
+            finally:
+                if control is not None:
+                    control.liberar(time.perf_counter() - inicio)
+    
     def close(self):
         """Cierra todas las conexiones"""
+        self.running = False
+        for colas in self._worker_queues.values():
+            for cola in colas:
+                cola.put(None)
+        for control in self._controles.values():
+            retirar_control(control)
         for consumer in self.consumers.values():
             consumer.close()
         if self.client:
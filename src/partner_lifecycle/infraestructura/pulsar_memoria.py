@@ -0,0 +1,335 @@
+"""Broker de Pulsar en memoria
+
+En este archivo se define un broker en proceso que implementa la parte de la API de
+``pulsar.Client`` que usan el publisher, los consumidores y el replay (producers, suscripciones
+Shared con ack/nack, batch_receive, message_listener y readers). Se selecciona con
+PULSAR_BACKEND=memory y sirve para medir el servicio sin un broker real.
+
+"""
+
+import time
+import queue
+import logging
+import threading
+from typing import Dict, List, Optional
+from pulsar import MessageId, Result, Timeout, InitialPosition
+
+logger = logging.getLogger(__name__)
+
+class MensajeMemoria:
+    """Mensaje publicado en un topic en memoria, con la misma interfaz que pulsar.Message"""
+
+    __slots__ = ('_topic', '_data', '_properties', '_partition_key', '_message_id',
+                 '_publish_timestamp', '_redelivery_count')
+
+    def __init__(self, topic: str, data: bytes, properties: Optional[Dict[str, str]], partition_key: Optional[str],
+                 message_id: MessageId, redelivery_count: int = 0):
+        self._topic = topic
+        self._data = data
+        self._properties = properties or {}
+        self._partition_key = partition_key
+        self._message_id = message_id
+        self._publish_timestamp = int(time.time() * 1000)
+        self._redelivery_count = redelivery_count
+
+    def data(self) -> bytes:
+        return self._data
+
+    def value(self) -> bytes:
+        return self._data
+
+    def properties(self) -> Dict[str, str]:
+        return self._properties
+
+    def partition_key(self) -> str:
+        return self._partition_key or ''
+
+    def message_id(self) -> MessageId:
+        return self._message_id
+
+    def publish_timestamp(self) -> int:
+        return self._publish_timestamp
+
+    def redelivery_count(self) -> int:
+        return self._redelivery_count
+
+    def topic_name(self) -> str:
+        return self._topic
+
+    def reentrega(self) -> 'MensajeMemoria':
+        mensaje = MensajeMemoria(self._topic, self._data, self._properties, self._partition_key,
+                                 self._message_id, self._redelivery_count + 1)
+        mensaje._publish_timestamp = self._publish_timestamp
+        return mensaje
+
+class SuscripcionMemoria:
+    """Suscripción Shared: los consumidores comparten una cola y los nack se reentregan"""
+
+    def __init__(self, nombre: str, retraso_nack: float = 1.0):
+        self.nombre = nombre
+        self.cola: queue.Queue = queue.Queue()
+        # Como negative_ack_redelivery_delay_ms: un nack no se reentrega de inmediato
+        self.retraso_nack = retraso_nack
+        self.por_reentregar = 0
+        self.sin_ack = 0
+        self.confirmados = 0
+        self.rechazados = 0
+        self._lock = threading.Lock()
+
+    def entregar(self, mensaje: MensajeMemoria):
+        self.cola.put(mensaje)
+
+    def recibido(self):
+        with self._lock:
+            self.sin_ack += 1
+
+    def confirmar(self):
+        with self._lock:
+            self.sin_ack -= 1
+            self.confirmados += 1
+
+    def rechazar(self, mensaje: MensajeMemoria):
+        with self._lock:
+            self.sin_ack -= 1
+            self.rechazados += 1
+            self.por_reentregar += 1
+        temporizador = threading.Timer(self.retraso_nack, self._reentregar, (mensaje.reentrega(),))
+        temporizador.daemon = True
+        temporizador.start()
+
+    def _reentregar(self, mensaje: MensajeMemoria):
+        with self._lock:
+            self.por_reentregar -= 1
+        self.cola.put(mensaje)
+
+    def backlog(self) -> int:
+        """Mensajes pendientes de entrega, entregados sin confirmar y rechazados por reentregar"""
+        return self.cola.qsize() + self.sin_ack + self.por_reentregar
+
+class TopicMemoria:
+    """Log append-only del topic y sus suscripciones"""
+
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self.mensajes: List[MensajeMemoria] = []
+        self.suscripciones: Dict[str, SuscripcionMemoria] = {}
+        self.lock = threading.Lock()
+        self.nuevo = threading.Condition(self.lock)
+
+    def publicar(self, data: bytes, properties=None, partition_key=None) -> MessageId:
+        with self.lock:
+            message_id = MessageId(partition=-1, ledger_id=0, entry_id=len(self.mensajes), batch_index=-1)
+            mensaje = MensajeMemoria(self.nombre, data, properties, partition_key, message_id)
+            self.mensajes.append(mensaje)
+            for suscripcion in self.suscripciones.values():
+                suscripcion.entregar(mensaje)
+            self.nuevo.notify_all()
+        return message_id
+
+    def suscripcion(self, nombre: str, posicion_inicial=InitialPosition.Latest) -> SuscripcionMemoria:
+        with self.lock:
+            suscripcion = self.suscripciones.get(nombre)
+            if suscripcion is None:
+                suscripcion = SuscripcionMemoria(nombre)
+                if posicion_inicial == InitialPosition.Earliest:
+                    for mensaje in self.mensajes:
+                        suscripcion.entregar(mensaje)
+                self.suscripciones[nombre] = suscripcion
+            return suscripcion
+
+class BrokerMemoria:
+    """Topics en memoria compartidos por todos los clientes del proceso"""
+
+    def __init__(self):
+        self.topics: Dict[str, TopicMemoria] = {}
+        self._lock = threading.Lock()
+
+    def topic(self, nombre: str) -> TopicMemoria:
+        with self._lock:
+            topic = self.topics.get(nombre)
+            if topic is None:
+                topic = self.topics[nombre] = TopicMemoria(nombre)
+            return topic
+
+    def estadisticas(self) -> Dict[str, Dict[str, dict]]:
+        """Mensajes por topic y backlog, confirmados y rechazados por suscripción"""
+        return {
+            nombre: {
+                'mensajes': len(topic.mensajes),
+                'suscripciones': {
+                    suscripcion.nombre: {
+                        'backlog': suscripcion.backlog(),
+                        'confirmados': suscripcion.confirmados,
+                        'rechazados': suscripcion.rechazados,
+                    }
+                    for suscripcion in list(topic.suscripciones.values())
+                },
+            }
+            for nombre, topic in list(self.topics.items())
+        }
+
+class ProducerMemoria:
+    def __init__(self, topic: TopicMemoria):
+        self._topic = topic
+
+    def topic(self) -> str:
+        return self._topic.nombre
+
+    def send(self, content: bytes, properties=None, partition_key=None, **opciones) -> MessageId:
+        return self._topic.publicar(content, properties, partition_key)
+
+    def send_async(self, content: bytes, callback, properties=None, partition_key=None, **opciones):
+        """La publicación en memoria es inmediata: el callback se invoca antes de retornar"""
+        message_id = self._topic.publicar(content, properties, partition_key)
+        callback(Result.Ok, message_id)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+class ConsumerMemoria:
+    def __init__(self, topic: TopicMemoria, suscripcion: SuscripcionMemoria, message_listener=None,
+                 batch_receive_policy=None):
+        self._topic = topic
+        self._suscripcion = suscripcion
+        self._cerrado = threading.Event()
+        self._activo = threading.Event()
+        self._activo.set()
+        self._politica = batch_receive_policy.policy() if batch_receive_policy is not None else None
+        if message_listener is not None:
+            threading.Thread(target=self._escuchar, args=(message_listener,),
+                             name=f"pulsar-memoria-{suscripcion.nombre}", daemon=True).start()
+
+    def topic(self) -> str:
+        return self._topic.nombre
+
+    def subscription_name(self) -> str:
+        return self._suscripcion.nombre
+
+    def receive(self, timeout_millis: int = None) -> MensajeMemoria:
+        try:
+            mensaje = self._suscripcion.cola.get(timeout=None if timeout_millis is None else timeout_millis / 1000)
+        except queue.Empty:
+            raise Timeout('Pulsar error: TimeOut')
+        self._suscripcion.recibido()
+        return mensaje
+
+    def batch_receive(self) -> List[MensajeMemoria]:
+        """Espera el primer mensaje hasta el timeout de la política y completa el lote sin bloquear"""
+        max_mensajes = self._politica.getMaxNumMessages() if self._politica else 100
+        max_bytes = self._politica.getMaxNumBytes() if self._politica else 10 * 1024 * 1024
+        timeout = (self._politica.getTimeoutMs() if self._politica else 100) / 1000
+        mensajes, total = [], 0
+        try:
+            mensajes.append(self._suscripcion.cola.get(timeout=timeout))
+            total += len(mensajes[0].data())
+            while len(mensajes) < max_mensajes and total < max_bytes:
+                mensaje = self._suscripcion.cola.get_nowait()
+                mensajes.append(mensaje)
+                total += len(mensaje.data())
+        except queue.Empty:
+            pass
+        for _ in mensajes:
+            self._suscripcion.recibido()
+        return mensajes
+
+    def acknowledge(self, mensaje):
+        self._suscripcion.confirmar()
+
+    def acknowledge_cumulative(self, mensaje):
+        """En memoria equivale a confirmar todos los recibidos sin ack de esta suscripción"""
+        with self._suscripcion._lock:
+            self._suscripcion.confirmados += self._suscripcion.sin_ack
+            self._suscripcion.sin_ack = 0
+
+    def negative_acknowledge(self, mensaje):
+        self._suscripcion.rechazar(mensaje)
+
+    def pause_message_listener(self):
+        self._activo.clear()
+
+    def resume_message_listener(self):
+        self._activo.set()
+
+    def _escuchar(self, listener):
+        while not self._cerrado.is_set():
+            self._activo.wait(0.1)
+            if not self._activo.is_set():
+                continue
+            try:
+                mensaje = self.receive(timeout_millis=100)
+            except Timeout:
+                continue
+            try:
+                listener(self, mensaje)
+            except Exception as e:
+                logger.error(f"Error en message_listener en memoria: {e}")
+
+    def close(self):
+        self._cerrado.set()
+
+class ReaderMemoria:
+    def __init__(self, topic: TopicMemoria, start_message_id: MessageId, inclusivo: bool = False):
+        self._topic = topic
+        self._posicion = 0
+        self.seek(start_message_id, inclusivo)
+
+    def topic(self) -> str:
+        return self._topic.nombre
+
+    def seek(self, destino, inclusivo: bool = False):
+        """Posiciona el reader en un MessageId o en un timestamp de publicación en milisegundos"""
+        with self._topic.lock:
+            mensajes = self._topic.mensajes
+            if isinstance(destino, int):
+                self._posicion = next(
+                    (i for i, mensaje in enumerate(mensajes) if mensaje.publish_timestamp() >= destino), len(mensajes)
+                )
+            elif destino.entry_id() < 0:
+                # MessageId.earliest; latest tiene entry_id máximo y queda al final
+                self._posicion = 0
+            else:
+                self._posicion = min(destino.entry_id() + (0 if inclusivo else 1), len(mensajes))
+
+    def has_message_available(self) -> bool:
+        return self._posicion < len(self._topic.mensajes)
+
+    def read_next(self, timeout_millis: int = None) -> MensajeMemoria:
+        with self._topic.nuevo:
+            if not self._topic.nuevo.wait_for(
+                self.has_message_available, None if timeout_millis is None else timeout_millis / 1000
+            ):
+                raise Timeout('Pulsar error: TimeOut')
+            mensaje = self._topic.mensajes[self._posicion]
+            self._posicion += 1
+            return mensaje
+
+    def close(self):
+        pass
+
+class ClientMemoria:
+    """Cliente con la interfaz de pulsar.Client sobre el broker en memoria del proceso"""
+
+    def __init__(self, service_url: str = None, broker: BrokerMemoria = None):
+        self.broker = broker or broker_memoria
+
+    def create_producer(self, topic: str, **opciones) -> ProducerMemoria:
+        return ProducerMemoria(self.broker.topic(topic))
+
+    def subscribe(self, topic: str, subscription_name: str, consumer_type=None, message_listener=None,
+                  initial_position=InitialPosition.Latest, batch_receive_policy=None, **opciones) -> ConsumerMemoria:
+        topic_memoria = self.broker.topic(topic)
+        suscripcion = topic_memoria.suscripcion(subscription_name, initial_position)
+        return ConsumerMemoria(topic_memoria, suscripcion, message_listener, batch_receive_policy)
+
+    def create_reader(self, topic: str, start_message_id: MessageId, start_message_id_inclusive: bool = False,
+                      **opciones) -> ReaderMemoria:
+        return ReaderMemoria(self.broker.topic(topic), start_message_id, start_message_id_inclusive)
+
+    def close(self):
+        pass
+
+# Instancia global del broker en memoria
+broker_memoria = BrokerMemoria()
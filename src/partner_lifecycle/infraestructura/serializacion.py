@@ -0,0 +1,246 @@
+"""Serialización de eventos de dominio
+
+En este archivo se define el registro de serializadores de eventos: para cada clase de
+EventoDominio se compila una única vez la lista de campos con su conversión (UUID, datetime,
+enums) y se reutiliza en cada mensaje. orjson se usa como backend si está instalado. Los
+mensajes pueden codificarse en JSON o en msgpack; la codificación y la versión del esquema
+viajan en las propiedades del mensaje para que el consumidor acepte ambas
+
+"""
+
+import os
+import json
+import uuid
+import logging
+import threading
+import dataclasses
+from enum import Enum
+from datetime import datetime, date
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, get_type_hints
+from partner_lifecycle.seedwork.dominio.eventos import EventoDominio
+
+# orjson es opcional: sin él se usa json de la librería estándar
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+# msgpack es opcional: sin él los topics configurados en msgpack se publican en JSON
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Campos internos del seedwork que no forman parte del payload (el id se emite como 'id')
+CAMPOS_EXCLUIDOS = {'id', '_id'}
+
+# Codificaciones del cuerpo del mensaje y su content-type en las propiedades de Pulsar
+ENCODING_JSON = 'json'
+ENCODING_MSGPACK = 'msgpack'
+CONTENT_TYPES = {
+    ENCODING_JSON: 'application/json',
+    ENCODING_MSGPACK: 'application/msgpack',
+}
+ENCODINGS_POR_CONTENT_TYPE = {content_type: encoding for encoding, content_type in CONTENT_TYPES.items()}
+PROPIEDAD_CONTENT_TYPE = 'content-type'
+PROPIEDAD_SCHEMA_VERSION = 'schema-version'
+# Versión del sobre: se incrementa ante cambios incompatibles en sus campos
+SCHEMA_VERSION = 1
+
+def _uuid_a_texto(valor):
+    return None if valor is None else str(valor)
+
+def _fecha_a_texto(valor):
+    return None if valor is None else valor.isoformat()
+
+def _enum_a_valor(valor):
+    return valor.value if isinstance(valor, Enum) else valor
+
+def _texto_a_uuid(valor):
+    return None if valor is None else uuid.UUID(valor)
+
+def _texto_a_fecha(valor):
+    return None if valor is None else datetime.fromisoformat(valor)
+
+def _por_defecto(valor):
+    """Respaldo para valores cuyo tipo no coincide con la anotación del campo"""
+    if isinstance(valor, Enum):
+        return valor.value
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    return str(valor)
+
+def _conversores(tipo, nativos: bool = False) -> Tuple[Optional[Callable], Optional[Callable]]:
+    """Retorna el par (codificar, decodificar) para la anotación de un campo; None es identidad
+
+    Con ``nativos`` los UUID y datetime se dejan tal cual para que el backend (orjson) los codifique.
+    """
+    if tipo is uuid.UUID:
+        return (None if nativos else _uuid_a_texto), _texto_a_uuid
+    if tipo is datetime:
+        return (None if nativos else _fecha_a_texto), _texto_a_fecha
+    if isinstance(tipo, type) and issubclass(tipo, Enum):
+        return _enum_a_valor, lambda valor: None if valor is None else tipo(valor)
+    if tipo is str:
+        # Los eventos guardan el .value de los enums, pero se aceptan también los miembros
+        return _enum_a_valor, None
+    return None, None
+
+class CodificadorEvento:
+    """Codificador y decodificador compilados para una clase de EventoDominio"""
+
+    def __init__(self, clase: Type[EventoDominio], nativos: bool = False):
+        self.clase = clase
+        self.nombre = clase.__name__
+        self.nativos = nativos
+        tipos = get_type_hints(clase)
+        self.campos: List[Tuple[str, Optional[Callable], Optional[Callable]]] = [
+            (campo.name, *_conversores(tipos.get(campo.name), nativos))
+            for campo in dataclasses.fields(clase) if campo.name not in CAMPOS_EXCLUIDOS
+        ]
+        # msgpack no conoce UUID ni datetime: siempre se compila también la variante explícita
+        self.campos_explicitos = self.campos if not nativos else [
+            (campo.name, *_conversores(tipos.get(campo.name)))
+            for campo in dataclasses.fields(clase) if campo.name not in CAMPOS_EXCLUIDOS
+        ]
+
+    def a_dict(self, evento: EventoDominio, explicito: bool = False) -> Dict[str, Any]:
+        """Convierte el evento en un dict listo para el backend (sin el campo interno _id)
+
+        Con ``explicito`` los UUID y datetime se convierten a texto aunque el backend los soporte.
+        """
+        if explicito or not self.nativos:
+            datos = {'id': _uuid_a_texto(evento.id)}
+            campos = self.campos_explicitos
+        else:
+            datos = {'id': evento.id}
+            campos = self.campos
+        for nombre, codificar, _ in campos:
+            valor = getattr(evento, nombre)
+            datos[nombre] = codificar(valor) if codificar else valor
+        return datos
+
+    def desde_dict(self, datos: Dict[str, Any]) -> EventoDominio:
+        """Reconstruye el evento a partir del dict producido por a_dict"""
+        argumentos = {}
+        for nombre, _, decodificar in self.campos:
+            if nombre in datos:
+                valor = datos[nombre]
+                argumentos[nombre] = decodificar(valor) if decodificar else valor
+        evento = self.clase(**argumentos)
+        if datos.get('id'):
+            # El setter de id del seedwork siempre genera uno nuevo: se conserva el original
+            evento._id = _texto_a_uuid(datos['id'])
+        return evento
+
+class RegistroSerializadores:
+    """Registro de codificadores por clase de evento, construidos una sola vez"""
+
+    def __init__(self, backend: str = None):
+        backend = (backend or os.getenv('SERIALIZADOR_BACKEND', 'orjson')).lower()
+        if backend == 'orjson' and not ORJSON_AVAILABLE:
+            backend = 'json'
+        self.backend = backend
+        self._por_clase: Dict[type, CodificadorEvento] = {}
+        self._por_nombre: Dict[str, CodificadorEvento] = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, clase: Type[EventoDominio]) -> CodificadorEvento:
+        with self._lock:
+            codificador = self._por_clase.get(clase)
+            if codificador is None:
+                codificador = CodificadorEvento(clase, nativos=self.backend == 'orjson')
+                self._por_clase[clase] = codificador
+                self._por_nombre[codificador.nombre] = codificador
+            return codificador
+
+    def codificador(self, clase: Type[EventoDominio]) -> CodificadorEvento:
+        return self._por_clase.get(clase) or self.registrar(clase)
+
+    def codificador_por_nombre(self, nombre: str) -> Optional[CodificadorEvento]:
+        codificador = self._por_nombre.get(nombre)
+        if codificador is None:
+            # Las clases de evento se registran al codificarlas; en el consumidor se buscan por nombre
+            for clase in _subclases(EventoDominio):
+                if clase.__name__ == nombre:
+                    return self.registrar(clase)
+        return codificador
+
+    def dumps(self, datos: Dict[str, Any]) -> bytes:
+        if self.backend == 'orjson':
+            return orjson.dumps(datos, default=_por_defecto)
+        return json.dumps(datos, default=_por_defecto, separators=(',', ':')).encode('utf-8')
+
+    def loads(self, data: bytes) -> Dict[str, Any]:
+        if self.backend == 'orjson':
+            return orjson.loads(data)
+        return json.loads(data)
+
+    def encoding_efectivo(self, encoding: str = None) -> str:
+        """Codificación a usar: msgpack solo si está instalado, JSON en cualquier otro caso"""
+        if encoding == ENCODING_MSGPACK and MSGPACK_AVAILABLE:
+            return ENCODING_MSGPACK
+        return ENCODING_JSON
+
+    def serializar_mensaje(self, saga_id, evento: EventoDominio, event_type: str, status: str,
+                           encoding: str = ENCODING_JSON) -> bytes:
+        """Construye el sobre del mensaje y lo serializa con la codificación indicada"""
+        codificador = self.codificador(type(evento))
+        binario = self.encoding_efectivo(encoding) == ENCODING_MSGPACK
+        sobre = {
+            'saga_id': None if saga_id is None else str(saga_id),
+            'service': 'Partner',
+            'status': status,
+            'event_id': _uuid_a_texto(evento.id),
+            'event_type': event_type,
+            'event_name': codificador.nombre,
+            'event_data': codificador.a_dict(evento, explicito=binario),
+            'timestamp': _fecha_a_texto(getattr(evento, 'fecha_evento', None)),
+        }
+        if binario:
+            return msgpack.packb(sobre, default=_por_defecto, use_bin_type=True)
+        return self.dumps(sobre)
+
+    def propiedades(self, encoding: str = ENCODING_JSON) -> Dict[str, str]:
+        """Propiedades del mensaje que anuncian la codificación y la versión del sobre"""
+        return {
+            PROPIEDAD_CONTENT_TYPE: CONTENT_TYPES[self.encoding_efectivo(encoding)],
+            PROPIEDAD_SCHEMA_VERSION: str(SCHEMA_VERSION),
+        }
+
+    def deserializar_mensaje(self, data: bytes, propiedades: Dict[str, str] = None) -> Dict[str, Any]:
+        """Decodifica el sobre del mensaje según su content-type; event_data queda como dict
+
+        Los mensajes sin propiedades (anteriores a la negociación) se tratan como JSON.
+        """
+        propiedades = propiedades or {}
+        encoding = ENCODINGS_POR_CONTENT_TYPE.get(propiedades.get(PROPIEDAD_CONTENT_TYPE), ENCODING_JSON)
+        version = int(propiedades.get(PROPIEDAD_SCHEMA_VERSION, SCHEMA_VERSION))
+        if version > SCHEMA_VERSION:
+            raise ValueError(f"Versión de esquema {version} no soportada (máxima {SCHEMA_VERSION})")
+        if encoding == ENCODING_MSGPACK:
+            if not MSGPACK_AVAILABLE:
+                raise ValueError("Mensaje msgpack recibido pero msgpack no está instalado")
+            return msgpack.unpackb(data, raw=False)
+        return self.loads(data)
+
+    def deserializar_evento(self, mensaje: Dict[str, Any]) -> Optional[EventoDominio]:
+        """Reconstruye el evento de dominio de un sobre ya decodificado (None si la clase no se conoce)"""
+        codificador = self.codificador_por_nombre(mensaje.get('event_name') or '')
+        if codificador is None:
+            return None
+        return codificador.desde_dict(mensaje.get('event_data') or {})
+
+def _subclases(clase):
+    for subclase in clase.__subclasses__():
+        yield subclase
+        yield from _subclases(subclase)
+
+# Instancia global del registro
+registro_serializadores = RegistroSerializadores()
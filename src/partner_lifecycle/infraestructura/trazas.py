@@ -0,0 +1,381 @@
+"""Trazas de las sagas de punta a punta
+
+En este archivo se define el trazador del servicio: spans agrupados por traza, con el
+trace_id derivado del saga_id cuando el mensaje no trae contexto, y el contexto W3C
+(``traceparent``) que viaja en las propiedades de los mensajes de Pulsar al consumir y al
+publicar (también a través de la outbox). El muestreo es por cola (tail-based): la decisión
+se toma al cerrar el span raíz del proceso y se conservan siempre las trazas con errores o
+más lentas que TRACING_SLOW_MS; del resto solo una fracción TRACING_SAMPLE_RATIO. Las trazas
+conservadas se exportan en segundo plano a un archivo JSON lines o a un colector OTLP/HTTP.
+
+"""
+
+import os
+import json
+import time
+import uuid
+import queue
+import random
+import hashlib
+import logging
+import threading
+import urllib.request
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from partner_lifecycle.infraestructura.metricas import registro_metricas
+
+logger = logging.getLogger(__name__)
+
+# Propiedad de los mensajes de Pulsar con el contexto de la traza (W3C Trace Context)
+TRACEPARENT = 'traceparent'
+
+trazas_decididas = registro_metricas.contador(
+    'trazas_segmentos_total', 'Segmentos de traza cerrados por decisión del muestreo', ('decision',)
+)
+
+def parsear_traceparent(valor: Optional[str]) -> Optional[Tuple[str, str]]:
+    """Retorna ``(trace_id, span_id)`` de un traceparent ``00-<trace>-<span>-<flags>`` o None si no es válido"""
+    if not valor:
+        return None
+    partes = valor.strip().split('-')
+    if len(partes) != 4 or len(partes[1]) != 32 or len(partes[2]) != 16:
+        return None
+    trace_id, span_id = partes[1].lower(), partes[2].lower()
+    try:
+        int(trace_id, 16), int(span_id, 16)
+    except ValueError:
+        return None
+    if trace_id == '0' * 32 or span_id == '0' * 16:
+        return None
+    return trace_id, span_id
+
+def trace_id_de_saga(saga_id) -> str:
+    """Todos los segmentos de una saga comparten trace_id aunque el mensaje no traiga traceparent"""
+    try:
+        return uuid.UUID(str(saga_id)).hex
+    except ValueError:
+        return hashlib.md5(str(saga_id).encode('utf-8')).hexdigest()
+
+class Span:
+    __slots__ = ('nombre', 'trace_id', 'span_id', 'parent_id', 'saga_id', 'inicio', 'fin',
+                 'atributos', 'error', '_segmento')
+
+    def __init__(self, nombre: str, trace_id: str, parent_id: Optional[str], saga_id, segmento: '_Segmento',
+                 atributos: Optional[Dict[str, Any]] = None):
+        self.nombre = nombre
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.saga_id = str(saga_id) if saga_id is not None else None
+        self.inicio = time.time_ns()
+        self.fin = None
+        self.atributos = dict(atributos) if atributos else {}
+        self.error = None
+        self._segmento = segmento
+
+    @property
+    def duracion_ms(self) -> float:
+        return ((self.fin or time.time_ns()) - self.inicio) / 1e6
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def a_dict(self) -> Dict[str, Any]:
+        return {
+            'nombre': self.nombre,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'saga_id': self.saga_id,
+            'inicio_ns': self.inicio,
+            'fin_ns': self.fin,
+            'duracion_ms': round(self.duracion_ms, 3),
+            'atributos': self.atributos,
+            'error': self.error,
+        }
+
+class _Segmento:
+    """Spans de una traza dentro del proceso, desde el span raíz local hasta su cierre"""
+
+    __slots__ = ('raiz', 'spans', 'error', 'cerrado', 'omitidos')
+
+    def __init__(self):
+        self.raiz: Optional[Span] = None
+        self.spans: List[Span] = []
+        self.error = False
+        self.cerrado = False
+        self.omitidos = 0
+
+# Span activo del hilo o de la tarea asyncio
+_span_actual: ContextVar[Optional[Span]] = ContextVar('span_actual', default=None)
+
+class ExportadorArchivo:
+    """Una línea JSON por traza conservada"""
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+
+    def exportar(self, segmentos: List[_Segmento]):
+        with open(self.ruta, 'a', encoding='utf-8') as archivo:
+            for segmento in segmentos:
+                raiz = segmento.raiz
+                archivo.write(json.dumps({
+                    'trace_id': raiz.trace_id,
+                    'saga_id': raiz.saga_id,
+                    'raiz': raiz.nombre,
+                    'duracion_ms': round(raiz.duracion_ms, 3),
+                    'error': segmento.error,
+                    'spans_omitidos': segmento.omitidos,
+                    'spans': [span.a_dict() for span in segmento.spans],
+                }, default=str) + '\n')
+
+class ExportadorOTLP:
+    """Envía las trazas a un colector OpenTelemetry con OTLP/HTTP en JSON (POST /v1/traces)"""
+
+    def __init__(self, endpoint: str, servicio: str, timeout: float = 5.0):
+        endpoint = endpoint.rstrip('/')
+        self.url = endpoint if endpoint.endswith('/v1/traces') else f"{endpoint}/v1/traces"
+        self.servicio = servicio
+        self.timeout = timeout
+
+    @staticmethod
+    def _atributo(llave: str, valor) -> Dict[str, Any]:
+        if isinstance(valor, bool):
+            return {'key': llave, 'value': {'boolValue': valor}}
+        if isinstance(valor, int):
+            return {'key': llave, 'value': {'intValue': str(valor)}}
+        if isinstance(valor, float):
+            return {'key': llave, 'value': {'doubleValue': valor}}
+        return {'key': llave, 'value': {'stringValue': str(valor)}}
+
+    def _span(self, span: Span) -> Dict[str, Any]:
+        atributos = dict(span.atributos)
+        if span.saga_id:
+            atributos['saga_id'] = span.saga_id
+        otlp = {
+            'traceId': span.trace_id,
+            'spanId': span.span_id,
+            'name': span.nombre,
+            'kind': 1,
+            'startTimeUnixNano': str(span.inicio),
+            'endTimeUnixNano': str(span.fin),
+            'attributes': [self._atributo(llave, valor) for llave, valor in atributos.items()],
+            # 2 = STATUS_CODE_ERROR, 1 = STATUS_CODE_OK
+            'status': {'code': 2, 'message': span.error} if span.error else {'code': 1},
+        }
+        if span.parent_id:
+            otlp['parentSpanId'] = span.parent_id
+        return otlp
+
+    def exportar(self, segmentos: List[_Segmento]):
+        cuerpo = {
+            'resourceSpans': [{
+                'resource': {'attributes': [self._atributo('service.name', self.servicio)]},
+                'scopeSpans': [{
+                    'scope': {'name': 'partner_lifecycle'},
+                    'spans': [self._span(span) for segmento in segmentos for span in segmento.spans],
+                }],
+            }]
+        }
+        peticion = urllib.request.Request(
+            self.url, data=json.dumps(cuerpo).encode('utf-8'), headers={'Content-Type': 'application/json'}, method='POST'
+        )
+        with urllib.request.urlopen(peticion, timeout=self.timeout) as respuesta:
+            respuesta.read()
+
+class Trazador:
+    """Crea spans, propaga el contexto y exporta las trazas conservadas por el muestreo por cola
+
+    TRACING_EXPORTER selecciona el destino: none (por defecto, sin trazas), file u otlp.
+    """
+
+    def __init__(self):
+        self.exportador = os.getenv('TRACING_EXPORTER', 'none').lower()
+        self.habilitado = self.exportador in ('file', 'otlp')
+        self.ruta_archivo = os.getenv('TRACING_FILE_PATH', 'trazas.jsonl')
+        self.otlp_endpoint = os.getenv('TRACING_OTLP_ENDPOINT', 'http://localhost:4318')
+        self.servicio = os.getenv('TRACING_SERVICE_NAME', 'partner-lifecycle')
+        self.umbral_lento_ms = float(os.getenv('TRACING_SLOW_MS', '500'))
+        self.proporcion_muestreo = float(os.getenv('TRACING_SAMPLE_RATIO', '0.01'))
+        self.max_spans = int(os.getenv('TRACING_MAX_SPANS_PER_TRACE', '256'))
+        self.tamano_lote = int(os.getenv('TRACING_EXPORT_BATCH_SIZE', '100'))
+        self._cola: queue.Queue = queue.Queue(maxsize=int(os.getenv('TRACING_QUEUE_SIZE', '1000')))
+        self._destino = None
+        self._hilo = None
+        self._lock = threading.Lock()
+
+    def iniciar(self, nombre: str, saga_id=None, traceparent: Optional[str] = None,
+                atributos: Optional[Dict[str, Any]] = None, solo_hijo: bool = False) -> Optional[Span]:
+        """Crea un span sin activarlo, hijo del span activo si lo hay
+
+        Sin span activo se abre un segmento nuevo: continúa el ``traceparent`` recibido o, si no
+        hay, usa el trace_id de la saga. Con ``solo_hijo`` no se crean spans raíz.
+        """
+        if not self.habilitado:
+            return None
+        padre = _span_actual.get()
+        if padre is not None and not padre._segmento.cerrado:
+            return Span(nombre, padre.trace_id, padre.span_id, saga_id or padre.saga_id, padre._segmento, atributos)
+        if solo_hijo:
+            return None
+        remoto = parsear_traceparent(traceparent)
+        if remoto is not None:
+            trace_id, parent_id = remoto
+        elif saga_id:
+            trace_id, parent_id = trace_id_de_saga(saga_id), None
+        else:
+            trace_id, parent_id = os.urandom(16).hex(), None
+        segmento = _Segmento()
+        span = segmento.raiz = Span(nombre, trace_id, parent_id, saga_id, segmento, atributos)
+        return span
+
+    def terminar(self, span: Optional[Span], error=None):
+        """Cierra el span; al cerrar el span raíz se decide si la traza se exporta"""
+        if span is None or span.fin is not None:
+            return
+        span.fin = time.time_ns()
+        if error is not None and span.error is None:
+            span.error = f"{type(error).__name__}: {error}" if isinstance(error, BaseException) else str(error)
+        segmento = span._segmento
+        if segmento.cerrado:
+            return
+        if span.error:
+            segmento.error = True
+        if len(segmento.spans) < self.max_spans:
+            segmento.spans.append(span)
+        else:
+            segmento.omitidos += 1
+        if span is segmento.raiz:
+            segmento.cerrado = True
+            self._decidir(segmento)
+
+    @staticmethod
+    def marcar_error(span: Optional[Span], error):
+        """Marca el span con error sin cerrarlo (errores capturados que no se propagan)"""
+        if span is not None and span.error is None:
+            span.error = f"{type(error).__name__}: {error}" if isinstance(error, BaseException) else str(error)
+
+    def span(self, nombre: str, saga_id=None, traceparent: Optional[str] = None,
+             atributos: Optional[Dict[str, Any]] = None):
+        """Context manager que crea, activa y cierra un span; las excepciones lo marcan con error"""
+        if not self.habilitado:
+            return nullcontext()
+        return self.activar(self.iniciar(nombre, saga_id, traceparent, atributos))
+
+    def activar(self, span: Optional[Span]):
+        """Activa un span creado con iniciar (por ejemplo en otro hilo) y lo cierra al salir"""
+        if span is None:
+            return nullcontext()
+        return self._activar(span)
+
+    @contextmanager
+    def _activar(self, span: Span):
+        token = _span_actual.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            self.marcar_error(span, e)
+            raise
+        finally:
+            _span_actual.reset(token)
+            self.terminar(span)
+
+    def ejecutar_en(self, span: Optional[Span], funcion, *args):
+        """Ejecuta ``funcion(*args)`` con el span activo; útil como destino de run_in_executor"""
+        with self.activar(span):
+            return funcion(*args)
+
+    def span_actual(self) -> Optional[Span]:
+        return _span_actual.get()
+
+    def inyectar(self, propiedades: Optional[Dict[str, str]], span: Optional[Span] = None) -> Optional[Dict[str, str]]:
+        """Copia de las propiedades del mensaje con el traceparent del span (por defecto el activo)"""
+        span = span or _span_actual.get()
+        if span is None:
+            return propiedades
+        propiedades = dict(propiedades) if propiedades else {}
+        propiedades[TRACEPARENT] = span.traceparent()
+        return propiedades
+
+    def _decidir(self, segmento: _Segmento):
+        if segmento.error:
+            decision = 'error'
+        elif segmento.raiz.duracion_ms >= self.umbral_lento_ms:
+            decision = 'lenta'
+        elif random.random() < self.proporcion_muestreo:
+            decision = 'muestreada'
+        else:
+            trazas_decididas.inc('descartada')
+            return
+        try:
+            self._cola.put_nowait(segmento)
+        except queue.Full:
+            trazas_decididas.inc('perdida')
+            return
+        trazas_decididas.inc(decision)
+        if self._hilo is None:
+            self._iniciar_hilo()
+
+    def _iniciar_hilo(self):
+        with self._lock:
+            if self._hilo is not None:
+                return
+            if self.exportador == 'otlp':
+                self._destino = ExportadorOTLP(self.otlp_endpoint, self.servicio)
+            else:
+                self._destino = ExportadorArchivo(self.ruta_archivo)
+            self._hilo = threading.Thread(target=self._exportar, name='exportador-trazas', daemon=True)
+            self._hilo.start()
+            logger.info(f"Exportador de trazas iniciado ({self.exportador})")
+
+    def _exportar(self):
+        while True:
+            segmentos = [self._cola.get()]
+            while len(segmentos) < self.tamano_lote:
+                try:
+                    segmentos.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._destino.exportar(segmentos)
+            except Exception as e:
+                trazas_decididas.inc('perdida', cantidad=len(segmentos))
+                logger.warning(f"Error exportando {len(segmentos)} trazas: {e}")
+
+    def vaciar(self, timeout: float = 5.0):
+        """Espera a que el exportador procese las trazas encoladas"""
+        limite = time.monotonic() + timeout
+        while not self._cola.empty() and time.monotonic() < limite:
+            time.sleep(0.01)
+
+# Instancia global del trazador
+trazador = Trazador()
+
+def interceptor_trazas_comando(comando, siguiente):
+    """Interceptor de ejecutar_commando con un span por comando"""
+    if not trazador.habilitado:
+        return siguiente(comando)
+    with trazador.span(f"comando.{type(comando).__name__}", saga_id=getattr(comando, 'saga_id', None)):
+        return siguiente(comando)
+
+def trazar_commits():
+    """Agrega un span db.commit bajo el span activo en cada session.commit de SQLAlchemy"""
+    if not trazador.habilitado or event.contains(Session, 'before_commit', _antes_commit):
+        return
+    event.listen(Session, 'before_commit', _antes_commit)
+    event.listen(Session, 'after_commit', _despues_commit)
+    event.listen(Session, 'after_soft_rollback', _despues_rollback)
+
+def _antes_commit(session):
+    span = trazador.iniciar('db.commit', solo_hijo=True)
+    if span is not None:
+        session.info['_span_commit'] = span
+
+def _despues_commit(session):
+    trazador.terminar(session.info.pop('_span_commit', None))
+
+def _despues_rollback(session, transaccion):
+    trazador.terminar(session.info.pop('_span_commit', None), 'rollback')
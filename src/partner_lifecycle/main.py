@@ -4,12 +4,13 @@ En este archivo se define la aplicación principal del microservicio
 """
 
 from flask import Flask
-from partner_lifecycle.config.db import init_db
+from partner_lifecycle.config.db import init_db, db
+from partner_lifecycle.config.logs import configurar_logging
 import os
 import logging
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
+# Configurar logging: JSON estructurado escrito por un listener en segundo plano
+configurar_logging()
 logger = logging.getLogger(__name__)
 
 def create_app():
@@ -23,6 +24,28 @@ def create_app():
     # Inicializar base de datos
     init_db(app)
     
+    # Métricas: commits de la base de datos y latencia de cada comando despachado
+    from partner_lifecycle.infraestructura.metricas import (
+        instrumentar_sesiones, instrumentar_blueprint, interceptor_metricas_comando, backlog_consumidor
+    )
+    from partner_lifecycle.seedwork.aplicacion.comandos import registrar_interceptor_comando
+    instrumentar_sesiones()
+    registrar_interceptor_comando(interceptor_metricas_comando)
+    
+    # Trazas de las sagas: span por comando y por commit (sin efecto con TRACING_EXPORTER=none)
+    from partner_lifecycle.infraestructura.trazas import trazar_commits, interceptor_trazas_comando
+    trazar_commits()
+    registrar_interceptor_comando(interceptor_trazas_comando)
+    
+    # Verificar que los enums de Postgres coinciden con los del dominio
+    try:
+        from partner_lifecycle.modulos.partner_lifecycle.infraestructura.modelos import verificar_enums
+        with app.app_context(), db.engine.connect() as connection:
+            for diferencia in verificar_enums(connection):
+                logger.warning(f"Enum desalineado con el dominio, aplicar migrations/001_enums_nativos.sql: {diferencia}")
+    except Exception as e:
+        logger.warning(f"No se pudieron verificar los enums de la base de datos: {e}")
+    
     # Importar handlers de comandos para registrar los dispatchers
     try:
         from partner_lifecycle.modulos.partner_lifecycle.aplicacion.handlers import crear_partnership_handler
@@ -38,25 +61,39 @@ def create_app():
     
     try:
         from partner_lifecycle.api.partner_lifecycle import bp as partner_lifecycle_bp
+        from partner_lifecycle.infraestructura.perfilador import perfilador_peticiones
+        instrumentar_blueprint(partner_lifecycle_bp)
+        perfilador_peticiones.instrumentar_blueprint(partner_lifecycle_bp)
         app.register_blueprint(partner_lifecycle_bp)
         logger.info("Blueprint de partner lifecycle registrado")
     except Exception as e:
         logger.error(f"Error registrando blueprint de partner lifecycle: {e}")
     
+    from partner_lifecycle.api.metricas import bp as metricas_bp
+    from partner_lifecycle.api.admin import bp as admin_bp
+    app.register_blueprint(metricas_bp)
+    app.register_blueprint(admin_bp)
+    
     # Configurar dependency injection y servicios de Pulsar
     try:
         from partner_lifecycle.infraestructura.event_consumer_service import configure_event_consumer_service
         from partner_lifecycle.modulos.partner_lifecycle.aplicacion.servicios.dependency_injection import dependency_container
         from partner_lifecycle.infraestructura.pulsar import pulsar_publisher
+        from partner_lifecycle.infraestructura.outbox import configure_outbox_relay
         import atexit
         
         # Configurar dependency injection con la aplicación Flask
         dependency_container.set_app(app)
         event_processing_service = dependency_container.get_event_processing_service()
-        event_consumer_service = configure_event_consumer_service(app, event_processing_service)
+        event_consumer_service = configure_event_consumer_service(
+            app, event_processing_service, dependency_container.get_registro_idempotencia()
+        )
         
         # Iniciar el servicio de consumo de eventos
         event_consumer_service.start_consuming()
+        backlog_consumidor.registrar(event_consumer_service.backlog)
+        # Iniciar el relay de outbox que publica los eventos de dominio en Pulsar
+        configure_outbox_relay(app).start()
         # Registrar función de limpieza al cerrar la aplicación
         atexit.register(cleanup_pulsar_connections)
         
@@ -68,8 +105,17 @@ def create_app():
 def cleanup_pulsar_connections():
     """Limpia las conexiones de Pulsar al cerrar la aplicación"""
     try:
+        from partner_lifecycle.infraestructura import event_consumer_service
+        if event_consumer_service.event_consumer_service:
+            event_consumer_service.event_consumer_service.stop_consuming()
+        from partner_lifecycle.infraestructura import outbox
+        if outbox.outbox_relay:
+            outbox.outbox_relay.stop()
         from partner_lifecycle.infraestructura.pulsar import pulsar_publisher
+        pulsar_publisher.flush()
         pulsar_publisher.close()
+        from partner_lifecycle.infraestructura.trazas import trazador
+        trazador.vaciar()
         logger.info("Conexiones de Pulsar cerradas correctamente")
     except Exception as e:
         logger.error(f"Error cerrando conexiones de Pulsar: {e}")
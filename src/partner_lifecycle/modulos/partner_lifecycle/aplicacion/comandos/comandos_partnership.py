@@ -30,6 +30,7 @@ class IniciarNegociacionPartnership(Comando):
     id_partnership: str
     terminos: str = ""
     fecha_actualizacion: str = ""
+    version: int = None
 
 @dataclass
 class ActivarPartnership(Comando):
@@ -37,18 +38,21 @@ class ActivarPartnership(Comando):
     comision_porcentaje: float = 0.0
     metas_mensuales: int = 0
     fecha_actualizacion: str = ""
+    version: int = None
 
 @dataclass
 class SuspenderPartnership(Comando):
     id_partnership: str
     motivo: str = ""
     fecha_actualizacion: str = ""
+    version: int = None
 
 @dataclass
 class TerminarPartnership(Comando):
     id_partnership: str
     motivo: str = ""
     fecha_actualizacion: str = ""
+    version: int = None
 
 @dataclass
 class RenovarPartnership(Comando):
@@ -56,9 +60,16 @@ class RenovarPartnership(Comando):
     nueva_fecha_fin: str
     nuevos_terminos: str = ""
     fecha_actualizacion: str = ""
+    version: int = None
 
 @dataclass
 class ActualizarNivelPartnership(Comando):
     id_partnership: str
     nuevo_nivel: str
     fecha_actualizacion: str = ""
+    version: int = None
+
+@dataclass
+class CrearPartnershipsEnLote(Comando):
+    comandos: list
+    indices: list = None
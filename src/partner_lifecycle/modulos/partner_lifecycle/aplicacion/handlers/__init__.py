@@ -1,4 +1,7 @@
 """Handlers del módulo Partner Lifecycle Management"""
 
 # Importar handlers para registrar los dispatchers
-from . import crear_partnership_handler
\ No newline at end of file
+from . import crear_partnership_handler
+from . import crear_partnerships_lote_handler
+from . import consultar_partnerships_handler
+from . import transiciones_partnership_handler
@@ -0,0 +1,165 @@
+"""Handlers para los queries de partnerships
+
+En este archivo se definen los handlers de lectura de partnerships con paginación
+por keyset sobre (fecha_creacion, id), el resumen precalculado por marca y las consultas
+de auditoría sobre el almacén de eventos (historial y estado en una fecha)
+
+"""
+
+from partner_lifecycle.modulos.partner_lifecycle.aplicacion.queries.queries_partnership import (
+    ObtenerPartnership, ListarPartnerships, ObtenerResumenMarca,
+    ObtenerHistorialPartnership, ObtenerPartnershipEnFecha
+)
+from partner_lifecycle.modulos.partner_lifecycle.infraestructura.modelos import (
+    PartnershipDBModel, TipoPartnershipEnum, EstadoPartnershipEnum, NivelPartnershipEnum
+)
+from partner_lifecycle.modulos.partner_lifecycle.infraestructura.proyecciones import obtener_resumen_marca
+from partner_lifecycle.modulos.partner_lifecycle.infraestructura.almacen_eventos import (
+    almacen_eventos, repositorio_partnership
+)
+from partner_lifecycle.seedwork.aplicacion.queries import ejecutar_query
+from partner_lifecycle.seedwork.dominio.excepciones import ExcepcionFabrica
+from partner_lifecycle.config.db import db
+from sqlalchemy import select, and_, or_
+from datetime import datetime
+from enum import Enum
+import base64
+import json
+import uuid
+
+LIMITE_MAXIMO = 500
+
+# Columnas que se leen como tuplas, sin materializar objetos del ORM
+COLUMNAS = (
+    PartnershipDBModel.id,
+    PartnershipDBModel.id_marca,
+    PartnershipDBModel.id_partner,
+    PartnershipDBModel.tipo_partnership,
+    PartnershipDBModel.estado,
+    PartnershipDBModel.nivel,
+    PartnershipDBModel.fecha_inicio,
+    PartnershipDBModel.fecha_fin,
+    PartnershipDBModel.fecha_ultima_actividad,
+    PartnershipDBModel.terminos_contrato,
+    PartnershipDBModel.comision_porcentaje,
+    PartnershipDBModel.metas_mensuales,
+    PartnershipDBModel.beneficios_adicionales,
+    PartnershipDBModel.notas,
+    PartnershipDBModel.fecha_creacion,
+    PartnershipDBModel.fecha_actualizacion,
+    PartnershipDBModel.version,
+)
+NOMBRES = tuple(columna.key for columna in COLUMNAS)
+
+def _serializar_valor(valor):
+    if isinstance(valor, Enum):
+        return valor.value
+    if isinstance(valor, uuid.UUID):
+        return str(valor)
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    return valor
+
+def fila_a_dict(fila) -> dict:
+    """Serializa una tupla de resultados directamente a un diccionario JSON-compatible"""
+    return {nombre: _serializar_valor(valor) for nombre, valor in zip(NOMBRES, fila)}
+
+def codificar_cursor(fecha_creacion: datetime, id_partnership) -> str:
+    crudo = json.dumps([fecha_creacion.isoformat(), str(id_partnership)]).encode('utf-8')
+    return base64.urlsafe_b64encode(crudo).decode('ascii')
+
+def decodificar_cursor(cursor: str) -> tuple:
+    try:
+        fecha, id_partnership = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(fecha), uuid.UUID(id_partnership)
+    except (ValueError, TypeError) as e:
+        raise ExcepcionFabrica(f"Cursor inválido: {e}")
+
+def _uuid(valor: str, campo: str) -> uuid.UUID:
+    try:
+        return uuid.UUID(str(valor))
+    except ValueError:
+        raise ExcepcionFabrica(f"{campo} debe ser un UUID válido")
+
+def _fecha(valor: str, campo: str) -> datetime:
+    try:
+        return datetime.fromisoformat(valor)
+    except (ValueError, TypeError):
+        raise ExcepcionFabrica(f"{campo} debe ser una fecha ISO 8601 válida")
+
+def _enum(tipo, valor: str, campo: str):
+    try:
+        return tipo(valor)
+    except ValueError:
+        raise ExcepcionFabrica(f"{campo} inválido: {valor}")
+
+@ejecutar_query.register
+def _(query: ObtenerPartnership):
+    """Obtiene una partnership por id, retorna None si no existe"""
+    fila = db.session.execute(
+        select(*COLUMNAS).where(PartnershipDBModel.id == _uuid(query.id_partnership, 'id'))
+    ).first()
+    return fila_a_dict(fila) if fila else None
+
+@ejecutar_query.register
+def _(query: ListarPartnerships):
+    """Lista partnerships de la más reciente a la más antigua con paginación por keyset"""
+    limite = max(1, min(int(query.limite), LIMITE_MAXIMO))
+    sentencia = select(*COLUMNAS)
+
+    if query.id_marca:
+        sentencia = sentencia.where(PartnershipDBModel.id_marca == _uuid(query.id_marca, 'id_marca'))
+    if query.id_partner:
+        sentencia = sentencia.where(PartnershipDBModel.id_partner == _uuid(query.id_partner, 'id_partner'))
+    if query.estado:
+        sentencia = sentencia.where(PartnershipDBModel.estado == _enum(EstadoPartnershipEnum, query.estado, 'estado'))
+    if query.nivel:
+        sentencia = sentencia.where(PartnershipDBModel.nivel == _enum(NivelPartnershipEnum, query.nivel, 'nivel'))
+    if query.tipo_partnership:
+        sentencia = sentencia.where(
+            PartnershipDBModel.tipo_partnership == _enum(TipoPartnershipEnum, query.tipo_partnership, 'tipo_partnership')
+        )
+    if query.cursor:
+        fecha, id_partnership = decodificar_cursor(query.cursor)
+        # El rango sobre fecha_creacion permite recorrer idx_partnerships_fecha_creacion sin OFFSET
+        sentencia = sentencia.where(and_(
+            PartnershipDBModel.fecha_creacion <= fecha,
+            or_(PartnershipDBModel.fecha_creacion < fecha, PartnershipDBModel.id < id_partnership)
+        ))
+
+    sentencia = sentencia.order_by(
+        PartnershipDBModel.fecha_creacion.desc(), PartnershipDBModel.id.desc()
+    ).limit(limite + 1)
+    filas = db.session.execute(sentencia).all()
+
+    siguiente_cursor = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        ultima = filas[-1]
+        siguiente_cursor = codificar_cursor(ultima.fecha_creacion, ultima.id)
+
+    return {
+        'items': [fila_a_dict(fila) for fila in filas],
+        'siguiente_cursor': siguiente_cursor
+    }
+
+@ejecutar_query.register
+def _(query: ObtenerResumenMarca):
+    """Obtiene el resumen de partnerships de una marca desde el read model resumen_marcas"""
+    return obtener_resumen_marca(db.session, _uuid(query.id_marca, 'id_marca'))
+
+@ejecutar_query.register
+def _(query: ObtenerHistorialPartnership):
+    """Obtiene los eventos registrados de una partnership en orden de secuencia"""
+    hasta = _fecha(query.hasta, 'hasta') if query.hasta else None
+    return almacen_eventos.historial(db.session, _uuid(query.id_partnership, 'id'), hasta)
+
+@ejecutar_query.register
+def _(query: ObtenerPartnershipEnFecha):
+    """Reconstruye el estado de una partnership en una fecha, None si no existía"""
+    estado = repositorio_partnership.obtener_estado(
+        db.session, _uuid(query.id_partnership, 'id'), _fecha(query.fecha, 'fecha')
+    )
+    if estado is None:
+        return None
+    return {nombre: _serializar_valor(estado.get(nombre)) for nombre in NOMBRES}
@@ -8,22 +8,37 @@ from partner_lifecycle.modulos.partner_lifecycle.aplicacion.comandos.comandos_pa
 from partner_lifecycle.modulos.partner_lifecycle.infraestructura.modelos import (
     PartnershipDBModel, TipoPartnershipEnum, EstadoPartnershipEnum, NivelPartnershipEnum
 )
+from partner_lifecycle.modulos.partner_lifecycle.infraestructura.idempotencia import (
+    agregar_mensaje_procesado, RESULTADO_EXITOSO, RESULTADO_FALLIDO
+)
+from partner_lifecycle.modulos.partner_lifecycle.infraestructura.proyecciones import proyector_resumen_marca
+from partner_lifecycle.modulos.partner_lifecycle.infraestructura.almacen_eventos import almacen_eventos
 from partner_lifecycle.seedwork.aplicacion.comandos import ejecutar_commando
+from partner_lifecycle.seedwork.dominio.excepciones import ExcepcionDominio
 from partner_lifecycle.config.db import db
+from sqlalchemy.exc import IntegrityError, DataError
 
-# Importar Pulsar solo si está disponible
+# Importar la outbox solo si Pulsar está disponible
 try:
-    from partner_lifecycle.infraestructura.pulsar import pulsar_publisher
+    from partner_lifecycle.infraestructura.outbox import agregar_evento_outbox
     PULSAR_AVAILABLE = True
 except ImportError:
     PULSAR_AVAILABLE = False
-    pulsar_publisher = None
+    agregar_evento_outbox = None
 from datetime import datetime
 import uuid
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Marca usada para forzar el rollback de la saga en pruebas
+MARCA_NO_PERMITIDA = "c9b27e5f-5fa2-41bc-a539-1ce87d02a2f9"
+
+# Errores de negocio o de validación: la saga falla de forma definitiva (marca FALLIDO y compensación).
+# Cualquier otro error (conexión, timeout del pool, statement_timeout) se propaga sin marca para
+# que el mensaje se vuelva a entregar y el comando se reintente.
+ERRORES_PERMANENTES = (ValueError, TypeError, ExcepcionDominio, IntegrityError, DataError)
+
 # Global variable for partnership model
 partnership_model = None
 
@@ -50,53 +65,56 @@ def _(comando: CrearPartnership):
         partnership_model.beneficios_adicionales = comando.beneficios_adicionales
         partnership_model.notas = comando.notas
         
-        if comando.fecha_creacion:
-            partnership_model.fecha_creacion = datetime.fromisoformat(comando.fecha_creacion)
+        partnership_model.fecha_creacion = (
+            datetime.fromisoformat(comando.fecha_creacion) if comando.fecha_creacion else datetime.utcnow()
+        )
         if comando.fecha_actualizacion:
             partnership_model.fecha_actualizacion = datetime.fromisoformat(comando.fecha_actualizacion)
         
         # Excepción forzada para probar el rollback
-        if comando.id_marca == "c9b27e5f-5fa2-41bc-a539-1ce87d02a2f9":
+        if comando.id_marca == MARCA_NO_PERMITIDA:
             logger.error(f"Marca no permitida: {comando.id_marca} -> saga {comando.saga_id} -> pasando a rollback")
-            raise Exception("Marca no permitida") 
+            raise ValueError("Marca no permitida")
 
-        # Guardar en base de datos
-        db.session.add(partnership_model)
-        db.session.commit()
-        
-        # Crear y publicar evento de dominio
+        # Crear evento de dominio
         from partner_lifecycle.modulos.partner_lifecycle.dominio.entidades import PartnershipIniciada
         evento = PartnershipIniciada(
             id_partnership=partnership_model.id,
             id_marca=partnership_model.id_marca,
             id_partner=partnership_model.id_partner,
             tipo_partnership=partnership_model.tipo_partnership.value,
-            fecha_inicio=partnership_model.fecha_creacion
+            fecha_inicio=partnership_model.fecha_creacion,
+            metas_mensuales=partnership_model.metas_mensuales
         )
         
-        # Debug logging for success path
-        logger.info(f"Debug Success - PULSAR_AVAILABLE: {PULSAR_AVAILABLE}")
-        logger.info(f"Debug Success - pulsar_publisher: {pulsar_publisher}")
-        
-        if PULSAR_AVAILABLE and pulsar_publisher:
-           pulsar_publisher.publish_event(comando.saga_id, evento, 'EventPartnerCompleted', 'success')
+        # Guardar partnership y evento (outbox) en la misma transacción
+        db.session.add(partnership_model)
+        if PULSAR_AVAILABLE:
+           agregar_evento_outbox(db.session, comando.saga_id, evento, 'EventPartnerCompleted', 'success', partnership_model.id)
         else:
            logger.info("Pulsar no disponible, evento no publicado")
+        proyector_resumen_marca.aplicar(db.session, [evento], [1])
+        # El flush completa los defaults de la fila para el snapshot inicial del almacén de eventos
+        db.session.flush()
+        almacen_eventos.agregar(db.session, partnership_model.id, 1, evento, estado={
+            columna.key: getattr(partnership_model, columna.key) for columna in PartnershipDBModel.__table__.c
+        })
+        if comando.saga_id:
+            agregar_mensaje_procesado(db.session, comando.saga_id, 'CrearPartnership', RESULTADO_EXITOSO)
+        db.session.commit()
         
-        logger.info(f"Partnership creada exitosamente: {partnership_model.id}")
+        logger.info("Partnership creada exitosamente: %s", partnership_model.id)
         
-    except Exception as e:
+    except ERRORES_PERMANENTES as e:
         db.session.rollback()
         logger.error(f"Error creando partnership: {e}")
         
-        # Debug logging to understand why Pulsar might not be available
-        logger.info(f"Debug - PULSAR_AVAILABLE: {PULSAR_AVAILABLE}")
-        logger.info(f"Debug - pulsar_publisher: {pulsar_publisher}")
-        logger.info(f"Debug - partnership_model: {partnership_model}")
-        
-        # Only publish failure event if we have a valid partnership_model to create evento from
-        if PULSAR_AVAILABLE and pulsar_publisher and partnership_model is not None:
-            try:
+        # La transacción original fue revertida: el evento de fallo y la marca de
+        # procesamiento van juntos en su propia transacción. Si la saga ya fue procesada
+        # (redelivery concurrente) la marca choca con la llave primaria y no se publica nada.
+        try:
+            # Only publish failure event if we have a valid partnership_model to create evento from
+            if PULSAR_AVAILABLE and partnership_model is not None:
                 # Create appropriate failure event using the partnership_model if available
                 from partner_lifecycle.modulos.partner_lifecycle.dominio.entidades import PartnershipCreationFailed
                 evento = PartnershipCreationFailed(
@@ -106,9 +124,17 @@ def _(comando: CrearPartnership):
                     tipo_partnership=partnership_model.tipo_partnership.value,
                     fecha_inicio=partnership_model.fecha_creacion
                 )
-                pulsar_publisher.publish_event(comando.saga_id, evento, 'CommandCreatePartner', 'failed')
-            except Exception as event_error:
-                logger.error(f"Error creando evento de fallo: {event_error}")
-        else:
-           logger.info("Pulsar no disponible o partnership_model no disponible, evento no publicado")
+                agregar_evento_outbox(db.session, comando.saga_id, evento, 'CommandCreatePartner', 'failed', partnership_model.id)
+            else:
+               logger.info("Pulsar no disponible o partnership_model no disponible, evento no publicado")
+            if comando.saga_id:
+                agregar_mensaje_procesado(db.session, comando.saga_id, 'CrearPartnership', RESULTADO_FALLIDO, str(e))
+            db.session.commit()
+        except Exception as event_error:
+            db.session.rollback()
+            logger.error(f"Error creando evento de fallo: {event_error}")
+        raise
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"Error transitorio creando partnership de la saga {comando.saga_id}, se reintentará: {e}")
         raise
@@ -0,0 +1,196 @@
+"""Handler para el comando CrearPartnershipsEnLote
+
+En este archivo se define el handler para crear partnerships de forma masiva
+con un único INSERT multi-fila por lote
+
+"""
+
+from partner_lifecycle.modulos.partner_lifecycle.aplicacion.comandos.comandos_partnership import (
+    CrearPartnership, CrearPartnershipsEnLote
+)
+from partner_lifecycle.modulos.partner_lifecycle.aplicacion.handlers.crear_partnership_handler import (
+    MARCA_NO_PERMITIDA, ERRORES_PERMANENTES
+)
+from partner_lifecycle.modulos.partner_lifecycle.infraestructura.modelos import (
+    PartnershipDBModel, TipoPartnershipEnum, EstadoPartnershipEnum, NivelPartnershipEnum
+)
+from partner_lifecycle.modulos.partner_lifecycle.dominio.entidades import PartnershipIniciada, PartnershipCreationFailed
+from partner_lifecycle.modulos.partner_lifecycle.infraestructura.idempotencia import (
+    fila_mensaje_procesado, insertar_mensajes_procesados, RESULTADO_EXITOSO, RESULTADO_FALLIDO
+)
+from partner_lifecycle.modulos.partner_lifecycle.infraestructura.proyecciones import proyector_resumen_marca
+from partner_lifecycle.modulos.partner_lifecycle.infraestructura.almacen_eventos import almacen_eventos
+from partner_lifecycle.seedwork.aplicacion.comandos import ejecutar_commando
+from partner_lifecycle.config.db import db, insert_con_conflictos
+from typing import List, Dict, Any
+
+# Importar la outbox solo si Pulsar está disponible
+try:
+    from partner_lifecycle.infraestructura.outbox import OutboxDBModel, construir_fila_outbox
+    PULSAR_AVAILABLE = True
+except ImportError:
+    PULSAR_AVAILABLE = False
+    OutboxDBModel = None
+    construir_fila_outbox = None
+from datetime import datetime
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Postgres admite 65535 parámetros por sentencia. Cada fila de comando_a_fila liga a lo sumo un
+# parámetro por columna de partnerships, así que el máximo de filas por INSERT sigue al esquema
+MAX_FILAS_POR_INSERT = 65535 // len(PartnershipDBModel.__table__.c)
+
+def comando_a_fila(comando: CrearPartnership) -> Dict[str, Any]:
+    """Valida el comando y lo convierte en una fila de la tabla partnerships"""
+    if comando.id_marca == MARCA_NO_PERMITIDA:
+        raise ValueError("Marca no permitida")
+    ahora = datetime.utcnow()
+    fecha_creacion = datetime.fromisoformat(comando.fecha_creacion) if comando.fecha_creacion else ahora
+    fecha_actualizacion = datetime.fromisoformat(comando.fecha_actualizacion) if comando.fecha_actualizacion else ahora
+    return {
+        'id': uuid.UUID(str(comando.id)),
+        'id_marca': uuid.UUID(str(comando.id_marca)),
+        'id_partner': uuid.UUID(str(comando.id_partner)),
+        'tipo_partnership': TipoPartnershipEnum(comando.tipo_partnership),
+        'estado': EstadoPartnershipEnum.INICIANDO,
+        'nivel': NivelPartnershipEnum.BRONCE,
+        'fecha_inicio': ahora,
+        'fecha_ultima_actividad': ahora,
+        'terminos_contrato': comando.terminos_contrato,
+        'comision_porcentaje': float(comando.comision_porcentaje),
+        'metas_mensuales': int(comando.metas_mensuales),
+        'beneficios_adicionales': comando.beneficios_adicionales,
+        'notas': comando.notas,
+        'fecha_creacion': fecha_creacion,
+        'fecha_actualizacion': fecha_actualizacion,
+        'version': 1,
+    }
+
+def _evento_iniciada(fila: Dict[str, Any]) -> PartnershipIniciada:
+    return PartnershipIniciada(
+        id_partnership=fila['id'],
+        id_marca=fila['id_marca'],
+        id_partner=fila['id_partner'],
+        tipo_partnership=fila['tipo_partnership'].value,
+        fecha_inicio=fila['fecha_creacion'],
+        metas_mensuales=fila['metas_mensuales']
+    )
+
+def _insertar_filas(session, filas: List[Dict[str, Any]], sagas: List[Any]) -> set:
+    """Inserta las filas y sus eventos en la transacción actual, retorna los ids insertados"""
+    tabla = PartnershipDBModel.__table__
+    sentencia = insert_con_conflictos(session, tabla).values(filas).on_conflict_do_nothing(index_elements=['id']).returning(tabla.c.id)
+    insertados = set(session.execute(sentencia).scalars())
+
+    eventos = [
+        (_evento_iniciada(fila), saga_id, fila)
+        for fila, saga_id in zip(filas, sagas) if fila['id'] in insertados
+    ]
+    if PULSAR_AVAILABLE and eventos:
+        filas_outbox = [
+            construir_fila_outbox(saga_id, evento, 'EventPartnerCompleted', 'success', evento.id_partnership)
+            for evento, saga_id, _ in eventos
+        ]
+        session.execute(OutboxDBModel.__table__.insert(), filas_outbox)
+    proyector_resumen_marca.aplicar(session, [evento for evento, _, _ in eventos], [1] * len(eventos))
+    # Cada fila creada es la secuencia 1 de su partnership, con el snapshot inicial
+    almacen_eventos.agregar_varios(session, [
+        (fila['id'], 1, evento, None, fila) for evento, _, fila in eventos
+    ])
+    insertar_mensajes_procesados(session, [
+        fila_mensaje_procesado(saga_id, 'CrearPartnership', RESULTADO_EXITOSO)
+        for fila, saga_id in zip(filas, sagas) if saga_id and fila['id'] in insertados
+    ])
+    return insertados
+
+def _registrar_fallos(session, fallidos: List[CrearPartnership]):
+    """Agrega a la outbox los eventos de fallo de las filas rechazadas que pertenecen a una saga"""
+    insertar_mensajes_procesados(session, [
+        fila_mensaje_procesado(comando.saga_id, 'CrearPartnership', RESULTADO_FALLIDO)
+        for comando in fallidos if comando.saga_id
+    ])
+    if not PULSAR_AVAILABLE:
+        return
+    filas_outbox = [
+        construir_fila_outbox(comando.saga_id, PartnershipCreationFailed(
+            id_partnership=comando.id,
+            id_marca=comando.id_marca,
+            id_partner=comando.id_partner,
+            tipo_partnership=comando.tipo_partnership
+        ), 'CommandCreatePartner', 'failed')
+        for comando in fallidos if comando.saga_id
+    ]
+    if filas_outbox:
+        session.execute(OutboxDBModel.__table__.insert(), filas_outbox)
+
+def crear_partnerships(session, comandos: List[CrearPartnership], indices: List[int] = None) -> List[Dict[str, Any]]:
+    """Crea un lote de partnerships en una sola transacción
+
+    Las filas inválidas o duplicadas se reportan individualmente sin abortar el resto del lote.
+    Las filas rechazadas que pertenecen a una saga generan su evento de fallo en la misma transacción.
+    Un error transitorio de base de datos se propaga para que el lote completo se reintente.
+    """
+    resultados: List[Dict[str, Any]] = []
+    filas, sagas, posiciones = [], [], []
+    fallidos: List[CrearPartnership] = []
+    vistos = set()
+
+    for i, comando in enumerate(comandos):
+        resultado = {'indice': indices[i] if indices else i, 'id': str(comando.id), 'estado': 'creado'}
+        resultados.append(resultado)
+        try:
+            fila = comando_a_fila(comando)
+        except (ValueError, TypeError, AttributeError) as e:
+            resultado['estado'] = 'error'
+            resultado['error'] = str(e)
+            fallidos.append(comando)
+            continue
+        if fila['id'] in vistos:
+            resultado['estado'] = 'duplicado'
+            continue
+        vistos.add(fila['id'])
+        filas.append(fila)
+        sagas.append(comando.saga_id)
+        posiciones.append(i)
+
+    if not filas:
+        _registrar_fallos(session, fallidos)
+        session.commit()
+        return resultados
+
+    try:
+        insertados = _insertar_filas(session, filas, sagas)
+        _registrar_fallos(session, fallidos)
+        session.commit()
+    except Exception as e:
+        # Un error de base de datos invalida el INSERT completo: se reintenta fila por fila
+        session.rollback()
+        logger.warning(f"Error insertando lote de {len(filas)} partnerships, reintentando por fila: {e}")
+        insertados = set()
+        for fila, saga_id, posicion in zip(filas, sagas, posiciones):
+            try:
+                with session.begin_nested():
+                    insertados |= _insertar_filas(session, [fila], [saga_id])
+            except ERRORES_PERMANENTES as fila_error:
+                resultados[posicion]['estado'] = 'error'
+                resultados[posicion]['error'] = str(fila_error)
+                fallidos.append(comandos[posicion])
+            except Exception:
+                session.rollback()
+                raise
+        _registrar_fallos(session, fallidos)
+        session.commit()
+
+    for fila, posicion in zip(filas, posiciones):
+        if resultados[posicion]['estado'] == 'creado' and fila['id'] not in insertados:
+            resultados[posicion]['estado'] = 'duplicado'
+
+    logger.info("Lote de partnerships procesado: %s/%s creadas", len(insertados), len(comandos))
+    return resultados
+
+@ejecutar_commando.register
+def _(comando: CrearPartnershipsEnLote):
+    """Handler para crear partnerships en lote"""
+    return crear_partnerships(db.session, comando.comandos, comando.indices)
@@ -0,0 +1,295 @@
+"""Handlers para las transiciones de estado de partnerships
+
+En este archivo se definen los handlers de los comandos del ciclo de vida. Cada transición
+se ejecuta como un único UPDATE condicionado al estado actual (mismas guardas del aggregate)
+y el evento de dominio se construye a partir de la fila retornada. La columna version da
+concurrencia optimista: cada transición la incrementa y puede condicionarse a una versión esperada
+
+"""
+
+from partner_lifecycle.modulos.partner_lifecycle.aplicacion.comandos.comandos_partnership import (
+    IniciarNegociacionPartnership, ActivarPartnership, SuspenderPartnership,
+    TerminarPartnership, RenovarPartnership, ActualizarNivelPartnership
+)
+from partner_lifecycle.modulos.partner_lifecycle.dominio.entidades import (
+    ESTADOS_PARA_INICIAR_NEGOCIACION, ESTADOS_PARA_ACTIVAR, ESTADOS_PARA_SUSPENDER,
+    ESTADOS_PARA_TERMINAR, ESTADOS_PARA_RENOVAR, ESTADOS_PARA_ACTUALIZAR_NIVEL,
+    PartnershipIniciada, PartnershipActivada, PartnershipSuspendida, PartnershipTerminada,
+    PartnershipRenovada, NivelPartnershipActualizado
+)
+from partner_lifecycle.modulos.partner_lifecycle.dominio.excepciones import (
+    PartnershipNoEncontradaExcepcion, TransicionInvalidaExcepcion
+)
+from partner_lifecycle.modulos.partner_lifecycle.infraestructura.modelos import (
+    PartnershipDBModel, EstadoPartnershipEnum, NivelPartnershipEnum
+)
+from partner_lifecycle.modulos.partner_lifecycle.infraestructura.proyecciones import proyector_resumen_marca
+from partner_lifecycle.modulos.partner_lifecycle.infraestructura.almacen_eventos import almacen_eventos
+from partner_lifecycle.seedwork.aplicacion.comandos import ejecutar_commando, reintentar_en_conflicto
+from partner_lifecycle.seedwork.dominio.excepciones import ExcepcionFabrica, ConflictoConcurrenciaExcepcion
+from partner_lifecycle.config.db import db
+from sqlalchemy import select, update, and_, true
+
+# Importar la outbox solo si Pulsar está disponible
+try:
+    from partner_lifecycle.infraestructura.outbox import agregar_evento_outbox
+    PULSAR_AVAILABLE = True
+except ImportError:
+    PULSAR_AVAILABLE = False
+    agregar_evento_outbox = None
+from datetime import datetime
+from types import SimpleNamespace
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+tabla = PartnershipDBModel.__table__
+
+# El UPDATE retorna la fila completa: construye el evento y, cuando corresponde, el snapshot
+# del almacén de eventos sin volver a leerla
+COLUMNAS_RETORNADAS = tuple(tabla.c)
+
+def _uuid(valor) -> uuid.UUID:
+    try:
+        return uuid.UUID(str(valor))
+    except ValueError:
+        raise ExcepcionFabrica("id_partnership debe ser un UUID válido")
+
+def _entero(valor, campo: str) -> int:
+    try:
+        return int(valor)
+    except (ValueError, TypeError):
+        raise ExcepcionFabrica(f"{campo} debe ser un número entero")
+
+def _decimal(valor, campo: str) -> float:
+    try:
+        return float(valor)
+    except (ValueError, TypeError):
+        raise ExcepcionFabrica(f"{campo} debe ser un número")
+
+def _fecha(valor: str, campo: str, por_defecto=None) -> datetime:
+    if not valor:
+        return por_defecto
+    try:
+        return datetime.fromisoformat(valor)
+    except (ValueError, TypeError):
+        raise ExcepcionFabrica(f"{campo} debe ser una fecha ISO 8601 válida")
+
+def _diagnosticar(session, id_partnership: uuid.UUID, estados_permitidos, transicion: str,
+                  condiciones=(), version_esperada: int = None):
+    """Determina por qué el UPDATE no afectó filas (solo se consulta en el camino de error)
+
+    Retorna sin error cuando la transición simplemente no tiene efecto (una condición adicional
+    no se cumple) y lanza un conflicto reintentable si la fila cambió entre medio.
+    """
+    fila = session.execute(
+        select(tabla.c.estado, tabla.c.version, and_(true(), *condiciones).label('cumple_condiciones'))
+        .where(tabla.c.id == id_partnership)
+    ).first()
+    if fila is None:
+        raise PartnershipNoEncontradaExcepcion(id_partnership)
+    if version_esperada is not None and fila.version != version_esperada:
+        raise ConflictoConcurrenciaExcepcion(
+            f"La partnership {id_partnership} está en la versión {fila.version}, se esperaba {version_esperada}",
+            reintentable=False
+        )
+    if fila.estado not in list(estados_permitidos):
+        raise TransicionInvalidaExcepcion(id_partnership, fila.estado.value, transicion)
+    if fila.cumple_condiciones:
+        raise ConflictoConcurrenciaExcepcion(f"La partnership {id_partnership} fue modificada durante la transición")
+
+@reintentar_en_conflicto
+def _ejecutar_transicion(comando, transicion: str, estados_permitidos, valores: dict, construir_evento,
+                         condiciones=(), previas=()):
+    """Aplica la transición con un UPDATE ... WHERE id AND estado IN (...) RETURNING
+
+    Si la guarda se cumple, el evento, la outbox, el almacén de eventos y el read model se
+    escriben en la misma transacción. Si la guarda del estado se cumple pero no una condición adicional
+    (por ejemplo, el mismo nivel), la transición no tiene efecto, igual que en el aggregate.
+    Si el comando trae una versión esperada, el UPDATE también se condiciona a ella.
+
+    ``previas`` son columnas cuyo valor anterior necesita el evento; ``construir_evento`` recibe la
+    fila retornada y los valores anteriores. En PostgreSQL se leen en el mismo UPDATE con un FROM
+    sobre la fila previa. En otros dialectos (SQLite no retorna columnas del FROM) se leen antes
+    con la versión. En ambos casos el UPDATE se condiciona a esa versión: si otra transacción
+    modificó la fila entre medio, no afecta filas y el conflicto se reintenta.
+    """
+    session = db.session
+    id_partnership = _uuid(comando.id_partnership)
+    ahora = datetime.utcnow()
+    valores = dict(valores)
+    valores['fecha_ultima_actividad'] = ahora
+    valores['fecha_actualizacion'] = _fecha(comando.fecha_actualizacion, 'fecha_actualizacion', ahora)
+    valores['version'] = tabla.c.version + 1
+    version_esperada = _entero(comando.version, 'version') if comando.version is not None else None
+
+    sentencia = (
+        update(tabla)
+        .where(tabla.c.id == id_partnership)
+        .where(tabla.c.estado.in_(list(estados_permitidos)))
+        .where(*condiciones)
+        .values(**valores)
+        .returning(*COLUMNAS_RETORNADAS)
+    )
+    if version_esperada is not None:
+        sentencia = sentencia.where(tabla.c.version == version_esperada)
+
+    try:
+        previa = None
+        un_paso = bool(previas) and session.get_bind().dialect.name == 'postgresql'
+        if un_paso:
+            # UPDATE ... FROM (fila previa) RETURNING: un solo viaje a la base de datos
+            anterior = (
+                select(tabla.c.id, tabla.c.version, *previas)
+                .where(tabla.c.id == id_partnership)
+                .subquery('previa')
+            )
+            sentencia = (
+                sentencia
+                .where(tabla.c.id == anterior.c.id, tabla.c.version == anterior.c.version)
+                .returning(*(anterior.c[columna.name].label(f'previa_{columna.name}') for columna in previas))
+            )
+        elif previas:
+            # Sin lock: la fila debe seguir en la versión leída al momento del UPDATE
+            previa = session.execute(
+                select(tabla.c.version, *previas).where(tabla.c.id == id_partnership)
+            ).first()
+            if previa is None:
+                raise PartnershipNoEncontradaExcepcion(id_partnership)
+            sentencia = sentencia.where(tabla.c.version == previa.version)
+        fila = session.execute(sentencia).first()
+        if fila is None:
+            _diagnosticar(session, id_partnership, estados_permitidos, transicion, condiciones, version_esperada)
+            session.rollback()
+            logger.info("Transición %s sin efecto para partnership %s", transicion, id_partnership)
+            return None
+
+        estado = fila._mapping
+        if un_paso:
+            previa = SimpleNamespace(**{columna.name: estado[f'previa_{columna.name}'] for columna in previas})
+            estado = {columna.name: estado[columna.name] for columna in COLUMNAS_RETORNADAS}
+        evento = construir_evento(fila, previa) if previas else construir_evento(fila)
+        if PULSAR_AVAILABLE:
+            agregar_evento_outbox(session, None, evento, evento.__class__.__name__, 'success', fila.id)
+        proyector_resumen_marca.aplicar(session, [evento], [fila.version])
+        # La versión resultante es la secuencia del evento en el almacén
+        cambios = {columna: valor for columna, valor in valores.items() if columna != 'version'}
+        almacen_eventos.agregar(session, fila.id, fila.version, evento, cambios, estado)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    logger.info("Transición %s aplicada a partnership %s", transicion, id_partnership)
+    return evento
+
+@ejecutar_commando.register
+def _(comando: IniciarNegociacionPartnership):
+    """Handler para iniciar la negociación de una partnership"""
+    return _ejecutar_transicion(
+        comando, 'iniciar la negociación de', ESTADOS_PARA_INICIAR_NEGOCIACION,
+        {'estado': EstadoPartnershipEnum.EN_NEGOCIACION, 'terminos_contrato': comando.terminos},
+        lambda fila: PartnershipIniciada(
+            id_partnership=fila.id,
+            id_marca=fila.id_marca,
+            id_partner=fila.id_partner,
+            tipo_partnership=fila.tipo_partnership.value,
+            fecha_inicio=datetime.now(),
+            metas_mensuales=fila.metas_mensuales
+        )
+    )
+
+@ejecutar_commando.register
+def _(comando: ActivarPartnership):
+    """Handler para activar una partnership"""
+    return _ejecutar_transicion(
+        comando, 'activar', ESTADOS_PARA_ACTIVAR,
+        {
+            'estado': EstadoPartnershipEnum.ACTIVO,
+            'comision_porcentaje': _decimal(comando.comision_porcentaje, 'comision_porcentaje'),
+            'metas_mensuales': _entero(comando.metas_mensuales, 'metas_mensuales'),
+        },
+        lambda fila: PartnershipActivada(
+            id_partnership=fila.id,
+            id_marca=fila.id_marca,
+            id_partner=fila.id_partner,
+            comision_porcentaje=fila.comision_porcentaje,
+            metas_mensuales=fila.metas_mensuales,
+            fecha_activacion=datetime.now()
+        )
+    )
+
+@ejecutar_commando.register
+def _(comando: SuspenderPartnership):
+    """Handler para suspender una partnership"""
+    return _ejecutar_transicion(
+        comando, 'suspender', ESTADOS_PARA_SUSPENDER,
+        {'estado': EstadoPartnershipEnum.SUSPENDIDO},
+        lambda fila: PartnershipSuspendida(
+            id_partnership=fila.id,
+            id_marca=fila.id_marca,
+            id_partner=fila.id_partner,
+            motivo=comando.motivo,
+            fecha_suspension=datetime.now()
+        )
+    )
+
+@ejecutar_commando.register
+def _(comando: TerminarPartnership):
+    """Handler para terminar una partnership"""
+    return _ejecutar_transicion(
+        comando, 'terminar', ESTADOS_PARA_TERMINAR,
+        {'estado': EstadoPartnershipEnum.TERMINADO, 'fecha_fin': datetime.utcnow()},
+        lambda fila: PartnershipTerminada(
+            id_partnership=fila.id,
+            id_marca=fila.id_marca,
+            id_partner=fila.id_partner,
+            motivo=comando.motivo,
+            fecha_terminacion=datetime.now()
+        )
+    )
+
+@ejecutar_commando.register
+def _(comando: RenovarPartnership):
+    """Handler para renovar una partnership"""
+    nueva_fecha_fin = _fecha(comando.nueva_fecha_fin, 'nueva_fecha_fin')
+    if nueva_fecha_fin is None:
+        raise ExcepcionFabrica("nueva_fecha_fin es requerida")
+    valores = {'estado': EstadoPartnershipEnum.RENOVADO, 'fecha_fin': nueva_fecha_fin}
+    if comando.nuevos_terminos:
+        valores['terminos_contrato'] = comando.nuevos_terminos
+    return _ejecutar_transicion(
+        comando, 'renovar', ESTADOS_PARA_RENOVAR, valores,
+        lambda fila: PartnershipRenovada(
+            id_partnership=fila.id,
+            id_marca=fila.id_marca,
+            id_partner=fila.id_partner,
+            nueva_fecha_fin=fila.fecha_fin,
+            fecha_renovacion=datetime.now()
+        )
+    )
+
+@ejecutar_commando.register
+def _(comando: ActualizarNivelPartnership):
+    """Handler para actualizar el nivel de una partnership"""
+    try:
+        nuevo_nivel = NivelPartnershipEnum(comando.nuevo_nivel)
+    except ValueError:
+        raise ExcepcionFabrica(f"nuevo_nivel inválido: {comando.nuevo_nivel}")
+
+    # El nivel anterior sale del FROM del mismo UPDATE en PostgreSQL; en SQLite se lee antes
+    return _ejecutar_transicion(
+        comando, 'actualizar el nivel de', ESTADOS_PARA_ACTUALIZAR_NIVEL,
+        {'nivel': nuevo_nivel},
+        lambda fila, previa: NivelPartnershipActualizado(
+            id_partnership=fila.id,
+            id_marca=fila.id_marca,
+            id_partner=fila.id_partner,
+            nivel_anterior=previa.nivel.value,
+            nivel_nuevo=nuevo_nivel.value,
+            fecha_actualizacion=datetime.now()
+        ),
+        condiciones=(tabla.c.nivel != nuevo_nivel,),
+        previas=(tabla.c.nivel,)
+    )
@@ -0,0 +1 @@
+"""Queries del módulo Partner Lifecycle Management"""
@@ -0,0 +1,36 @@
+"""Queries para la consulta de partnerships
+
+En este archivo se definen los queries de lectura de partnerships
+
+"""
+
+from dataclasses import dataclass
+from partner_lifecycle.seedwork.aplicacion.queries import Query
+
+@dataclass
+class ObtenerPartnership(Query):
+    id_partnership: str
+
+@dataclass
+class ListarPartnerships(Query):
+    id_marca: str = None
+    id_partner: str = None
+    estado: str = None
+    nivel: str = None
+    tipo_partnership: str = None
+    cursor: str = None
+    limite: int = 50
+
+@dataclass
+class ObtenerResumenMarca(Query):
+    id_marca: str
+
+@dataclass
+class ObtenerHistorialPartnership(Query):
+    id_partnership: str
+    hasta: str = None
+
+@dataclass
+class ObtenerPartnershipEnFecha(Query):
+    id_partnership: str
+    fecha: str
@@ -5,10 +5,15 @@ En este archivo se define el ejecutor de comandos para la capa de aplicación.
 """
 
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 import logging
-from partner_lifecycle.modulos.partner_lifecycle.aplicacion.comandos.comandos_partnership import CrearPartnership
+from partner_lifecycle.modulos.partner_lifecycle.aplicacion.comandos.comandos_partnership import (
+    CrearPartnership, CrearPartnershipsEnLote
+)
+from partner_lifecycle.modulos.partner_lifecycle.infraestructura.idempotencia import RESULTADO_EXITOSO
 from partner_lifecycle.seedwork.aplicacion.comandos import ejecutar_commando
+from partner_lifecycle.infraestructura.trazas import trazador
+from partner_lifecycle.config.logs import registrar_payload
 
 logger = logging.getLogger(__name__)
 
@@ -16,17 +21,29 @@ class CommandExecutorInterface(ABC):
     """Interfaz para el ejecutor de comandos"""
     
     @abstractmethod
-    def execute_crear_partnership(self, command_data: Dict[str, Any], app=None) -> None:
+    def execute_crear_partnership(self, command_data: Dict[str, Any], app=None) -> Optional[str]:
         """Ejecuta el comando CrearPartnership"""
         pass
+    
+    @abstractmethod
+    def execute_crear_partnerships_lote(self, commands_data: List[Dict[str, Any]], app=None) -> List[Dict[str, Any]]:
+        """Ejecuta un lote de comandos CrearPartnership en una sola transacción"""
+        pass
 
 class CommandExecutor(CommandExecutorInterface):
-    """Implementación del ejecutor de comandos"""
+    """Implementación del ejecutor de comandos
+    
+    Si se configura un registro de idempotencia, los comandos de una saga ya procesada
+    no se vuelven a ejecutar y se retorna el resultado almacenado.
+    """
+    
+    def __init__(self, registro_idempotencia=None):
+        self._registro = registro_idempotencia
     
-    def execute_crear_partnership(self, command_data: Dict[str, Any], app=None) -> None:
+    def execute_crear_partnership(self, command_data: Dict[str, Any], app=None) -> Optional[str]:
         """Ejecuta el comando CrearPartnership"""
         try:
-            logger.info(f"Ejecutando comando CrearPartnership con command_data: {command_data}")
+            registrar_payload(logger, "Ejecutando comando CrearPartnership", command_data.get('saga_id'), command_data)
 
             # Crear comando
             comando = CrearPartnership(**command_data)
@@ -34,11 +51,71 @@ class CommandExecutor(CommandExecutorInterface):
             # Ejecutar comando con contexto de aplicación si está disponible
             if app:
                 with app.app_context():
-                    ejecutar_commando(comando)
+                    return self._ejecutar_crear_partnership(comando)
             else:
                 logger.warning("Ejecutando comando sin contexto de Flask")
-                ejecutar_commando(comando)
+                return self._ejecutar_crear_partnership(comando)
             
         except Exception as e:
             logger.error(f"Error ejecutando comando CrearPartnership: {e}")
             raise
+    
+    def _ejecutar_crear_partnership(self, comando: CrearPartnership) -> Optional[str]:
+        with trazador.span('executor.CrearPartnership', saga_id=comando.saga_id) as span:
+            if self._registro and comando.saga_id:
+                resultado = self._registro.obtener(comando.saga_id, 'CrearPartnership')
+                if resultado is not None:
+                    logger.info("Saga %s ya procesada (%s), comando CrearPartnership omitido", comando.saga_id, resultado)
+                    if span is not None:
+                        span.atributos['duplicado'] = True
+                    return resultado
+            
+            ejecutar_commando(comando)
+            
+            if self._registro and comando.saga_id:
+                self._registro.recordar(comando.saga_id, 'CrearPartnership', RESULTADO_EXITOSO)
+            return RESULTADO_EXITOSO
+    
+    def execute_crear_partnerships_lote(self, commands_data: List[Dict[str, Any]], app=None) -> List[Dict[str, Any]]:
+        """Ejecuta un lote de comandos CrearPartnership en una sola transacción"""
+        try:
+            logger.info("Ejecutando lote CrearPartnership con %s comandos", len(commands_data))
+            
+            comandos = [CrearPartnership(**data) for data in commands_data]
+            
+            if app:
+                with app.app_context():
+                    return self._ejecutar_crear_partnerships_lote(comandos)
+            logger.warning("Ejecutando comando sin contexto de Flask")
+            return self._ejecutar_crear_partnerships_lote(comandos)
+            
+        except Exception as e:
+            logger.error(f"Error ejecutando lote CrearPartnership: {e}")
+            raise
+    
+    def _ejecutar_crear_partnerships_lote(self, comandos: List[CrearPartnership]) -> List[Dict[str, Any]]:
+        procesados = {}
+        if self._registro:
+            procesados = self._registro.obtener_varios([c.saga_id for c in comandos], 'CrearPartnership')
+        
+        resultados, pendientes, indices = [], [], []
+        for i, comando in enumerate(comandos):
+            resultado_previo = procesados.get(str(comando.saga_id)) if comando.saga_id else None
+            if resultado_previo is not None:
+                resultados.append({'indice': i, 'id': str(comando.id), 'estado': 'duplicado', 'resultado': resultado_previo})
+            else:
+                pendientes.append(comando)
+                indices.append(i)
+        if resultados:
+            logger.info("%s comandos CrearPartnership de sagas ya procesadas omitidos", len(resultados))
+        
+        if pendientes:
+            resultados.extend(ejecutar_commando(CrearPartnershipsEnLote(comandos=pendientes, indices=indices)))
+            if self._registro:
+                for resultado in resultados:
+                    comando = comandos[resultado['indice']]
+                    if resultado['estado'] == 'creado' and comando.saga_id:
+                        self._registro.recordar(comando.saga_id, 'CrearPartnership', RESULTADO_EXITOSO)
+        
+        resultados.sort(key=lambda r: r['indice'])
+        return resultados
@@ -6,12 +6,14 @@ En este archivo se define el contenedor de dependency injection para el módulo
 
 from .event_processing_service import EventProcessingService
 from .command_executor import CommandExecutor
+from partner_lifecycle.modulos.partner_lifecycle.infraestructura.idempotencia import RegistroIdempotencia
 
 class DependencyContainer:
     """Contenedor de dependencias para el módulo partner_lifecycle"""
     
     def __init__(self):
         self._command_executor = None
+        self._registro_idempotencia = None
         self._event_processing_service = None
         self._app = None
     
@@ -21,10 +23,16 @@ class DependencyContainer:
         # Reset services to ensure they are recreated with the new app
         self._event_processing_service = None
     
+    def get_registro_idempotencia(self) -> RegistroIdempotencia:
+        """Obtiene la instancia del registro de idempotencia"""
+        if self._registro_idempotencia is None:
+            self._registro_idempotencia = RegistroIdempotencia()
+        return self._registro_idempotencia
+    
     def get_command_executor(self) -> CommandExecutor:
         """Obtiene la instancia del ejecutor de comandos"""
         if self._command_executor is None:
-            self._command_executor = CommandExecutor()
+            self._command_executor = CommandExecutor(self.get_registro_idempotencia())
         return self._command_executor
     
     def get_event_processing_service(self) -> EventProcessingService:
@@ -6,10 +6,12 @@ siguiendo los principios de arquitectura hexagonal.
 """
 
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
 import logging
 from datetime import datetime
 import uuid
+from partner_lifecycle.infraestructura.trazas import trazador
+from partner_lifecycle.config.logs import registrar_payload
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +22,11 @@ class EventProcessingServiceInterface(ABC):
     def process_partnership_iniciada(self, key: str, payload: Dict[str, Any]) -> None:
         """Procesa el evento PartnershipIniciada"""
         pass
+    
+    @abstractmethod
+    def process_partnership_iniciada_lote(self, eventos: List[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Procesa un lote de eventos PartnershipIniciada"""
+        pass
 
 class EventProcessingService(EventProcessingServiceInterface):
     """Implementación del servicio de procesamiento de eventos"""
@@ -31,33 +38,55 @@ class EventProcessingService(EventProcessingServiceInterface):
     def process_partnership_iniciada(self, key: str, payload: Dict[str, Any]) -> None:
         """Procesa el evento PartnershipIniciada ejecutando el comando CrearPartnership"""
         try:
-            logger.info(f"Procesando PartnershipIniciada con saga_id: {key} y payload: {payload}")
+            logger.info("Procesando PartnershipIniciada con saga_id: %s", key)
+            registrar_payload(logger, "Payload PartnershipIniciada", key, payload)
             
-            # Mapear datos del evento a comando de aplicación
-            command_data = self._map_partnership_iniciada_to_command(key, payload)
+            with trazador.span('procesar.PartnershipIniciada', saga_id=key):
+                # Mapear datos del evento a comando de aplicación
+                command_data = self._map_partnership_iniciada_to_command(key, payload)
+                
+                # Ejecutar comando a través del executor con contexto de aplicación
+                self._command_executor.execute_crear_partnership(command_data, self._app)
             
-            # Ejecutar comando a través del executor con contexto de aplicación
-            self._command_executor.execute_crear_partnership(command_data, self._app)
-            
-            logger.info(f"Comando CrearPartnership ejecutado exitosamente para partnership: {command_data['id']}")
+            logger.info("Comando CrearPartnership ejecutado exitosamente para partnership: %s", command_data['id'])
             
         except Exception as e:
             logger.error(f"Error ejecutando CrearPartnership para partnership {payload.get('id_partnership')}: {e}")
             raise
     
+    def process_partnership_iniciada_lote(self, eventos: List[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Procesa un lote de eventos PartnershipIniciada ejecutando un único CrearPartnershipsEnLote"""
+        try:
+            logger.info("Procesando lote de %s eventos PartnershipIniciada", len(eventos))
+            
+            commands_data = [self._map_partnership_iniciada_to_command(key, payload) for key, payload in eventos]
+            resultados = self._command_executor.execute_crear_partnerships_lote(commands_data, self._app)
+            
+            creados = sum(1 for r in resultados if r['estado'] == 'creado')
+            logger.info("Lote CrearPartnership ejecutado: %s/%s partnerships creadas", creados, len(eventos))
+            return resultados
+            
+        except Exception as e:
+            logger.error(f"Error ejecutando lote CrearPartnership de {len(eventos)} eventos: {e}")
+            raise
+    
     def _map_partnership_iniciada_to_command(self, key: str, payload: Dict[str, Any]) -> Dict[str, Any]:
         """Mapea los datos del evento a los datos del comando"""
-        return {
-            'id': payload.get('id_partnership', str(uuid.uuid4())),
-            'saga_id': key,
-            'id_marca': payload.get('id_marca', str(uuid.uuid4())),
-            'id_partner': payload.get('id_partner', str(uuid.uuid4())),
-            'tipo_partnership': payload.get('tipo_partnership', 'marca_embajador'),
-            'terminos_contrato': payload.get('terminos_contrato', ''),
-            'comision_porcentaje': payload.get('comision_porcentaje', 0.0),
-            'metas_mensuales': payload.get('metas_mensuales', 0),
-            'beneficios_adicionales': payload.get('beneficios_adicionales', ''),
-            'notas': payload.get('notas', ''),
-            'fecha_creacion': datetime.now().isoformat(),
-            'fecha_actualizacion': datetime.now().isoformat()
-        }
+        return map_partnership_iniciada_to_command(key, payload)
+
+def map_partnership_iniciada_to_command(key: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Mapea los datos del evento PartnershipIniciada a los datos del comando CrearPartnership"""
+    return {
+        'id': payload.get('id_partnership', str(uuid.uuid4())),
+        'saga_id': key,
+        'id_marca': payload.get('id_marca', str(uuid.uuid4())),
+        'id_partner': payload.get('id_partner', str(uuid.uuid4())),
+        'tipo_partnership': payload.get('tipo_partnership', 'marca_embajador'),
+        'terminos_contrato': payload.get('terminos_contrato', ''),
+        'comision_porcentaje': payload.get('comision_porcentaje', 0.0),
+        'metas_mensuales': payload.get('metas_mensuales', 0),
+        'beneficios_adicionales': payload.get('beneficios_adicionales', ''),
+        'notas': payload.get('notas', ''),
+        'fecha_creacion': datetime.now().isoformat(),
+        'fecha_actualizacion': datetime.now().isoformat()
+    }
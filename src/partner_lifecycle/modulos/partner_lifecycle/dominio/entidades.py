@@ -34,6 +34,18 @@ class NivelPartnership(Enum):
     PLATINO = "platino"
     DIAMANTE = "diamante"
 
+# Estados desde los que se permite cada transición. Los handlers los usan como guarda
+# del UPDATE condicional, de modo que aggregate y base de datos aplican las mismas reglas
+ESTADOS_PARA_INICIAR_NEGOCIACION = (EstadoPartnership.INICIANDO,)
+ESTADOS_PARA_ACTIVAR = (EstadoPartnership.EN_NEGOCIACION,)
+ESTADOS_PARA_SUSPENDER = (EstadoPartnership.ACTIVO,)
+ESTADOS_PARA_TERMINAR = (EstadoPartnership.ACTIVO, EstadoPartnership.SUSPENDIDO)
+ESTADOS_PARA_RENOVAR = (EstadoPartnership.ACTIVO,)
+ESTADOS_PARA_ACTUALIZAR_NIVEL = (EstadoPartnership.ACTIVO,)
+
+# Estados en los que la partnership sigue en curso y se consulta en caliente (índices parciales)
+ESTADOS_VIGENTES = (EstadoPartnership.INICIANDO, EstadoPartnership.EN_NEGOCIACION, EstadoPartnership.ACTIVO)
+
 @dataclass
 class Partnership(AgregacionRaiz):
     id_marca: uuid.UUID = field(default=None)
@@ -49,9 +61,10 @@ class Partnership(AgregacionRaiz):
     metas_mensuales: int = field(default=0)
     beneficios_adicionales: str = field(default="")
     notas: str = field(default="")
+    version: int = field(default=1)
     
     def iniciar_negociacion(self, terminos: str = ""):
-        if self.estado == EstadoPartnership.INICIANDO:
+        if self.estado in ESTADOS_PARA_INICIAR_NEGOCIACION:
             self.estado = EstadoPartnership.EN_NEGOCIACION
             self.terminos_contrato = terminos
             self.fecha_ultima_actividad = datetime.now()
@@ -60,11 +73,12 @@ class Partnership(AgregacionRaiz):
                 id_marca=self.id_marca,
                 id_partner=self.id_partner,
                 tipo_partnership=self.tipo_partnership.value,
-                fecha_inicio=datetime.now()
+                fecha_inicio=datetime.now(),
+                metas_mensuales=self.metas_mensuales
             ))
     
     def activar_partnership(self, comision: float = 0.0, metas: int = 0):
-        if self.estado == EstadoPartnership.EN_NEGOCIACION:
+        if self.estado in ESTADOS_PARA_ACTIVAR:
             self.estado = EstadoPartnership.ACTIVO
             self.comision_porcentaje = comision
             self.metas_mensuales = metas
@@ -79,7 +93,7 @@ class Partnership(AgregacionRaiz):
             ))
     
     def suspender_partnership(self, motivo: str = ""):
-        if self.estado == EstadoPartnership.ACTIVO:
+        if self.estado in ESTADOS_PARA_SUSPENDER:
             self.estado = EstadoPartnership.SUSPENDIDO
             self.fecha_ultima_actividad = datetime.now()
             self.agregar_evento(PartnershipSuspendida(
@@ -91,7 +105,7 @@ class Partnership(AgregacionRaiz):
             ))
     
     def terminar_partnership(self, motivo: str = ""):
-        if self.estado in [EstadoPartnership.ACTIVO, EstadoPartnership.SUSPENDIDO]:
+        if self.estado in ESTADOS_PARA_TERMINAR:
             self.estado = EstadoPartnership.TERMINADO
             self.fecha_fin = datetime.now()
             self.fecha_ultima_actividad = datetime.now()
@@ -104,7 +118,7 @@ class Partnership(AgregacionRaiz):
             ))
     
     def renovar_partnership(self, nueva_fecha_fin: datetime, nuevos_terminos: str = ""):
-        if self.estado == EstadoPartnership.ACTIVO:
+        if self.estado in ESTADOS_PARA_RENOVAR:
             self.estado = EstadoPartnership.RENOVADO
             self.fecha_fin = nueva_fecha_fin
             if nuevos_terminos:
@@ -119,7 +133,7 @@ class Partnership(AgregacionRaiz):
             ))
     
     def actualizar_nivel(self, nuevo_nivel: NivelPartnership):
-        if self.estado == EstadoPartnership.ACTIVO and nuevo_nivel != self.nivel:
+        if self.estado in ESTADOS_PARA_ACTUALIZAR_NIVEL and nuevo_nivel != self.nivel:
             nivel_anterior = self.nivel
             self.nivel = nuevo_nivel
             self.fecha_ultima_actividad = datetime.now()
@@ -139,6 +153,7 @@ class PartnershipIniciada(EventoDominio):
     id_partner: uuid.UUID = None
     tipo_partnership: str = None
     fecha_inicio: datetime = None
+    metas_mensuales: int = None
 
 @dataclass
 class PartnershipActivada(EventoDominio):
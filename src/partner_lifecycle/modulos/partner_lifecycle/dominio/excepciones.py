@@ -0,0 +1,21 @@
+"""Excepciones del dominio de Partner Lifecycle Management
+
+En este archivo se definen las excepciones del dominio para la gestión del ciclo de vida de partners
+
+"""
+
+from partner_lifecycle.seedwork.dominio.excepciones import ExcepcionDominio
+
+class PartnershipNoEncontradaExcepcion(ExcepcionDominio):
+    def __init__(self, id_partnership):
+        self.id_partnership = id_partnership
+    def __str__(self):
+        return f"Partnership {self.id_partnership} no encontrada"
+
+class TransicionInvalidaExcepcion(ExcepcionDominio):
+    def __init__(self, id_partnership, estado_actual: str, transicion: str):
+        self.id_partnership = id_partnership
+        self.estado_actual = estado_actual
+        self.transicion = transicion
+    def __str__(self):
+        return f"No se puede {self.transicion} la partnership {self.id_partnership} en estado {self.estado_actual}"
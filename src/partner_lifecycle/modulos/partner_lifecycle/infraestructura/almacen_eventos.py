@@ -0,0 +1,187 @@
+"""Almacén de eventos de partnerships
+
+En este archivo se define el almacén append-only de eventos del ciclo de vida (partnership_events),
+los snapshots periódicos del estado completo (partnership_snapshots) y el repositorio que
+reconstruye una Partnership desde su último snapshot más los eventos posteriores
+
+"""
+
+import os
+import uuid
+import logging
+from enum import Enum
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+from sqlalchemy import DateTime, select
+from partner_lifecycle.modulos.partner_lifecycle.dominio.entidades import Partnership
+from partner_lifecycle.modulos.partner_lifecycle.infraestructura.modelos import (
+    PartnershipDBModel, PartnershipEventoDBModel, PartnershipSnapshotDBModel
+)
+from partner_lifecycle.infraestructura.serializacion import registro_serializadores
+from partner_lifecycle.seedwork.dominio.eventos import EventoDominio
+
+logger = logging.getLogger(__name__)
+
+tabla = PartnershipDBModel.__table__
+
+def _valor_json(valor):
+    if isinstance(valor, Enum):
+        return valor.value
+    if isinstance(valor, uuid.UUID):
+        return str(valor)
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    return valor
+
+def columnas_a_json(valores: Dict[str, Any]) -> Dict[str, Any]:
+    """Serializa valores de columnas de partnerships (solo las columnas de la tabla)"""
+    return {nombre: _valor_json(valor) for nombre, valor in valores.items() if nombre in tabla.c}
+
+def columnas_desde_json(valores: Dict[str, Any]) -> Dict[str, Any]:
+    """Convierte valores JSON a los tipos de Python de cada columna de partnerships"""
+    convertidos = {}
+    for nombre, valor in valores.items():
+        if nombre not in tabla.c:
+            continue
+        columna = tabla.c[nombre]
+        if valor is not None:
+            enum_class = getattr(columna.type, 'enum_class', None)
+            if enum_class is not None:
+                valor = enum_class(valor)
+            elif isinstance(columna.type, DateTime):
+                valor = datetime.fromisoformat(valor)
+            elif getattr(columna.type, 'as_uuid', False):
+                valor = uuid.UUID(valor)
+        convertidos[nombre] = valor
+    return convertidos
+
+def fecha_utc(fecha: datetime) -> datetime:
+    """Normaliza una fecha a UTC sin zona horaria, igual que las columnas fecha_registro"""
+    if fecha.tzinfo is not None:
+        return fecha.astimezone(timezone.utc).replace(tzinfo=None)
+    return fecha
+
+class AlmacenEventosPartnership:
+    """Escribe los eventos y snapshots de partnerships en la transacción del agregado"""
+
+    def __init__(self, intervalo_snapshot: int = None):
+        self.intervalo_snapshot = max(1, intervalo_snapshot or int(os.getenv('EVENT_STORE_SNAPSHOT_INTERVAL', '50')))
+
+    def requiere_snapshot(self, secuencia: int) -> bool:
+        """El primer evento y cada N eventos dejan un snapshot del estado completo"""
+        return secuencia == 1 or secuencia % self.intervalo_snapshot == 0
+
+    def filas(self, id_partnership, secuencia: int, evento: EventoDominio,
+              cambios: Dict[str, Any] = None, estado: Dict[str, Any] = None) -> tuple:
+        """Construye la fila del evento y, si corresponde, la del snapshot (o None)"""
+        ahora = datetime.utcnow()
+        fila_evento = {
+            'id_partnership': id_partnership,
+            'sequence': secuencia,
+            'event_id': evento.id,
+            'event_type': evento.__class__.__name__,
+            'payload': registro_serializadores.codificador(type(evento)).a_dict(evento, explicito=True),
+            'cambios': columnas_a_json(cambios) if cambios else None,
+            'fecha_registro': ahora,
+        }
+        fila_snapshot = None
+        if estado is not None and self.requiere_snapshot(secuencia):
+            fila_snapshot = {
+                'id_partnership': id_partnership,
+                'sequence': secuencia,
+                'estado': columnas_a_json(estado),
+                'fecha_registro': ahora,
+            }
+        return fila_evento, fila_snapshot
+
+    def agregar(self, session, id_partnership, secuencia: int, evento: EventoDominio,
+                cambios: Dict[str, Any] = None, estado: Dict[str, Any] = None):
+        """Agrega un evento (y su snapshot si toca) a la transacción actual"""
+        self.agregar_varios(session, [(id_partnership, secuencia, evento, cambios, estado)])
+
+    def agregar_varios(self, session, registros: Iterable[tuple]):
+        """Agrega varios eventos ``(id_partnership, secuencia, evento, cambios, estado)`` con un INSERT por tabla"""
+        filas_eventos, filas_snapshots = [], []
+        for registro in registros:
+            fila_evento, fila_snapshot = self.filas(*registro)
+            filas_eventos.append(fila_evento)
+            if fila_snapshot:
+                filas_snapshots.append(fila_snapshot)
+        if filas_eventos:
+            session.execute(PartnershipEventoDBModel.__table__.insert(), filas_eventos)
+        if filas_snapshots:
+            session.execute(PartnershipSnapshotDBModel.__table__.insert(), filas_snapshots)
+
+    def historial(self, session, id_partnership, hasta: datetime = None) -> List[Dict[str, Any]]:
+        """Eventos de la partnership en orden de secuencia, opcionalmente hasta una fecha"""
+        sentencia = (
+            select(PartnershipEventoDBModel.sequence, PartnershipEventoDBModel.event_id,
+                   PartnershipEventoDBModel.event_type, PartnershipEventoDBModel.payload,
+                   PartnershipEventoDBModel.fecha_registro)
+            .where(PartnershipEventoDBModel.id_partnership == id_partnership)
+            .order_by(PartnershipEventoDBModel.sequence)
+        )
+        if hasta is not None:
+            sentencia = sentencia.where(PartnershipEventoDBModel.fecha_registro <= fecha_utc(hasta))
+        return [
+            {
+                'sequence': fila.sequence,
+                'event_id': str(fila.event_id),
+                'event_type': fila.event_type,
+                'event_data': fila.payload,
+                'fecha_registro': fila.fecha_registro.isoformat(),
+            }
+            for fila in session.execute(sentencia)
+        ]
+
+class RepositorioPartnership:
+    """Reconstruye partnerships desde el almacén de eventos
+
+    Lee el último snapshot (hasta la fecha pedida) y aplica en orden los cambios de los eventos
+    posteriores, de modo que la carga lee como máximo ``intervalo_snapshot`` eventos.
+    """
+
+    def obtener_estado(self, session, id_partnership, hasta: datetime = None) -> Optional[Dict[str, Any]]:
+        """Valores de columnas de la partnership en su última secuencia (o en la fecha indicada)"""
+        sentencia_snapshot = (
+            select(PartnershipSnapshotDBModel.sequence, PartnershipSnapshotDBModel.estado)
+            .where(PartnershipSnapshotDBModel.id_partnership == id_partnership)
+            .order_by(PartnershipSnapshotDBModel.sequence.desc())
+            .limit(1)
+        )
+        sentencia_eventos = (
+            select(PartnershipEventoDBModel.sequence, PartnershipEventoDBModel.cambios)
+            .where(PartnershipEventoDBModel.id_partnership == id_partnership)
+            .order_by(PartnershipEventoDBModel.sequence)
+        )
+        if hasta is not None:
+            hasta = fecha_utc(hasta)
+            sentencia_snapshot = sentencia_snapshot.where(PartnershipSnapshotDBModel.fecha_registro <= hasta)
+            sentencia_eventos = sentencia_eventos.where(PartnershipEventoDBModel.fecha_registro <= hasta)
+
+        snapshot = session.execute(sentencia_snapshot).first()
+        if snapshot is None:
+            return None
+        estado = dict(snapshot.estado)
+        for secuencia, cambios in session.execute(
+            sentencia_eventos.where(PartnershipEventoDBModel.sequence > snapshot.sequence)
+        ):
+            if cambios:
+                estado.update(cambios)
+            estado['version'] = secuencia
+        return columnas_desde_json(estado)
+
+    def obtener(self, session, id_partnership, hasta: datetime = None) -> Optional[Partnership]:
+        """Reconstruye el aggregate Partnership, None si no hay historia para la fecha indicada"""
+        estado = self.obtener_estado(session, id_partnership, hasta)
+        if estado is None:
+            return None
+        id_agregado = estado.pop('id')
+        partnership = Partnership(**estado)
+        # El setter de id del seedwork siempre genera uno nuevo: se conserva el persistido
+        partnership._id = id_agregado
+        return partnership
+
+# Instancias globales
+almacen_eventos = AlmacenEventosPartnership()
+repositorio_partnership = RepositorioPartnership()
@@ -0,0 +1,93 @@
+"""Registro de idempotencia para comandos
+
+En este archivo se define el registro de mensajes procesados por saga, con un
+LRU en memoria delante de la tabla mensajes_procesados
+
+"""
+
+import os
+import threading
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+from sqlalchemy import select
+from partner_lifecycle.config.db import db, insert_con_conflictos
+from partner_lifecycle.modulos.partner_lifecycle.infraestructura.modelos import MensajeProcesadoDBModel
+
+logger = logging.getLogger(__name__)
+
+RESULTADO_EXITOSO = 'success'
+RESULTADO_FALLIDO = 'failed'
+
+def fila_mensaje_procesado(saga_id, tipo_comando: str, resultado: str, error: str = None) -> dict:
+    """Construye la fila que marca el comando de la saga como procesado"""
+    return {
+        'saga_id': str(saga_id),
+        'tipo_comando': tipo_comando,
+        'resultado': resultado,
+        'error': error,
+        'fecha_procesamiento': datetime.utcnow(),
+    }
+
+def agregar_mensaje_procesado(session, saga_id, tipo_comando: str, resultado: str, error: str = None):
+    """Marca el comando como procesado dentro de la transacción actual de la sesión"""
+    session.add(MensajeProcesadoDBModel(**fila_mensaje_procesado(saga_id, tipo_comando, resultado, error)))
+
+def insertar_mensajes_procesados(session, filas: list):
+    """Inserta varias marcas de procesamiento ignorando las que ya existen"""
+    if not filas:
+        return
+    sentencia = insert_con_conflictos(session, MensajeProcesadoDBModel.__table__)
+    session.execute(sentencia.on_conflict_do_nothing(index_elements=['saga_id', 'tipo_comando']), filas)
+
+class RegistroIdempotencia:
+    """Consulta el resultado de comandos ya procesados: primero en memoria, luego en la base de datos"""
+
+    def __init__(self, capacidad: int = None):
+        self.capacidad = capacidad or int(os.getenv('IDEMPOTENCIA_LRU_SIZE', '10000'))
+        self._cache: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cache_get(self, llave) -> Optional[str]:
+        with self._lock:
+            resultado = self._cache.get(llave)
+            if resultado is not None:
+                self._cache.move_to_end(llave)
+            return resultado
+
+    def recordar(self, saga_id, tipo_comando: str, resultado: str):
+        """Guarda el resultado en el LRU (la fila en base de datos la escribe el handler)"""
+        with self._lock:
+            self._cache[(str(saga_id), tipo_comando)] = resultado
+            self._cache.move_to_end((str(saga_id), tipo_comando))
+            while len(self._cache) > self.capacidad:
+                self._cache.popitem(last=False)
+
+    def obtener(self, saga_id, tipo_comando: str) -> Optional[str]:
+        """Retorna el resultado almacenado o None si el comando no ha sido procesado"""
+        return self.obtener_varios([saga_id], tipo_comando).get(str(saga_id))
+
+    def obtener_varios(self, sagas: Iterable, tipo_comando: str, session=None) -> Dict[str, str]:
+        """Retorna los resultados almacenados para las sagas indicadas con una sola consulta
+
+        Por defecto consulta con la sesión de Flask-SQLAlchemy; se puede indicar otra sesión
+        (por ejemplo, la sesión síncrona de una AsyncSession dentro de ``run_sync``).
+        """
+        encontrados, faltantes = {}, []
+        for saga_id in {str(s) for s in sagas if s}:
+            resultado = self._cache_get((saga_id, tipo_comando))
+            if resultado is None:
+                faltantes.append(saga_id)
+            else:
+                encontrados[saga_id] = resultado
+        if faltantes:
+            filas = (session or db.session).execute(
+                select(MensajeProcesadoDBModel.saga_id, MensajeProcesadoDBModel.resultado)
+                .where(MensajeProcesadoDBModel.tipo_comando == tipo_comando)
+                .where(MensajeProcesadoDBModel.saga_id.in_(faltantes))
+            ).all()
+            for saga_id, resultado in filas:
+                encontrados[saga_id] = resultado
+                self.recordar(saga_id, tipo_comando, resultado)
+        return encontrados
@@ -5,34 +5,53 @@ En este archivo se definen los modelos de base de datos para partnerships
 """
 
 from partner_lifecycle.config.db import db
-from sqlalchemy import Column, String, DateTime, Float, Integer, Text, Enum
-from sqlalchemy.dialects.postgresql import UUID
+from partner_lifecycle.modulos.partner_lifecycle.dominio.entidades import (
+    TipoPartnership, EstadoPartnership, NivelPartnership, ESTADOS_VIGENTES
+)
+from sqlalchemy import Column, String, DateTime, Float, Integer, BigInteger, Text, Enum, Index, JSON, text
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 import uuid
 from datetime import datetime
-from enum import Enum as PyEnum
-
-class TipoPartnershipEnum(PyEnum):
-    MARCA_AFILIADO = "marca_afiliado"
-    MARCA_INFLUENCER = "marca_influencer"
-    MARCA_EMBAJADOR = "marca_embajador"
-    MARCA_SOCIO_B2B = "marca_socio_b2b"
-    AFILIADO_INFLUENCER = "afiliado_influencer"
-    INFLUENCER_EMBAJADOR = "influencer_embajador"
-
-class EstadoPartnershipEnum(PyEnum):
-    INICIANDO = "iniciando"
-    EN_NEGOCIACION = "en_negociacion"
-    ACTIVO = "activo"
-    SUSPENDIDO = "suspendido"
-    TERMINADO = "terminado"
-    RENOVADO = "renovado"
-
-class NivelPartnershipEnum(PyEnum):
-    BRONCE = "bronce"
-    PLATA = "plata"
-    ORO = "oro"
-    PLATINO = "platino"
-    DIAMANTE = "diamante"
+
+# Los enums de persistencia son los mismos del dominio: una sola definición de los valores
+TipoPartnershipEnum = TipoPartnership
+EstadoPartnershipEnum = EstadoPartnership
+NivelPartnershipEnum = NivelPartnership
+
+# Tipos enum nativos de Postgres por enum de dominio (deben coincidir con init.sql y migrations/)
+ENUMS_NATIVOS = {
+    'tipo_partnership': TipoPartnership,
+    'estado_partnership': EstadoPartnership,
+    'nivel_partnership': NivelPartnership,
+}
+
+def enum_nativo(nombre: str) -> Enum:
+    """Columna enum nativa que guarda los valores en minúscula del enum de dominio (4 bytes por fila)"""
+    return Enum(
+        ENUMS_NATIVOS[nombre], name=nombre,
+        values_callable=lambda miembros: [miembro.value for miembro in miembros]
+    )
+
+# Predicado de los índices parciales (debe coincidir con init.sql y migrations/002_indices_compuestos.sql)
+PREDICADO_VIGENTES = "estado IN (" + ", ".join(f"'{estado.value}'" for estado in ESTADOS_VIGENTES) + ")"
+
+def verificar_enums(connection) -> list:
+    """Compara las etiquetas de los enums de Postgres con los enums de dominio, retorna las diferencias"""
+    if connection.dialect.name != 'postgresql':
+        return []
+    filas = connection.execute(text(
+        "SELECT t.typname, e.enumlabel FROM pg_type t JOIN pg_enum e ON e.enumtypid = t.oid "
+        "WHERE t.typname = ANY(:nombres) ORDER BY t.typname, e.enumsortorder"
+    ), {'nombres': list(ENUMS_NATIVOS)}).all()
+    etiquetas = {nombre: [] for nombre in ENUMS_NATIVOS}
+    for nombre, etiqueta in filas:
+        etiquetas[nombre].append(etiqueta)
+    diferencias = []
+    for nombre, tipo in ENUMS_NATIVOS.items():
+        esperadas = [miembro.value for miembro in tipo]
+        if etiquetas[nombre] != esperadas:
+            diferencias.append(f"{nombre}: base de datos {etiquetas[nombre]} != dominio {esperadas}")
+    return diferencias
 
 class PartnershipDBModel(db.Model):
     __tablename__ = "partnerships"
@@ -40,9 +59,9 @@ class PartnershipDBModel(db.Model):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     id_marca = Column(UUID(as_uuid=True), nullable=False)
     id_partner = Column(UUID(as_uuid=True), nullable=False)
-    tipo_partnership = Column(Enum(TipoPartnershipEnum), nullable=False)
-    estado = Column(Enum(EstadoPartnershipEnum), nullable=False, default=EstadoPartnershipEnum.INICIANDO)
-    nivel = Column(Enum(NivelPartnershipEnum), nullable=False, default=NivelPartnershipEnum.BRONCE)
+    tipo_partnership = Column(enum_nativo('tipo_partnership'), nullable=False)
+    estado = Column(enum_nativo('estado_partnership'), nullable=False, default=EstadoPartnership.INICIANDO)
+    nivel = Column(enum_nativo('nivel_partnership'), nullable=False, default=NivelPartnership.BRONCE)
     fecha_inicio = Column(DateTime, nullable=False, default=datetime.utcnow)
     fecha_fin = Column(DateTime, nullable=True)
     fecha_ultima_actividad = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -53,6 +72,84 @@ class PartnershipDBModel(db.Model):
     notas = Column(Text, nullable=True)
     fecha_creacion = Column(DateTime, nullable=False, default=datetime.utcnow)
     fecha_actualizacion = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # Concurrencia optimista: las transiciones la incrementan y la incluyen en el WHERE de su UPDATE
+    version = Column(Integer, nullable=False, default=1)
+    
+    # Los compuestos resuelven filtro por marca/partner + estado y el orden de la paginación por keyset
+    __table_args__ = (
+        Index('idx_partnerships_marca_estado', 'id_marca', 'estado', 'fecha_creacion', 'id'),
+        Index('idx_partnerships_partner_estado', 'id_partner', 'estado', 'fecha_creacion', 'id'),
+        Index('idx_partnerships_marca_vigentes', 'id_marca', 'fecha_creacion', 'id',
+              postgresql_where=text(PREDICADO_VIGENTES)),
+        Index('idx_partnerships_partner_vigentes', 'id_partner', 'fecha_creacion', 'id',
+              postgresql_where=text(PREDICADO_VIGENTES)),
+        Index('idx_partnerships_estado', 'estado'),
+        Index('idx_partnerships_tipo', 'tipo_partnership'),
+        Index('idx_partnerships_nivel', 'nivel'),
+        Index('idx_partnerships_fecha_creacion', 'fecha_creacion'),
+    )
     
     def __repr__(self):
         return f"<Partnership {self.id_marca} - {self.id_partner} ({self.estado.value})>"
+
+class MensajeProcesadoDBModel(db.Model):
+    __tablename__ = "mensajes_procesados"
+    
+    saga_id = Column(String(100), primary_key=True)
+    tipo_comando = Column(String(100), primary_key=True)
+    resultado = Column(String(20), nullable=False)
+    error = Column(Text, nullable=True)
+    fecha_procesamiento = Column(DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<MensajeProcesado {self.saga_id} - {self.tipo_comando} ({self.resultado})>"
+
+class ProyeccionPartnershipDBModel(db.Model):
+    """Último estado conocido de cada partnership según los eventos aplicados al read model"""
+    __tablename__ = "proyeccion_partnerships"
+    
+    id_partnership = Column(UUID(as_uuid=True), primary_key=True)
+    id_marca = Column(UUID(as_uuid=True), nullable=False)
+    tipo_partnership = Column(String(50), nullable=False)
+    estado = Column(String(50), nullable=False)
+    nivel = Column(String(50), nullable=False)
+    metas_mensuales = Column(Integer, nullable=False, default=0)
+    # Secuencia en el almacén de eventos del último evento aplicado (None en filas anteriores al almacén)
+    secuencia = Column(Integer, nullable=True)
+
+class ResumenMarcaDBModel(db.Model):
+    """Contadores por marca: cantidad de partnerships por dimensión (estado, nivel, tipo) y suma de metas"""
+    __tablename__ = "resumen_marcas"
+    
+    id_marca = Column(UUID(as_uuid=True), primary_key=True)
+    dimension = Column(String(30), primary_key=True)
+    valor = Column(String(50), primary_key=True)
+    cantidad = Column(BigInteger, nullable=False, default=0)
+
+# JSONB en Postgres, JSON genérico en otros dialectos
+JSONDocumento = JSON().with_variant(JSONB(), "postgresql")
+
+class PartnershipEventoDBModel(db.Model):
+    """Almacén append-only de los eventos de cada partnership; sequence es la versión resultante"""
+    __tablename__ = "partnership_events"
+    
+    id_partnership = Column(UUID(as_uuid=True), primary_key=True)
+    sequence = Column(Integer, primary_key=True)
+    event_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    event_type = Column(String(100), nullable=False)
+    payload = Column(JSONDocumento, nullable=False)
+    # Valores de columna que el evento dejó en la partnership: permiten reconstruirla sin pérdida
+    cambios = Column(JSONDocumento, nullable=True)
+    fecha_registro = Column(DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<PartnershipEvento {self.id_partnership} #{self.sequence} {self.event_type}>"
+
+class PartnershipSnapshotDBModel(db.Model):
+    """Estado completo de una partnership en una secuencia del almacén de eventos"""
+    __tablename__ = "partnership_snapshots"
+    
+    id_partnership = Column(UUID(as_uuid=True), primary_key=True)
+    sequence = Column(Integer, primary_key=True)
+    estado = Column(JSONDocumento, nullable=False)
+    fecha_registro = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -0,0 +1,249 @@
+"""Proyecciones (read models) de partnerships
+
+En este archivo se define el proyector que mantiene de forma incremental el resumen
+de partnerships por marca a partir de los eventos de dominio
+
+"""
+
+import uuid
+import logging
+from collections import Counter
+from typing import Dict, List, Any, Optional, Sequence
+from sqlalchemy import select, delete
+from partner_lifecycle.config.db import insert_con_conflictos
+from partner_lifecycle.modulos.partner_lifecycle.dominio.entidades import (
+    EstadoPartnership, NivelPartnership, TipoPartnership,
+    PartnershipIniciada, PartnershipActivada, PartnershipSuspendida, PartnershipTerminada,
+    PartnershipRenovada, NivelPartnershipActualizado
+)
+from partner_lifecycle.modulos.partner_lifecycle.infraestructura.modelos import (
+    PartnershipDBModel, ProyeccionPartnershipDBModel, ResumenMarcaDBModel, PartnershipEventoDBModel
+)
+from partner_lifecycle.seedwork.dominio.eventos import EventoDominio
+
+logger = logging.getLogger(__name__)
+
+DIMENSION_ESTADO = 'estado'
+DIMENSION_NIVEL = 'nivel'
+DIMENSION_TIPO = 'tipo_partnership'
+DIMENSION_METAS = 'metas_mensuales'
+VALOR_SUMA = 'suma'
+
+def _uuid(valor) -> uuid.UUID:
+    return valor if isinstance(valor, uuid.UUID) else uuid.UUID(str(valor))
+
+class ProyectorResumenMarca:
+    """Mantiene los contadores de resumen_marcas aplicando eventos en lote
+
+    El proyector guarda en proyeccion_partnerships el último estado de cada partnership,
+    así cada evento se traduce en deltas (-1 al valor anterior, +1 al nuevo) sin recalcular
+    agregados sobre la tabla partnerships. También guarda la secuencia del último evento aplicado
+    (la versión de la partnership en el almacén de eventos): un evento con secuencia menor o igual
+    ya está reflejado y se omite, de modo que volver a aplicar eventos no altera los contadores.
+    """
+
+    nombre = 'resumen_marcas'
+
+    ESTADOS_POR_EVENTO = {
+        PartnershipActivada: EstadoPartnership.ACTIVO.value,
+        PartnershipSuspendida: EstadoPartnership.SUSPENDIDO.value,
+        PartnershipTerminada: EstadoPartnership.TERMINADO.value,
+        PartnershipRenovada: EstadoPartnership.RENOVADO.value,
+    }
+
+    def __init__(self, tabla_proyeccion=None, tabla_resumen=None):
+        self.tabla_proyeccion = tabla_proyeccion if tabla_proyeccion is not None else ProyeccionPartnershipDBModel.__table__
+        self.tabla_resumen = tabla_resumen if tabla_resumen is not None else ResumenMarcaDBModel.__table__
+
+    def tablas(self) -> tuple:
+        """Tablas del read model, en el orden que recibe sobre_tablas"""
+        return self.tabla_proyeccion, self.tabla_resumen
+
+    def sobre_tablas(self, tabla_proyeccion, tabla_resumen) -> 'ProyectorResumenMarca':
+        """Mismo proyector escribiendo en otras tablas con las mismas columnas (reconstrucción en sombra)"""
+        return ProyectorResumenMarca(tabla_proyeccion, tabla_resumen)
+
+    def aplicar(self, session, eventos: List[EventoDominio], secuencias: Optional[Sequence[int]] = None) -> int:
+        """Aplica los eventos dentro de la transacción actual, retorna cuántos modificaron el read model
+
+        ``secuencias`` son las secuencias de los eventos en el almacén, en el mismo orden. Sin ellas
+        (replay desde Pulsar) se buscan en el almacén por id de evento; los eventos anteriores al
+        almacén no tienen secuencia y se aplican con las reglas de transición.
+        """
+        if secuencias is None:
+            secuencias = self._secuencias_almacen(session, eventos)
+        pares = [
+            (evento, secuencia) for evento, secuencia in zip(eventos, secuencias)
+            if getattr(evento, 'id_partnership', None) is not None
+        ]
+        if not pares:
+            return 0
+
+        ids = {_uuid(evento.id_partnership) for evento, _ in pares}
+        estados: Dict[uuid.UUID, Dict[str, Any]] = {
+            fila.id_partnership: dict(fila._mapping)
+            for fila in session.execute(
+                select(self.tabla_proyeccion).where(self.tabla_proyeccion.c.id_partnership.in_(ids))
+            )
+        }
+        deltas: Counter = Counter()
+        modificados = {}
+        aplicados = 0
+
+        for evento, secuencia in pares:
+            id_partnership = _uuid(evento.id_partnership)
+            anterior = estados.get(id_partnership)
+            if (secuencia is not None and anterior is not None
+                    and anterior['secuencia'] is not None and secuencia <= anterior['secuencia']):
+                continue
+            nuevo = self._siguiente_estado(evento, id_partnership, anterior, secuencia)
+            if nuevo is None:
+                continue
+            if secuencia is not None:
+                nuevo['secuencia'] = secuencia
+            self._acumular_deltas(deltas, anterior, nuevo)
+            estados[id_partnership] = nuevo
+            modificados[id_partnership] = nuevo
+            aplicados += 1
+
+        self._guardar(session, list(modificados.values()), deltas)
+        return aplicados
+
+    @staticmethod
+    def _secuencias_almacen(session, eventos) -> List[Optional[int]]:
+        """Secuencia de cada evento en el almacén de eventos según su id, None si no está"""
+        ids = {evento.id for evento in eventos if getattr(evento, 'id', None) is not None}
+        if not ids:
+            return [None] * len(eventos)
+        por_id = dict(session.execute(
+            select(PartnershipEventoDBModel.event_id, PartnershipEventoDBModel.sequence)
+            .where(PartnershipEventoDBModel.event_id.in_(ids))
+        ).all())
+        return [por_id.get(getattr(evento, 'id', None)) for evento in eventos]
+
+    def _siguiente_estado(self, evento, id_partnership, anterior, secuencia: Optional[int] = None):
+        """Calcula el nuevo estado proyectado, None si el evento no aplica (duplicado o desconocido)"""
+        if isinstance(evento, PartnershipIniciada):
+            # La creación es la secuencia 1; el aggregate emite PartnershipIniciada también al
+            # iniciar la negociación, que siempre tiene una secuencia mayor
+            if anterior is None and secuencia in (None, 1):
+                return {
+                    'id_partnership': id_partnership,
+                    'id_marca': _uuid(evento.id_marca),
+                    'tipo_partnership': evento.tipo_partnership,
+                    'estado': EstadoPartnership.INICIANDO.value,
+                    'nivel': NivelPartnership.BRONCE.value,
+                    'metas_mensuales': evento.metas_mensuales or 0,
+                    'secuencia': secuencia,
+                }
+            if anterior is not None and secuencia != 1 and anterior['estado'] == EstadoPartnership.INICIANDO.value:
+                return dict(anterior, estado=EstadoPartnership.EN_NEGOCIACION.value)
+            return None
+
+        if anterior is None:
+            logger.warning(f"Evento {evento.__class__.__name__} para partnership desconocida {id_partnership}, ignorado")
+            return None
+
+        if isinstance(evento, NivelPartnershipActualizado):
+            if anterior['nivel'] == evento.nivel_nuevo:
+                return None
+            return dict(anterior, nivel=evento.nivel_nuevo)
+
+        estado = self.ESTADOS_POR_EVENTO.get(type(evento))
+        if estado is None or anterior['estado'] == estado:
+            return None
+        nuevo = dict(anterior, estado=estado)
+        if isinstance(evento, PartnershipActivada) and evento.metas_mensuales is not None:
+            nuevo['metas_mensuales'] = evento.metas_mensuales
+        return nuevo
+
+    @staticmethod
+    def _acumular_deltas(deltas: Counter, anterior, nuevo):
+        marca = nuevo['id_marca']
+        for dimension, campo in ((DIMENSION_ESTADO, 'estado'), (DIMENSION_NIVEL, 'nivel'), (DIMENSION_TIPO, 'tipo_partnership')):
+            if anterior is not None:
+                deltas[(marca, dimension, anterior[campo])] -= 1
+            deltas[(marca, dimension, nuevo[campo])] += 1
+        metas_anteriores = anterior['metas_mensuales'] if anterior is not None else 0
+        deltas[(marca, DIMENSION_METAS, VALOR_SUMA)] += nuevo['metas_mensuales'] - metas_anteriores
+
+    def _guardar(self, session, modificados: List[Dict[str, Any]], deltas: Counter):
+        if modificados:
+            sentencia = insert_con_conflictos(session, self.tabla_proyeccion)
+            sentencia = sentencia.on_conflict_do_update(
+                index_elements=['id_partnership'],
+                set_={
+                    columna: sentencia.excluded[columna]
+                    for columna in ('estado', 'nivel', 'metas_mensuales', 'secuencia')
+                }
+            )
+            session.execute(sentencia, modificados)
+
+        filas = [
+            {'id_marca': marca, 'dimension': dimension, 'valor': valor, 'cantidad': cantidad}
+            for (marca, dimension, valor), cantidad in deltas.items() if cantidad
+        ]
+        if filas:
+            tabla = self.tabla_resumen
+            sentencia = insert_con_conflictos(session, tabla)
+            sentencia = sentencia.on_conflict_do_update(
+                index_elements=['id_marca', 'dimension', 'valor'],
+                set_={'cantidad': tabla.c.cantidad + sentencia.excluded.cantidad}
+            )
+            session.execute(sentencia, filas)
+
+    def reiniciar(self, session):
+        """Vacía el read model para reconstruirlo desde cero"""
+        session.execute(delete(self.tabla_resumen))
+        session.execute(delete(self.tabla_proyeccion))
+
+    def reconstruir_desde_partnerships(self, session):
+        """Reconstruye el read model a partir del estado actual de la tabla partnerships"""
+        self.reiniciar(session)
+        filas = session.execute(select(
+            PartnershipDBModel.id, PartnershipDBModel.id_marca, PartnershipDBModel.tipo_partnership,
+            PartnershipDBModel.estado, PartnershipDBModel.nivel, PartnershipDBModel.metas_mensuales,
+            PartnershipDBModel.version
+        )).all()
+        nuevos = [
+            {
+                'id_partnership': fila.id,
+                'id_marca': fila.id_marca,
+                'tipo_partnership': fila.tipo_partnership.value,
+                'estado': fila.estado.value,
+                'nivel': fila.nivel.value,
+                'metas_mensuales': fila.metas_mensuales or 0,
+                'secuencia': fila.version,
+            }
+            for fila in filas
+        ]
+        deltas: Counter = Counter()
+        for nuevo in nuevos:
+            self._acumular_deltas(deltas, None, nuevo)
+        self._guardar(session, nuevos, deltas)
+        logger.info(f"Resumen de marcas reconstruido con {len(nuevos)} partnerships")
+
+def obtener_resumen_marca(session, id_marca: uuid.UUID) -> Dict[str, Any]:
+    """Lee el resumen de una marca por llave primaria"""
+    resumen = {
+        'id_marca': str(id_marca),
+        'total': 0,
+        'por_estado': {estado.value: 0 for estado in EstadoPartnership},
+        'por_nivel': {nivel.value: 0 for nivel in NivelPartnership},
+        'por_tipo_partnership': {tipo.value: 0 for tipo in TipoPartnership},
+        'suma_metas_mensuales': 0,
+    }
+    secciones = {DIMENSION_ESTADO: 'por_estado', DIMENSION_NIVEL: 'por_nivel', DIMENSION_TIPO: 'por_tipo_partnership'}
+    filas = session.execute(
+        select(ResumenMarcaDBModel.dimension, ResumenMarcaDBModel.valor, ResumenMarcaDBModel.cantidad)
+        .where(ResumenMarcaDBModel.id_marca == id_marca)
+    )
+    for dimension, valor, cantidad in filas:
+        if dimension == DIMENSION_METAS:
+            resumen['suma_metas_mensuales'] = cantidad
+        elif dimension in secciones:
+            resumen[secciones[dimension]][valor] = cantidad
+    resumen['total'] = sum(resumen['por_estado'].values())
+    return resumen
+
+proyector_resumen_marca = ProyectorResumenMarca()
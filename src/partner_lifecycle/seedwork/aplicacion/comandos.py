@@ -1,5 +1,17 @@
-from functools import singledispatch
+from functools import singledispatch, wraps
 from abc import ABC, abstractmethod
+from partner_lifecycle.seedwork.dominio.excepciones import ConflictoConcurrenciaExcepcion
+import os
+import time
+import random
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Intentos totales de un comando ante conflictos de concurrencia y espera base del backoff
+MAX_INTENTOS_CONFLICTO = int(os.getenv('COMANDO_MAX_INTENTOS_CONFLICTO', '3'))
+ESPERA_BASE_CONFLICTO = float(os.getenv('COMANDO_ESPERA_CONFLICTO_MS', '5')) / 1000
 
 class Comando:
     ...
@@ -9,6 +21,58 @@ class ComandoHandler(ABC):
     def handle(self, comando: Comando):
         raise NotImplementedError()
 
+def reintentar_en_conflicto(funcion):
+    """Reintenta la función si falla con un conflicto de concurrencia reintentable
+
+    Los reintentos son acotados y usan backoff exponencial con jitter. Los conflictos no
+    reintentables (por ejemplo, una versión esperada enviada por el cliente) se propagan.
+    """
+    @wraps(funcion)
+    def _reintentar(*args, **kwargs):
+        intento = 1
+        while True:
+            try:
+                return funcion(*args, **kwargs)
+            except ConflictoConcurrenciaExcepcion as e:
+                if not e.reintentable or intento >= MAX_INTENTOS_CONFLICTO:
+                    raise
+                logger.info(f"Conflicto de concurrencia en {funcion.__name__}, reintento {intento}: {e}")
+                time.sleep(random.uniform(0, ESPERA_BASE_CONFLICTO * 2 ** (intento - 1)))
+                intento += 1
+    return _reintentar
+
 @singledispatch
-def ejecutar_commando(comando):
+def _despachar_comando(comando):
     raise NotImplementedError(f'No existe implementación para el comando de tipo {type(comando).__name__}')
+
+# Cadena de interceptores ya compuesta: sin interceptores es el despacho directo
+_cadena_comando = _despachar_comando
+_interceptores_comando = ()
+_lock_interceptores = threading.Lock()
+
+def registrar_interceptor_comando(interceptor):
+    """Agrega un interceptor ``interceptor(comando, siguiente)`` alrededor de cada ejecutar_commando
+
+    El interceptor debe llamar ``siguiente(comando)`` y retornar su resultado. La cadena se
+    compone al registrar, así el despacho no recorre la lista en cada comando.
+    """
+    global _cadena_comando, _interceptores_comando
+    with _lock_interceptores:
+        if interceptor in _interceptores_comando:
+            return
+        _interceptores_comando = _interceptores_comando + (interceptor,)
+        cadena = _despachar_comando
+        for actual in reversed(_interceptores_comando):
+            cadena = _envolver(actual, cadena)
+        _cadena_comando = cadena
+
+def _envolver(interceptor, siguiente):
+    return lambda comando: interceptor(comando, siguiente)
+
+def ejecutar_commando(comando):
+    return _cadena_comando(comando)
+
+# Los handlers se registran con @ejecutar_commando.register como en el singledispatch original
+ejecutar_commando.register = _despachar_comando.register
+ejecutar_commando.dispatch = _despachar_comando.dispatch
+ejecutar_commando.registry = _despachar_comando.registry
@@ -4,8 +4,8 @@ En este archivo usted encontrará las entidades reusables parte del seedwork del
 
 """
 
-from dataclasses import dataclass, field
-from .eventos import EventoDominio
+from dataclasses import dataclass, field, InitVar
+from .eventos import EventoDominio, _id_inmutable
 from .mixins import ValidarReglasMixin
 from .reglas import IdEntidadEsInmutable
 from .excepciones import IdDebeSerInmutableExcepcion
@@ -45,6 +45,38 @@ class AgregacionRaiz(Entidad, ValidarReglasMixin):
         self.eventos = list()
 
 
+@dataclass(slots=True)
+class EntidadLigera:
+    """Variante con __slots__ de Entidad para materializar muchos agregados en lote
+
+    Mantiene la interfaz de Entidad; el id se asigna en ``__post_init__`` (el recibido o uno
+    nuevo) y luego es de solo lectura.
+    """
+    id: InitVar[uuid.UUID] = None
+    _id: uuid.UUID = field(init=False, repr=False)
+    fecha_creacion: datetime = field(default_factory=datetime.now)
+    fecha_actualizacion: datetime = field(default_factory=datetime.now)
+
+    def __post_init__(self, id: uuid.UUID):
+        self._id = id if id is not None else uuid.uuid4()
+
+    @classmethod
+    def siguiente_id(self) -> uuid.UUID:
+        return uuid.uuid4()
+
+EntidadLigera.id = property(lambda self: self._id, _id_inmutable)
+
+@dataclass(slots=True)
+class AgregacionRaizLigera(EntidadLigera, ValidarReglasMixin):
+    eventos: list[EventoDominio] = field(default_factory=list)
+
+    def agregar_evento(self, evento: EventoDominio):
+        self.eventos.append(evento)
+
+    def limpiar_eventos(self):
+        self.eventos = list()
+
+
 @dataclass
 class Locacion(Entidad):
     def __str__(self) -> str:
@@ -4,7 +4,7 @@ En este archivo usted encontrará las clases para eventos reusables parte del se
 
 """
 
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, InitVar
 from .reglas import IdEntidadEsInmutable
 from .excepciones import IdDebeSerInmutableExcepcion
 from datetime import datetime
@@ -30,3 +30,31 @@ class EventoDominio():
         if not IdEntidadEsInmutable(self).es_valido():
             raise IdDebeSerInmutableExcepcion()
         self._id = self.siguiente_id()
+
+
+def _id_inmutable(self, id: uuid.UUID) -> None:
+    raise IdDebeSerInmutableExcepcion()
+
+@dataclass(slots=True)
+class EventoDominioLigero():
+    """Variante con __slots__ de EventoDominio para caminos de lote
+
+    Misma interfaz (``id`` de solo lectura, ``siguiente_id``, ``fecha_evento``) sin ``__dict__``
+    por instancia. El id se asigna directamente en ``__post_init__``: se conserva el recibido
+    o se genera uno nuevo, sin construir la regla IdEntidadEsInmutable.
+    """
+    id: InitVar[uuid.UUID] = None
+    _id: uuid.UUID = field(init=False, repr=False)
+    fecha_evento: datetime = field(default_factory=datetime.now)
+
+    # Las subclases con slots=True no deben usar super() sin argumentos en __post_init__:
+    # dataclass recrea la clase y la celda __class__ queda apuntando a la original
+    def __post_init__(self, id: uuid.UUID):
+        self._id = id if id is not None else uuid.uuid4()
+
+    @classmethod
+    def siguiente_id(self) -> uuid.UUID:
+        return uuid.uuid4()
+
+# La propiedad se agrega después de crear la clase para no reemplazar el default del InitVar
+EventoDominioLigero.id = property(lambda self: self._id, _id_inmutable)
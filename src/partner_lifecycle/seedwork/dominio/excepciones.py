@@ -27,3 +27,10 @@ class ExcepcionFabrica(ExcepcionDominio):
         self.__mensaje = mensaje
     def __str__(self):
         return str(self.__mensaje)
+
+class ConflictoConcurrenciaExcepcion(ExcepcionDominio):
+    def __init__(self, mensaje='El agregado fue modificado por otra transacción', reintentable: bool = True):
+        self.__mensaje = mensaje
+        self.reintentable = reintentable
+    def __str__(self):
+        return str(self.__mensaje)
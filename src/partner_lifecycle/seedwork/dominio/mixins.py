@@ -8,6 +8,8 @@ from abc import ABC, abstractmethod
 from .reglas import ReglaNegocio, ReglaNegocioExcepcion
 
 class ValidarReglasMixin(ABC):
+    # Sin __slots__ propios las subclases con slots=True volverían a tener __dict__
+    __slots__ = ()
 
     def validar_regla(self, regla: ReglaNegocio):
         if not regla.es_valido():
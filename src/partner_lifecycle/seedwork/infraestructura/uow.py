@@ -104,7 +104,7 @@ class UnidadTrabajoPuerto:
             
             for evento, event_type in eventos_pendientes:
                 pulsar_publisher.publish_event(evento, event_type, 'Success')
-                logger.info(f"Evento publicado en Pulsar: {evento.__class__.__name__}")
+                logger.info("Evento publicado en Pulsar: %s", evento.__class__.__name__)
                 
         except Exception as e:
             logger.error(f"Error publicando eventos en Pulsar: {e}")
@@ -116,7 +116,7 @@ class UnidadTrabajoPuerto:
     def agregar_evento(evento: EventoDominio, event_type: str):
         """Agrega un evento para ser publicado después del commit"""
         UnidadTrabajoPuerto._eventos_pendientes.append((evento, event_type))
-        logger.info(f"Evento agregado para publicación: {evento.__class__.__name__}")
+        logger.info("Evento agregado para publicación: %s", evento.__class__.__name__)
 
 # Variables de clase para el estado global
 UnidadTrabajoPuerto._uow = None
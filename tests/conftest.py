@@ -0,0 +1,83 @@
+"""Fixtures de las pruebas del servicio
+
+En este archivo se definen la aplicación Flask sobre SQLite (un archivo por prueba) y el
+broker de Pulsar en memoria que usan las pruebas, igual que benchmarks/suite.py
+
+"""
+
+import os
+
+# El backend se fija antes de importar el servicio: las instancias globales leen PulsarConfig al importarse
+os.environ['PULSAR_BACKEND'] = 'memory'
+
+import uuid
+import pytest
+from flask import Flask
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from partner_lifecycle.config.db import db, init_db
+from partner_lifecycle.api.partner_lifecycle import bp as partner_lifecycle_bp
+from partner_lifecycle.infraestructura.pulsar import PulsarEventPublisher
+from partner_lifecycle.infraestructura.pulsar_memoria import BrokerMemoria, ClientMemoria
+# Modelos que no importa el blueprint: db.create_all debe conocer todas las tablas
+import partner_lifecycle.infraestructura.outbox  # noqa: F401
+import partner_lifecycle.infraestructura.replay  # noqa: F401
+import partner_lifecycle.modulos.partner_lifecycle.aplicacion.handlers.crear_partnership_handler  # registra los handlers
+
+# SQLite no conoce los tipos UUID y JSONB de Postgres: solo para la base de las pruebas
+@compiles(UUID, 'sqlite')
+def _uuid_sqlite(tipo, compilador, **kw):
+    return 'CHAR(32)'
+
+@compiles(JSONB, 'sqlite')
+def _jsonb_sqlite(tipo, compilador, **kw):
+    return 'JSON'
+
+@pytest.fixture
+def app(tmp_path):
+    """Aplicación con el blueprint y una base SQLite en archivo, sin consumidores ni relay
+
+    Se usa un archivo y no ``sqlite://`` porque el replay crea las tablas sombra con el engine
+    y las lee con la sesión: ambas conexiones deben ver la misma base.
+    """
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'partner_lifecycle.db'}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['TESTING'] = True
+    init_db(app)
+    app.register_blueprint(partner_lifecycle_bp)
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def broker():
+    """Broker en memoria propio de la prueba, separado de la instancia global del proceso"""
+    return BrokerMemoria()
+
+@pytest.fixture
+def publisher(broker):
+    publisher = PulsarEventPublisher(todos_async=True)
+    publisher.client = ClientMemoria(broker=broker)
+    yield publisher
+    publisher.close()
+
+@pytest.fixture
+def payload_iniciada():
+    """Construye el payload de un evento PartnershipIniciada, opcionalmente para una marca dada"""
+    def _payload(id_marca: str = None) -> dict:
+        return {
+            'id_partnership': str(uuid.uuid4()),
+            'id_marca': id_marca or str(uuid.uuid4()),
+            'id_partner': str(uuid.uuid4()),
+            'tipo_partnership': 'marca_afiliado',
+            'metas_mensuales': 10,
+        }
+    return _payload
@@ -0,0 +1,54 @@
+"""Pruebas del apagado del consumidor asyncio
+
+En este archivo se prueba que stop_consuming espera los mensajes en vuelo y que _run cierra
+consumidores, control de flujo y executor antes de terminar el loop
+
+"""
+
+import json
+import time
+import threading
+import pytest
+from partner_lifecycle.infraestructura import control_flujo
+from partner_lifecycle.infraestructura.pulsar import PulsarConfig
+from partner_lifecycle.infraestructura.pulsar_memoria import ClientMemoria
+from partner_lifecycle.infraestructura.async_consumer import AsyncEventConsumerService
+from partner_lifecycle.infraestructura.event_consumer_service import PARTNER_EVENTS_TOPIC
+
+class ConsumidorLento(AsyncEventConsumerService):
+    """Consumidor cuyo handler tarda lo suficiente para que el apagado lo encuentre en vuelo"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.procesados = 0
+        self.iniciados = threading.Event()
+        self._lock_procesados = threading.Lock()
+
+    def _handle_partner_event(self, event_data):
+        self.iniciados.set()
+        time.sleep(0.2)
+        with self._lock_procesados:
+            self.procesados += 1
+
+@pytest.fixture
+def consumidor():
+    servicio = ConsumidorLento()
+    servicio.start_consuming()
+    yield servicio
+    servicio.stop_consuming(timeout=5)
+
+def test_stop_consuming_espera_los_mensajes_en_vuelo_y_cierra_recursos(consumidor):
+    producer = ClientMemoria().create_producer(PulsarConfig().get_topic_name(PARTNER_EVENTS_TOPIC))
+    for _ in range(5):
+        producer.send(json.dumps({'event_type': 'PartnershipRenovada', 'status': 'success', 'event_data': {}}).encode())
+    assert consumidor.iniciados.wait(5)
+
+    inicio = time.monotonic()
+    consumidor.stop_consuming(timeout=10)
+
+    assert time.monotonic() - inicio < 5
+    assert consumidor.procesados == 5
+    assert not consumidor._thread.is_alive()
+    assert all(c._cerrado.is_set() for c in consumidor._pulsar_consumers)
+    assert consumidor._control not in control_flujo._controles
+    assert consumidor._loop.is_closed()
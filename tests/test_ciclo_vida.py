@@ -0,0 +1,155 @@
+"""Pruebas del ciclo de vida de una partnership hasta la reconstrucción del read model
+
+En este archivo se prueba el camino creación → transiciones → outbox → topic → replay, con
+la promoción de las tablas sombra y la deduplicación por secuencia del proyector
+
+"""
+
+import uuid
+import pytest
+from sqlalchemy import select, inspect
+from pulsar import MessageId
+from partner_lifecycle.config.db import db
+from partner_lifecycle.infraestructura.outbox import OutboxRelay
+from partner_lifecycle.infraestructura.pulsar_memoria import ClientMemoria
+from partner_lifecycle.infraestructura.replay import (
+    ReconstructorProyeccion, SinCheckpointExcepcion, SUFIJO_SOMBRA
+)
+from partner_lifecycle.modulos.partner_lifecycle.dominio.entidades import PartnershipIniciada
+from partner_lifecycle.modulos.partner_lifecycle.infraestructura.modelos import ProyeccionPartnershipDBModel
+from partner_lifecycle.modulos.partner_lifecycle.infraestructura.proyecciones import proyector_resumen_marca
+
+PREFIJO = '/partner-lifecycle'
+
+def _crear(client, id_marca: str) -> str:
+    id_partnership = str(uuid.uuid4())
+    respuesta = client.post(f"{PREFIJO}/partnership", json={
+        'id': id_partnership, 'id_marca': id_marca, 'tipo_partnership': 'marca_afiliado', 'metas_mensuales': 10,
+    })
+    assert respuesta.status_code == 202, respuesta.get_data(as_text=True)
+    return id_partnership
+
+def _transicion(client, id_partnership: str, transicion: str, cuerpo: dict = None):
+    respuesta = client.put(f"{PREFIJO}/partnership/{id_partnership}/{transicion}", json=cuerpo or {})
+    assert respuesta.status_code == 202, respuesta.get_data(as_text=True)
+
+def _resumen(client, id_marca: str) -> dict:
+    respuesta = client.get(f"{PREFIJO}/marcas/{id_marca}/resumen")
+    assert respuesta.status_code == 200
+    return respuesta.get_json()
+
+def _drenar_outbox(app, publisher) -> int:
+    relay = OutboxRelay(app, publisher=publisher)
+    enviados = 0
+    with app.app_context():
+        while True:
+            lote = relay.drenar_lote()
+            if not lote:
+                return enviados
+            enviados += lote
+
+@pytest.fixture
+def marca_con_historia(app, client):
+    """Marca con cinco partnerships en distintos estados y niveles"""
+    id_marca = str(uuid.uuid4())
+    ids = [_crear(client, id_marca) for _ in range(5)]
+    for id_partnership in ids[:3]:
+        _transicion(client, id_partnership, 'iniciar-negociacion', {'terminos': 'estándar'})
+    for id_partnership in ids[:2]:
+        _transicion(client, id_partnership, 'activar', {'comision_porcentaje': 7.5, 'metas_mensuales': 20})
+    _transicion(client, ids[0], 'actualizar-nivel', {'nuevo_nivel': 'plata'})
+    _transicion(client, ids[1], 'suspender')
+    return id_marca, ids
+
+def _reconstructor(app, broker) -> ReconstructorProyeccion:
+    return ReconstructorProyeccion(app, proyector_resumen_marca, 'partner-events', lote=4, procesos=1,
+                                   client=ClientMemoria(broker=broker))
+
+def test_transiciones_actualizan_resumen_de_marca(client, marca_con_historia):
+    id_marca, _ = marca_con_historia
+    resumen = _resumen(client, id_marca)
+    assert resumen['total'] == 5
+    assert resumen['por_estado']['activo'] == 1
+    assert resumen['por_estado']['suspendido'] == 1
+    assert resumen['por_estado']['en_negociacion'] == 1
+    assert resumen['por_nivel']['plata'] == 1
+
+def test_replay_sin_checkpoint_exige_reiniciar(app, broker):
+    with pytest.raises(SinCheckpointExcepcion):
+        _reconstructor(app, broker).ejecutar()
+
+def test_replay_desde_cero_promueve_sombra_igual_al_read_model(app, client, broker, publisher, marca_con_historia):
+    id_marca, ids = marca_con_historia
+    esperado = _resumen(client, id_marca)
+    assert _drenar_outbox(app, publisher) > 0
+
+    estadisticas = _reconstructor(app, broker).ejecutar(reiniciar=True)
+
+    assert estadisticas['mensajes'] == len(broker.topic(publisher.config.get_topic_name('partner-events')).mensajes)
+    assert _resumen(client, id_marca) == esperado
+    with app.app_context():
+        tablas = inspect(db.engine).get_table_names()
+    assert not [tabla for tabla in tablas if tabla.endswith(SUFIJO_SOMBRA)]
+
+    # Los handlers siguen escribiendo sobre la tabla promovida
+    _transicion(client, ids[3], 'iniciar-negociacion', {'terminos': 'estándar'})
+    assert _resumen(client, id_marca)['por_estado']['en_negociacion'] == 2
+
+def test_replay_con_topic_atrasado_se_pone_al_dia_con_el_almacen(app, client, broker, publisher, marca_con_historia):
+    """Los eventos que la outbox aún no publicó llegan a la sombra desde partnership_events"""
+    id_marca, _ = marca_con_historia
+    esperado = _resumen(client, id_marca)
+    relay = OutboxRelay(app, publisher=publisher)
+    relay.batch_size = 3
+    with app.app_context():
+        relay.drenar_lote()
+
+    _reconstructor(app, broker).ejecutar(reiniciar=True)
+
+    assert _resumen(client, id_marca) == esperado
+
+def test_replay_duplicado_no_cambia_el_read_model(app, client, broker, publisher, marca_con_historia):
+    id_marca, _ = marca_con_historia
+    esperado = _resumen(client, id_marca)
+    _drenar_outbox(app, publisher)
+    _reconstructor(app, broker).ejecutar(reiniciar=True)
+
+    estadisticas = _reconstructor(app, broker).ejecutar(desde_message_id=MessageId.earliest)
+
+    assert estadisticas['eventos'] > 0
+    assert estadisticas['aplicados'] == 0
+    assert _resumen(client, id_marca) == esperado
+
+def test_proyector_omite_secuencias_ya_aplicadas(app):
+    evento = PartnershipIniciada(
+        id_partnership=uuid.uuid4(), id_marca=uuid.uuid4(), id_partner=uuid.uuid4(),
+        tipo_partnership='marca_afiliado', metas_mensuales=10
+    )
+    with app.app_context():
+        assert proyector_resumen_marca.aplicar(db.session, [evento], [1]) == 1
+        db.session.commit()
+        assert proyector_resumen_marca.aplicar(db.session, [evento], [1]) == 0
+        db.session.commit()
+        secuencia = db.session.execute(
+            select(ProyeccionPartnershipDBModel.secuencia)
+            .where(ProyeccionPartnershipDBModel.id_partnership == evento.id_partnership)
+        ).scalar_one()
+    assert secuencia == 1
+
+@pytest.mark.parametrize('transicion, cuerpo', [
+    ('iniciar-negociacion', {'terminos': 'estándar', 'version': 'abc'}),
+    ('activar', {'comision_porcentaje': 'abc', 'metas_mensuales': 20}),
+    ('activar', {'comision_porcentaje': 5, 'metas_mensuales': 'veinte'}),
+])
+def test_valores_numericos_invalidos_responden_400(client, transicion, cuerpo):
+    id_partnership = _crear(client, str(uuid.uuid4()))
+    if transicion == 'activar':
+        _transicion(client, id_partnership, 'iniciar-negociacion', {'terminos': 'estándar'})
+    respuesta = client.put(f"{PREFIJO}/partnership/{id_partnership}/{transicion}", json=cuerpo)
+    assert respuesta.status_code == 400
+
+def test_version_desactualizada_responde_409(client):
+    id_partnership = _crear(client, str(uuid.uuid4()))
+    respuesta = client.put(f"{PREFIJO}/partnership/{id_partnership}/iniciar-negociacion",
+                           json={'terminos': 'estándar', 'version': 7})
+    assert respuesta.status_code == 409
@@ -0,0 +1,92 @@
+"""Pruebas de la reentrega de una misma saga
+
+En este archivo se prueba que un CommandCreatePartner entregado más de una vez (reentrega
+de Pulsar, reinicio del servicio) crea una sola partnership y un solo mensaje procesado
+
+"""
+
+import time
+import uuid
+import pytest
+from sqlalchemy import select, func
+from partner_lifecycle.config.db import db
+from partner_lifecycle.infraestructura.pulsar import pulsar_publisher
+from partner_lifecycle.infraestructura.pulsar_memoria import broker_memoria
+from partner_lifecycle.infraestructura.serializacion import registro_serializadores, ENCODING_JSON
+from partner_lifecycle.infraestructura.event_consumer_service import (
+    EventConsumerService, PARTNER_EVENTS_TOPIC, SUBSCRIPTION_NAME
+)
+from partner_lifecycle.modulos.partner_lifecycle.aplicacion.servicios.command_executor import CommandExecutor
+from partner_lifecycle.modulos.partner_lifecycle.aplicacion.servicios.event_processing_service import (
+    EventProcessingService
+)
+from partner_lifecycle.modulos.partner_lifecycle.infraestructura.idempotencia import RegistroIdempotencia
+from partner_lifecycle.modulos.partner_lifecycle.infraestructura.modelos import (
+    PartnershipDBModel, MensajeProcesadoDBModel
+)
+
+def _contar(app, modelo, *condiciones) -> int:
+    with app.app_context():
+        return db.session.execute(select(func.count()).select_from(modelo).where(*condiciones)).scalar_one()
+
+def test_reentrega_de_la_misma_saga_crea_una_partnership(app, payload_iniciada):
+    saga_id = str(uuid.uuid4())
+    payload = payload_iniciada()
+    servicio = EventProcessingService(CommandExecutor(RegistroIdempotencia()), app)
+
+    servicio.process_partnership_iniciada(saga_id, payload)
+    servicio.process_partnership_iniciada(saga_id, payload)
+
+    assert _contar(app, PartnershipDBModel, PartnershipDBModel.id == uuid.UUID(payload['id_partnership'])) == 1
+    assert _contar(app, MensajeProcesadoDBModel, MensajeProcesadoDBModel.saga_id == saga_id) == 1
+
+def test_reentrega_tras_reinicio_consulta_mensajes_procesados(app, payload_iniciada):
+    """Sin el LRU en memoria (proceso nuevo) la saga se reconoce por la tabla mensajes_procesados"""
+    saga_id = str(uuid.uuid4())
+    payload = payload_iniciada()
+    EventProcessingService(CommandExecutor(RegistroIdempotencia()), app).process_partnership_iniciada(saga_id, payload)
+
+    EventProcessingService(CommandExecutor(RegistroIdempotencia()), app).process_partnership_iniciada(saga_id, payload)
+
+    assert _contar(app, PartnershipDBModel, PartnershipDBModel.id == uuid.UUID(payload['id_partnership'])) == 1
+
+def test_lote_con_saga_repetida_crea_una_partnership(app, payload_iniciada):
+    saga_id = str(uuid.uuid4())
+    payload = payload_iniciada()
+    servicio = EventProcessingService(CommandExecutor(RegistroIdempotencia()), app)
+
+    servicio.process_partnership_iniciada_lote([(saga_id, payload)])
+    servicio.process_partnership_iniciada_lote([(saga_id, payload), (str(uuid.uuid4()), payload_iniciada())])
+
+    assert _contar(app, PartnershipDBModel, PartnershipDBModel.id == uuid.UUID(payload['id_partnership'])) == 1
+    assert _contar(app, MensajeProcesadoDBModel, MensajeProcesadoDBModel.saga_id == saga_id) == 1
+
+@pytest.fixture
+def consumidor(app):
+    servicio = EventConsumerService(app, EventProcessingService(CommandExecutor(RegistroIdempotencia()), app))
+    servicio.start_consuming()
+    yield servicio
+    servicio.stop_consuming()
+
+def test_consumidor_confirma_la_reentrega_sin_duplicar(app, consumidor, payload_iniciada):
+    """El mismo mensaje publicado dos veces en el broker en memoria se confirma dos veces"""
+    suscripcion = broker_memoria.topic(pulsar_publisher.config.get_topic_name(PARTNER_EVENTS_TOPIC)) \
+        .suscripcion(SUBSCRIPTION_NAME)
+    confirmados = suscripcion.confirmados
+    saga_id = str(uuid.uuid4())
+    payload = payload_iniciada()
+    data = registro_serializadores.dumps({
+        'saga_id': saga_id, 'service': 'Content', 'status': 'success',
+        'event_type': 'CommandCreatePartner', 'event_data': payload,
+    })
+    for _ in range(2):
+        pulsar_publisher.publish_raw(PARTNER_EVENTS_TOPIC, data,
+                                     propiedades=registro_serializadores.propiedades(ENCODING_JSON))
+
+    limite = time.monotonic() + 10
+    while suscripcion.confirmados < confirmados + 2 and time.monotonic() < limite:
+        time.sleep(0.01)
+
+    assert suscripcion.confirmados == confirmados + 2
+    assert _contar(app, PartnershipDBModel, PartnershipDBModel.id == uuid.UUID(payload['id_partnership'])) == 1
+    assert _contar(app, MensajeProcesadoDBModel, MensajeProcesadoDBModel.saga_id == saga_id) == 1
@@ -0,0 +1,38 @@
+"""Pruebas de las métricas con un shard por hilo
+
+En este archivo se prueba que los hilos de corta vida no dejan shards vivos y que sus
+valores se conservan en el acumulado al exportar
+
+"""
+
+import gc
+import threading
+from partner_lifecycle.infraestructura.metricas import Contador, Histograma
+
+def _en_hilos(funcion, cantidad: int):
+    for _ in range(cantidad):
+        hilo = threading.Thread(target=funcion)
+        hilo.start()
+        hilo.join()
+    gc.collect()
+
+def test_hilos_terminados_no_dejan_shards():
+    contador = Contador('pruebas_total', 'Contador de prueba', ('resultado',))
+
+    _en_hilos(lambda: contador.inc('ok'), 500)
+    contador.inc('error', cantidad=2)
+
+    assert len(contador._shards) == 1
+    assert contador.valores() == {('ok',): 500, ('error',): 2}
+
+def test_histograma_conserva_observaciones_de_hilos_terminados():
+    histograma = Histograma('pruebas_segundos', 'Histograma de prueba', buckets=(0.1, 1.0))
+
+    _en_hilos(lambda: histograma.observar(0.5), 100)
+    histograma.observar(2.0)
+
+    assert len(histograma._shards) == 1
+    lineas = histograma.exportar()
+    assert 'pruebas_segundos_bucket{le="1.0"} 100' in lineas
+    assert 'pruebas_segundos_bucket{le="+Inf"} 101' in lineas
+    assert 'pruebas_segundos_count 101' in lineas
@@ -0,0 +1,100 @@
+"""Pruebas del relay de outbox
+
+En este archivo se prueba que el relay publica en el orden de la outbox, que una fila
+fallida se reintenta antes que las siguientes y que tras OUTBOX_MAX_INTENTOS queda
+descartada sin bloquear a las demás
+
+"""
+
+import pytest
+from datetime import datetime
+from sqlalchemy import select
+from partner_lifecycle.config.db import db
+from partner_lifecycle.infraestructura.outbox import OutboxDBModel, OutboxRelay
+
+TOPIC = 'persistent://public/default/partner-events'
+
+class PublisherConFallos:
+    """Publisher que registra los envíos y rechaza los payloads indicados"""
+
+    def __init__(self, rechazados=()):
+        self.rechazados = set(rechazados)
+        self.enviados = []
+
+    def publish_raw(self, topic, data, callback=None, propiedades=None):
+        if data in self.rechazados:
+            callback(Exception('Broker no disponible'))
+            return
+        self.enviados.append(data)
+        callback(None)
+
+    def flush(self):
+        return []
+
+    def close(self):
+        pass
+
+def _agregar_filas(app, cantidad: int):
+    with app.app_context():
+        for i in range(cantidad):
+            db.session.add(OutboxDBModel(
+                event_type='PartnershipActivada', status='success', topic=TOPIC,
+                payload=f"evento-{i}".encode(), fecha_creacion=datetime.utcnow()
+            ))
+        db.session.commit()
+
+def _filas(app):
+    with app.app_context():
+        return db.session.execute(
+            select(OutboxDBModel.payload, OutboxDBModel.fecha_envio, OutboxDBModel.intentos,
+                   OutboxDBModel.fecha_descarte).order_by(OutboxDBModel.id)
+        ).all()
+
+def test_relay_publica_en_orden_de_la_outbox(app):
+    _agregar_filas(app, 5)
+    publisher = PublisherConFallos()
+    relay = OutboxRelay(app, publisher=publisher)
+    relay.batch_size = 2
+
+    with app.app_context():
+        while relay.drenar_lote():
+            pass
+
+    assert publisher.enviados == [f"evento-{i}".encode() for i in range(5)]
+    assert all(fila.fecha_envio is not None for fila in _filas(app))
+
+def test_fila_fallida_no_se_adelanta_a_las_siguientes(app):
+    _agregar_filas(app, 3)
+    publisher = PublisherConFallos(rechazados={b'evento-1'})
+    relay = OutboxRelay(app, publisher=publisher)
+
+    with app.app_context():
+        assert relay.drenar_lote() == 1
+    filas = _filas(app)
+    assert [fila.fecha_envio is not None for fila in filas] == [True, False, False]
+    assert filas[1].intentos == 1
+    assert relay._espera_fallo > 0
+
+    publisher.rechazados.clear()
+    with app.app_context():
+        assert relay.drenar_lote() == 2
+    # El evento 2 ya se había confirmado tras el fallo: se publica de nuevo después del 1
+    assert publisher.enviados == [b'evento-0', b'evento-2', b'evento-1', b'evento-2']
+    assert relay._espera_fallo == 0
+
+@pytest.mark.parametrize('max_intentos', [1, 3])
+def test_fila_que_siempre_falla_se_descarta(app, monkeypatch, max_intentos):
+    monkeypatch.setenv('OUTBOX_MAX_INTENTOS', str(max_intentos))
+    _agregar_filas(app, 3)
+    publisher = PublisherConFallos(rechazados={b'evento-0'})
+    relay = OutboxRelay(app, publisher=publisher)
+
+    with app.app_context():
+        for _ in range(max_intentos):
+            assert relay.drenar_lote() == 0
+        assert relay.drenar_lote() == 2
+
+    descartada, *publicadas = _filas(app)
+    assert descartada.intentos == max_intentos
+    assert descartada.fecha_descarte is not None and descartada.fecha_envio is None
+    assert all(fila.fecha_envio is not None for fila in publicadas)